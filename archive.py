@@ -0,0 +1,72 @@
+"""
+Archival of long-completed tasks.
+
+Tasks that have been DONE for more than ARCHIVE_AFTER_DAYS (judged by
+`updatedAt`) are moved from the tasks collection to `tasks_archive`, which
+has the same schema but only the indexes needed to read a user's archive.
+Keeping them out of the hot collection keeps its indexes, and every
+`GET /tasks` page, sized by active work rather than history.
+
+The job moves ARCHIVE_BATCH_SIZE tasks at a time, oldest first, through
+`TaskRepository.archive`. Progress is the data itself: whatever is still
+eligible is picked up by the next batch or run, so a run that stops early
+(timeout, crash) needs no checkpoint, and re-running it is harmless.
+
+Archived tasks stay readable: `GET /tasks?includeArchived=true` and
+`GET /tasks/{taskId}` include them, and any write to one (or
+`POST /tasks/{taskId}/restore`) moves it back first. Search and the changes
+feed cover active tasks only.
+
+Runs on a schedule as the `archiveTasks` Lambda (`archive.run`) or by hand
+with `python manage.py archive-tasks`.
+"""
+import os
+import time
+from typing import Any, Dict, Optional
+
+import read_cache
+from storage import task_repository
+
+ARCHIVE_AFTER_DAYS: float = float(os.environ.get("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_BATCH_SIZE: int = int(os.environ.get("ARCHIVE_BATCH_SIZE", "500"))
+# Stop starting new batches this close to the Lambda timeout.
+_DEADLINE_MARGIN_SECONDS: float = 10.0
+
+
+def archive_completed(
+    now: Optional[float] = None,
+    days: float = ARCHIVE_AFTER_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    deadline: Optional[float] = None,
+) -> int:
+    """
+    Archive tasks DONE for more than `days` until none are left or the
+    monotonic `deadline` passes. Returns the number of tasks moved.
+    """
+    now = time.time() if now is None else now
+    cutoff: float = now - days * 86400
+    tasks = task_repository()
+    moved: int = 0
+    while deadline is None or time.monotonic() < deadline:
+        owners = tasks.archive(cutoff, batch_size)
+        for user_id in set(owners):
+            read_cache.invalidate(user_id)
+        moved += len(owners)
+        if len(owners) < batch_size:
+            break
+    return moved
+
+
+def run(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Scheduled Lambda entry point."""
+    deadline: Optional[float] = None
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        remaining: float = context.get_remaining_time_in_millis() / 1000
+        deadline = time.monotonic() + remaining - _DEADLINE_MARGIN_SECONDS
+    try:
+        moved = archive_completed(deadline=deadline)
+    except Exception as e:
+        print(f"Error archiving tasks: {e}")
+        raise
+    print(f"Archived {moved} tasks")
+    return {"archived": moved}
@@ -0,0 +1,177 @@
+"""
+ASGI adapter for running the API under uvicorn (container deployment).
+
+Each HTTP request is translated into an API Gateway v2 (HTTP API) event and
+dispatched to the same handlers the Lambda functions use. Task routes use the
+Motor-backed coroutines from `async_handler`, so a single process serves many
+requests concurrently; handlers without an async variant run in a thread.
+GET /tasks/stream is a long-lived Server-Sent Events response (see `stream.py`);
+GET /tasks/export and POST /tasks/import stream their bodies (see `transfer.py`).
+Sync handlers apply their own rate limit (`ratelimit.limited`); the coroutines
+and streaming routes are checked here under the same route names.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import base64
+import inspect
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+import async_handler
+import handler
+import ratelimit
+import router
+import storage
+import stream
+import transfer
+from router import Handler
+
+# Served by `stream.serve` as Server-Sent Events rather than a single response.
+STREAM_PATH: str = "/tasks/stream"
+# Served by `transfer`, which streams the response/request body in batches.
+EXPORT_PATH: str = "/tasks/export"
+IMPORT_PATH: str = "/tasks/import"
+
+# Handlers with a Motor-backed coroutine, used when tasks are stored in Mongo;
+# every other route (and every route on other storage engines) runs its sync handler.
+ASYNC_HANDLERS: Dict[Handler, Handler] = {
+    handler.createTask: async_handler.acreateTask,
+    handler.getTasks: async_handler.agetTasks,
+    handler.getTaskChanges: async_handler.agetTaskChanges,
+    handler.getTaskStats: async_handler.agetTaskStats,
+    handler.searchTasks: async_handler.asearchTasks,
+    handler.getTaskById: async_handler.agetTaskById,
+    handler.updateTask: async_handler.aupdateTask,
+    handler.deleteTask: async_handler.adeleteTask,
+    handler.restoreTask: async_handler.arestoreTask,
+    handler.updateTaskStatus: async_handler.aupdateTaskStatus,
+}
+
+ROUTES: List[Tuple[str, str, Handler]] = [
+    (method, pattern, ASYNC_HANDLERS.get(fn, fn) if storage.STORAGE_ENGINE == "mongo" else fn)
+    for method, pattern, fn in router.ROUTES
+]
+
+
+def match_route(method: str, path: str) -> Tuple[Optional[Handler], Dict[str, str], str, bool]:
+    """`router.match_route` over this adapter's route table."""
+    return router.match_route(method, path, ROUTES)
+
+
+def build_event(scope: Dict[str, Any], body: bytes, path_params: Dict[str, str], route_key: str) -> Dict[str, Any]:
+    """Build an API Gateway v2 event from an ASGI HTTP scope and request body."""
+    headers: Dict[str, str] = {}
+    for name, value in scope.get("headers", []):
+        key = name.decode("latin-1").lower()
+        val = value.decode("latin-1")
+        headers[key] = f"{headers[key]},{val}" if key in headers else val
+    raw_query: str = scope.get("query_string", b"").decode("latin-1")
+    query: Dict[str, str] = dict(parse_qsl(raw_query, keep_blank_values=True))
+    try:
+        text: str = body.decode("utf-8")
+        is_base64 = False
+    except UnicodeDecodeError:
+        text = base64.b64encode(body).decode("ascii")
+        is_base64 = True
+    client = scope.get("client") or ("", 0)
+    event: Dict[str, Any] = {
+        "version": "2.0",
+        "routeKey": route_key,
+        "rawPath": scope["path"],
+        "rawQueryString": raw_query,
+        "headers": headers,
+        "queryStringParameters": query or None,
+        "pathParameters": path_params or None,
+        "isBase64Encoded": is_base64,
+        "requestContext": {
+            "http": {"method": scope["method"], "path": scope["path"], "sourceIp": client[0]},
+        },
+    }
+    if body:
+        event["body"] = text
+    return event
+
+
+async def call_handler(fn: Handler, event: Dict[str, Any]) -> Dict[str, Any]:
+    if inspect.iscoroutinefunction(fn):
+        return await fn(event, None)
+    return await asyncio.get_running_loop().run_in_executor(None, fn, event, None)
+
+
+async def _read_body(receive: Callable[[], Awaitable[Dict[str, Any]]]) -> bytes:
+    chunks: List[bytes] = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _send_response(send: Callable[[Dict[str, Any]], Awaitable[None]], response: Dict[str, Any]) -> None:
+    body: Any = response.get("body") or b""
+    if isinstance(body, str):
+        body = base64.b64decode(body) if response.get("isBase64Encoded") else body.encode("utf-8")
+    headers: Dict[str, str] = {"content-type": "application/json"}
+    headers.update({k.lower(): str(v) for k, v in (response.get("headers") or {}).items()})
+    await send({
+        "type": "http.response.start",
+        "status": response.get("statusCode", 200),
+        "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _rate_limited(send: Callable[[Dict[str, Any]], Awaitable[None]], route: str, event: Dict[str, Any]) -> bool:
+    """Send the 429 and return True if `event` is over the budget of `route`."""
+    # Identifying the client verifies its token, and the shared counter is a database write.
+    response = await asyncio.get_running_loop().run_in_executor(None, ratelimit.check, route, event)
+    if response is None:
+        return False
+    await _send_response(send, response)
+    return True
+
+
+async def app(scope: Dict[str, Any], receive: Any, send: Any) -> None:
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await stream.HUB.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    if scope["method"] == "POST" and scope["path"] == IMPORT_PATH:
+        event = build_event(scope, b"", {}, f"POST {IMPORT_PATH}")
+        if not await _rate_limited(send, "importTasks", event):
+            await transfer.serve_import(event, receive, send, _send_response)
+        return
+    body: bytes = await _read_body(receive)
+    if scope["method"] == "GET" and scope["path"] == STREAM_PATH:
+        event = build_event(scope, body, {}, f"GET {STREAM_PATH}")
+        if not await _rate_limited(send, "streamTasks", event):
+            await stream.serve(event, receive, send, _send_response)
+        return
+    if scope["method"] == "GET" and scope["path"] == EXPORT_PATH:
+        event = build_event(scope, body, {}, f"GET {EXPORT_PATH}")
+        if not await _rate_limited(send, "exportTasks", event):
+            await transfer.serve_export(event, send, _send_response)
+        return
+    fn, path_params, route_key, path_exists = match_route(scope["method"], scope["path"])
+    if fn is None:
+        status, error = (405, "Method Not Allowed") if path_exists else (404, "Not Found")
+        await _send_response(send, handler.create_response(status, {"error": error}))
+        return
+    event = build_event(scope, body, path_params, route_key)
+    if inspect.iscoroutinefunction(fn) and await _rate_limited(send, router.ROUTE_KEYS[route_key].__name__, event):
+        return
+    try:
+        response = await call_handler(fn, event)
+    except Exception as e:
+        print(f"Unhandled error in {scope['method']} {scope['path']}: {e}")
+        response = handler.create_response(500, {"error": "Internal Server Error"})
+    await _send_response(send, response)
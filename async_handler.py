@@ -0,0 +1,459 @@
+"""
+Asyncio variants of the task handlers in `handler.py`, backed by Motor.
+
+Each `a<name>` coroutine mirrors `handler.<name>` and shares its validation,
+query building and response helpers; only the database calls are awaited.
+Under the ASGI app (`asgi.py`) they are awaited on the server's event loop so
+one process serves many requests concurrently. The plain `<name>` functions
+are Lambda entry points that run the coroutine on a module-level event loop
+kept across warm invocations (the Motor client stays bound to it).
+"""
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+import auth_handlers
+import read_cache
+import stats
+from db import (
+    get_async_archive_collection,
+    get_async_stats_collection,
+    get_async_tasks_collection,
+    get_async_tombstones_collection,
+)
+from handler import (
+    ALLOWED_STATUSES,
+    CHANGE_SORT_FIELDS,
+    TOMBSTONE_SORT_FIELDS,
+    build_changes,
+    build_changes_query,
+    build_list_query,
+    build_page,
+    cache_headers,
+    changes_queries,
+    compressed,
+    create_response,
+    get_header,
+    list_etag,
+    new_task_document,
+    not_modified,
+    not_modified_response,
+    parse_task_changes,
+    parse_version,
+    status_error,
+    task_headers,
+)
+from search import build_results, build_search_query
+from serialization import parse_body
+from storage import sort_key, tombstone_requests
+from task_schema import (
+    from_storage,
+    storage_filter,
+    storage_projection,
+    storage_sort,
+    storage_update,
+    timestamp,
+    to_storage,
+)
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def run(coro: Awaitable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Run `coro` on the shared per-container event loop."""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop.run_until_complete(coro)
+
+
+async def task_list_state(tasks_collection: Any, user_id: str) -> Tuple[Optional[float], int]:
+    """Async counterpart of `handler.task_list_state`."""
+    query: Dict[str, Any] = storage_filter({"userId": user_id})
+    latest = [from_storage(doc) for doc in await (
+        tasks_collection.find(query, storage_projection({"_id": 0, "updatedAt": 1}))
+        .sort(storage_sort([("updatedAt", -1)]))
+        .limit(1)
+        .to_list(length=1)
+    )]
+    count: int = await tasks_collection.count_documents(query)
+    return (latest[0].get("updatedAt") if latest else None), count
+
+
+async def find_page(tasks_collection: Any, plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The limit+1 lookahead page of `plan` from one collection."""
+    cursor = (
+        tasks_collection
+        .find(storage_filter(plan["filter"]), storage_projection(plan["projection"]))
+        .sort(storage_sort(plan["sort"]))
+        .limit(plan["limit"] + 1)
+    )
+    return [from_storage(doc) for doc in await cursor.to_list(length=plan["limit"] + 1)]
+
+
+async def restore_archived(user_id: str, task_id: Any) -> bool:
+    """Async counterpart of `handler.restore_archived` (see `MongoTaskRepository.restore`)."""
+    query: Dict[str, Any] = storage_filter({"_id": task_id, "userId": user_id})
+    archive_collection = get_async_archive_collection()
+    doc: Optional[Dict[str, Any]] = await archive_collection.find_one(query)
+    if doc is None:
+        return False
+    try:
+        await get_async_tasks_collection().insert_one(doc)
+    except DuplicateKeyError:
+        pass
+    await archive_collection.delete_one(query)
+    await read_cache.ainvalidate(user_id)
+    return True
+
+
+async def acreateTask(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    user_id: Optional[str] = await auth_handlers.aresolve_user(event)
+    if not user_id:
+        return create_response(401, {"error": "Unauthorized"})
+    try:
+        body: Dict[str, Any] = parse_body(event)
+        title: Optional[str] = body.get('title')
+        if not title:
+            return create_response(400, {"error": "Title is required"})
+
+        new_task: Dict[str, Any] = new_task_document(user_id, title, body.get('description', ''))
+        await get_async_tasks_collection().insert_one(to_storage(new_task))
+        await read_cache.ainvalidate(user_id)
+        await stats.arecord(user_id, stats.status_change(None, new_task["status"], new_task["createdAt"]))
+        return create_response(201, new_task, task_headers(new_task))
+    except Exception as e:
+        print(f"Error creating task: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+
+async def agetTasks(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    user_id: Optional[str] = await auth_handlers.aresolve_user(event)
+    if not user_id:
+        return create_response(401, {"error": "Unauthorized"})
+    params: Dict[str, Any] = event.get('queryStringParameters') or {}
+    try:
+        plan: Dict[str, Any] = build_list_query(user_id, params)
+    except ValueError as e:
+        return create_response(400, {"error": str(e)})
+
+    try:
+        key: str = read_cache.query_key("tasks", params)
+        generation = await read_cache.ageneration(user_id)
+        response: Optional[Dict[str, Any]] = await read_cache.aget(user_id, key, generation)
+        if response is None:
+            tasks_collection = get_async_tasks_collection()
+            latest, count = await task_list_state(tasks_collection, user_id)
+            etag: str = list_etag(user_id, params, latest, count)
+            if plan["includeArchived"]:
+                archive_collection = get_async_archive_collection()
+                etag = list_etag(user_id, {"etag": etag}, *await task_list_state(archive_collection, user_id))
+            headers: Dict[str, str] = cache_headers(etag, latest)
+            if not_modified(event, headers["ETag"]):
+                return not_modified_response(headers)
+
+            tasks: List[Dict[str, Any]] = await find_page(tasks_collection, plan)
+            if plan["includeArchived"]:
+                # Same merge as `handler.find_with_archive`.
+                ids = {task["_id"] for task in tasks}
+                tasks += [{**task, "archived": True} for task in await find_page(archive_collection, plan)
+                          if task["_id"] not in ids]
+                tasks = sorted(tasks, key=sort_key(plan["sort"]))[:plan["limit"] + 1]
+            response = create_response(200, build_page(tasks, plan), headers)
+            await read_cache.aput(user_id, key, generation, response)
+        elif not_modified(event, response["headers"]["ETag"]):
+            return not_modified_response(response["headers"])
+        return compressed(event, response)
+    except Exception as e:
+        print(f"Error fetching tasks: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+
+async def agetTaskById(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    user_id: Optional[str] = await auth_handlers.aresolve_user(event)
+    if not user_id:
+        return create_response(401, {"error": "Unauthorized"})
+    try:
+        task_id: Optional[str] = (event.get('pathParameters') or {}).get('taskId')
+        if not task_id:
+            return create_response(400, {"error": "Task ID is required"})
+
+        key: str = read_cache.query_key("task", {"taskId": task_id})
+        generation = await read_cache.ageneration(user_id)
+        response: Optional[Dict[str, Any]] = await read_cache.aget(user_id, key, generation)
+        if response is None:
+            query: Dict[str, Any] = storage_filter({"_id": task_id, "userId": user_id})
+            task = from_storage(await get_async_tasks_collection().find_one(query))
+            if not task:
+                task = from_storage(await get_async_archive_collection().find_one(query))
+                if not task:
+                    return create_response(404, {"error": "Task not found"})
+                task["archived"] = True
+            response = create_response(200, task, task_headers(task))
+            await read_cache.aput(user_id, key, generation, response)
+        if not_modified(event, response["headers"]["ETag"]):
+            return not_modified_response(response["headers"])
+        return response
+    except InvalidId:
+        return create_response(400, {"error": "Invalid Task ID"})
+    except Exception as e:
+        print(f"Error fetching task by ID: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+
+async def aupdateTaskStatus(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    user_id: Optional[str] = await auth_handlers.aresolve_user(event)
+    if not user_id:
+        return create_response(401, {"error": "Unauthorized"})
+    try:
+        task_id: Optional[str] = (event.get('pathParameters') or {}).get('taskId')
+        if not task_id:
+            return create_response(400, {"error": "Task ID is required"})
+        body: Dict[str, Any] = parse_body(event)
+        status: Optional[str] = body.get('status')
+        if not status:
+            return create_response(400, {"error": "Status is required"})
+        if status not in ALLOWED_STATUSES:
+            return create_response(400, {"error": status_error()})
+
+        changes: Dict[str, Any] = {"status": status, "updatedAt": timestamp()}
+        tasks_collection = get_async_tasks_collection()
+        previous: Optional[Dict[str, Any]] = None
+        for attempt in range(2):
+            previous = from_storage(await tasks_collection.find_one_and_update(
+                storage_filter({"_id": task_id, "userId": user_id}),
+                storage_update({"$set": changes}),
+                return_document=ReturnDocument.BEFORE
+            ))
+            if previous or attempt or not await restore_archived(user_id, task_id):
+                break
+        if not previous:
+            return create_response(404, {"error": "Task not found"})
+        await read_cache.ainvalidate(user_id)
+        await stats.arecord(user_id, stats.status_change(previous.get("status"), status, changes["updatedAt"]))
+        updated_task: Dict[str, Any] = {**previous, **changes}
+        return create_response(200, updated_task, task_headers(updated_task))
+    except InvalidId:
+        return create_response(400, {"error": "Invalid Task ID"})
+    except Exception as e:
+        print(f"Error updating task status: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+
+async def aupdateTask(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    user_id: Optional[str] = await auth_handlers.aresolve_user(event)
+    if not user_id:
+        return create_response(401, {"error": "Unauthorized"})
+    try:
+        task_id: Optional[str] = (event.get('pathParameters') or {}).get('taskId')
+        if not task_id:
+            return create_response(400, {"error": "Task ID is required"})
+        body: Dict[str, Any] = parse_body(event)
+        try:
+            changes: Dict[str, Any] = parse_task_changes(body)
+        except ValueError as e:
+            return create_response(400, {"error": str(e)})
+
+        query: Dict[str, Any] = {"_id": task_id, "userId": user_id}
+        if_match: Optional[str] = get_header(event, 'If-Match')
+        if if_match:
+            try:
+                version: Optional[float] = parse_version(if_match, task_id)
+            except ValueError:
+                return create_response(400, {"error": "Invalid If-Match header"})
+            if version is None:
+                return create_response(412, {"error": "Task has been modified"})
+            query["updatedAt"] = version
+
+        changes["updatedAt"] = timestamp()
+        tasks_collection = get_async_tasks_collection()
+        previous: Optional[Dict[str, Any]] = None
+        for attempt in range(2):
+            previous = from_storage(await tasks_collection.find_one_and_update(
+                storage_filter(query),
+                storage_update({"$set": changes}),
+                return_document=ReturnDocument.BEFORE
+            ))
+            if previous or attempt or not await restore_archived(user_id, task_id):
+                break
+        if not previous:
+            if if_match and await tasks_collection.find_one(storage_filter({"_id": task_id, "userId": user_id}), {"_id": 1}):
+                return create_response(412, {"error": "Task has been modified"})
+            return create_response(404, {"error": "Task not found"})
+        await read_cache.ainvalidate(user_id)
+        if "status" in changes:
+            await stats.arecord(user_id, stats.status_change(previous.get("status"), changes["status"], changes["updatedAt"]))
+        updated_task: Dict[str, Any] = {**previous, **changes}
+        return create_response(200, updated_task, task_headers(updated_task))
+    except InvalidId:
+        return create_response(400, {"error": "Invalid Task ID"})
+    except json.JSONDecodeError:
+        return create_response(400, {"error": "Invalid JSON body"})
+    except Exception as e:
+        print(f"Error updating task: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+
+async def adeleteTask(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    user_id: Optional[str] = await auth_handlers.aresolve_user(event)
+    if not user_id:
+        return create_response(401, {"error": "Unauthorized"})
+    try:
+        task_id: Optional[str] = (event.get('pathParameters') or {}).get('taskId')
+        if not task_id:
+            return create_response(400, {"error": "Task ID is required"})
+
+        deleted: Optional[Dict[str, Any]] = None
+        for attempt in range(2):
+            deleted = from_storage(await get_async_tasks_collection().find_one_and_delete(
+                storage_filter({"_id": task_id, "userId": user_id}),
+                projection=storage_projection({"status": 1})
+            ))
+            if deleted or attempt or not await restore_archived(user_id, task_id):
+                break
+        if not deleted:
+            return create_response(404, {"error": "Task not found"})
+        await read_cache.ainvalidate(user_id)
+        now: float = time.time()
+        await get_async_tombstones_collection().bulk_write(tombstone_requests(user_id, [task_id], now))
+        await stats.arecord(user_id, stats.status_change(deleted.get("status"), None, now))
+        return {"statusCode": 204}
+    except InvalidId:
+        return create_response(400, {"error": "Invalid Task ID"})
+    except Exception as e:
+        print(f"Error deleting task: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+
+async def arestoreTask(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    user_id: Optional[str] = await auth_handlers.aresolve_user(event)
+    if not user_id:
+        return create_response(401, {"error": "Unauthorized"})
+    try:
+        task_id: Optional[str] = (event.get('pathParameters') or {}).get('taskId')
+        if not task_id:
+            return create_response(400, {"error": "Task ID is required"})
+
+        query: Dict[str, Any] = storage_filter({"_id": task_id, "userId": user_id})
+        if not await restore_archived(user_id, task_id):
+            active = from_storage(await get_async_tasks_collection().find_one(query))
+            if not active:
+                return create_response(404, {"error": "Task not found"})
+            return create_response(200, active, task_headers(active))
+        changes: Dict[str, Any] = {"updatedAt": timestamp()}
+        previous = from_storage(await get_async_tasks_collection().find_one_and_update(
+            query, storage_update({"$set": changes}), return_document=ReturnDocument.BEFORE
+        ))
+        # A read between the restore and this bump may have cached the old version.
+        await read_cache.ainvalidate(user_id)
+        if not previous:
+            return create_response(404, {"error": "Task not found"})
+        task: Dict[str, Any] = {**previous, **changes}
+        return create_response(200, task, task_headers(task))
+    except InvalidId:
+        return create_response(400, {"error": "Invalid Task ID"})
+    except Exception as e:
+        print(f"Error restoring task: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+
+async def fetch_changes(user_id: str, plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Async counterpart of the getTaskChanges queries; returns `build_changes` output."""
+    fetch: int = plan["limit"] + 1
+    task_filter, tombstone_filter = changes_queries(user_id, plan["since"])
+    tasks, tombstones = await asyncio.gather(
+        get_async_tasks_collection()
+        .find(storage_filter(task_filter))
+        .sort(storage_sort([(f, 1) for f in CHANGE_SORT_FIELDS]))
+        .limit(fetch)
+        .to_list(length=fetch),
+        get_async_tombstones_collection()
+        .find(tombstone_filter, {"deletedAt": 1})
+        .sort([(f, 1) for f in TOMBSTONE_SORT_FIELDS])
+        .limit(fetch)
+        .to_list(length=fetch),
+    )
+    return build_changes([from_storage(doc) for doc in tasks], tombstones, plan)
+
+
+async def agetTaskChanges(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    user_id: Optional[str] = await auth_handlers.aresolve_user(event)
+    if not user_id:
+        return create_response(401, {"error": "Unauthorized"})
+    try:
+        plan: Dict[str, Any] = build_changes_query(event.get('queryStringParameters') or {})
+    except ValueError as e:
+        return create_response(400, {"error": str(e)})
+    except LookupError as e:
+        return create_response(410, {"error": str(e)})
+
+    try:
+        return compressed(event, create_response(200, await fetch_changes(user_id, plan)))
+    except Exception as e:
+        print(f"Error fetching task changes: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+
+async def asearchTasks(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    user_id: Optional[str] = await auth_handlers.aresolve_user(event)
+    if not user_id:
+        return create_response(401, {"error": "Unauthorized"})
+    try:
+        plan: Dict[str, Any] = build_search_query(user_id, event.get('queryStringParameters') or {}, ALLOWED_STATUSES)
+    except ValueError as e:
+        return create_response(400, {"error": str(e)})
+
+    try:
+        docs = await get_async_tasks_collection().aggregate(plan["pipeline"]).to_list(length=plan["limit"] + 1)
+        return compressed(event, create_response(200, build_results([from_storage(doc) for doc in docs], plan)))
+    except Exception as e:
+        print(f"Error searching tasks: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+
+async def agetTaskStats(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    user_id: Optional[str] = await auth_handlers.aresolve_user(event)
+    if not user_id:
+        return create_response(401, {"error": "Unauthorized"})
+    try:
+        return create_response(200, stats.summarize(await get_async_stats_collection().find_one({"_id": user_id})))
+    except Exception as e:
+        print(f"Error fetching task stats: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+
+def createTask(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return run(acreateTask(event, context))
+
+def getTasks(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return run(agetTasks(event, context))
+
+def getTaskById(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return run(agetTaskById(event, context))
+
+def updateTaskStatus(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return run(aupdateTaskStatus(event, context))
+
+def updateTask(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return run(aupdateTask(event, context))
+
+def deleteTask(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return run(adeleteTask(event, context))
+
+def restoreTask(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return run(arestoreTask(event, context))
+
+def getTaskChanges(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return run(agetTaskChanges(event, context))
+
+def getTaskStats(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return run(agetTaskStats(event, context))
+
+def searchTasks(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return run(asearchTasks(event, context))
@@ -1,21 +1,80 @@
 import os
-import jwt
-from passlib.context import CryptContext
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from db import get_users_collection, get_db
+from storage import DuplicateEmailError, user_repository
+from lazy import LazyObject, lazy_module
+import metrics
+import ratelimit
+import revocation
+from serialization import parse_body
 from datetime import datetime, timedelta, timezone
-import json
 import uuid
 import time
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+logger.setLevel(os.environ.get("LOG_LEVEL", "WARNING").upper())
+
+# bcrypt cost factor; hashes below it are transparently upgraded on login.
+BCRYPT_ROUNDS: int = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+# Hashing runs on a bounded pool: at most HASH_MAX_CONCURRENCY hash/verify calls
+# are admitted at once and callers wait up to HASH_QUEUE_TIMEOUT_SECONDS for a
+# slot before the request is rejected with 503.
+HASH_WORKERS: int = int(os.environ.get("HASH_WORKERS", "2"))
+HASH_MAX_CONCURRENCY: int = int(os.environ.get("HASH_MAX_CONCURRENCY", "8"))
+HASH_QUEUE_TIMEOUT_SECONDS: float = float(os.environ.get("HASH_QUEUE_TIMEOUT_SECONDS", "2"))
+
+class HashingBusyError(Exception):
+    """Raised when no password-hashing slot frees up within the queueing timeout."""
+
+def _make_pwd_context() -> Any:
+    from passlib.context import CryptContext
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=BCRYPT_ROUNDS,
+        bcrypt__min_rounds=BCRYPT_ROUNDS,
+    )
+
+# passlib/bcrypt are only loaded by register/login, jwt only when a token is
+# actually verified or issued (not when the authorizer context is trusted).
+jwt: Any = lazy_module("jwt")
+pwd_context: Any = LazyObject(_make_pwd_context)
+_hash_executor: Any = LazyObject(lambda: ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt"))
+_hash_slots = threading.BoundedSemaphore(HASH_MAX_CONCURRENCY)
 JWT_SECRET = os.environ.get("JWT_SECRET", "fallback-secret-key")
 
+REFRESH_TOKEN_TTL_DAYS: int = int(os.environ.get("REFRESH_TOKEN_TTL_DAYS", "30"))
+
+# Verified tokens, keyed by SHA-256 digest, mapped to (user_id, exp, jti).
+TOKEN_CACHE_SIZE: int = int(os.environ.get("TOKEN_CACHE_SIZE", "1024"))
+_token_cache: "OrderedDict[bytes, Tuple[str, float, Optional[str]]]" = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+def _run_hashing(fn: Any, *args: Any) -> Any:
+    with metrics.phase("hash"):
+        if not _hash_slots.acquire(timeout=HASH_QUEUE_TIMEOUT_SECONDS):
+            raise HashingBusyError()
+        try:
+            return _hash_executor.submit(fn, *args).result()
+        finally:
+            _hash_slots.release()
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return _run_hashing(pwd_context.verify, plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return _run_hashing(pwd_context.hash, password)
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    try:
+        return pwd_context.needs_update(hashed_password)
+    except ValueError:
+        return False
 
 def create_access_token(
     data: Dict[str, Any],
@@ -24,25 +83,67 @@ def create_access_token(
     to_encode: Dict[str, Any] = data.copy()
     expire: datetime = datetime.now(timezone.utc) + expires_delta
     to_encode["exp"] = expire
+    to_encode.setdefault("jti", uuid.uuid4().hex)
+    to_encode.setdefault("typ", "access")
     encoded_jwt: str = jwt.encode(to_encode, JWT_SECRET, algorithm="HS256")
     return encoded_jwt
 
+def create_refresh_token(user_id: str) -> str:
+    to_encode: Dict[str, Any] = {
+        "sub": user_id,
+        "typ": "refresh",
+        "jti": uuid.uuid4().hex,
+        "exp": datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_TTL_DAYS),
+    }
+    return jwt.encode(to_encode, JWT_SECRET, algorithm="HS256")
+
+def decode_token(token: str, token_type: str = "access") -> Optional[Dict[str, Any]]:
+    """
+    Verify `token` and return its payload, or None if it is invalid, expired,
+    of another type (tokens without `typ` count as access tokens) or revoked.
+    """
+    try:
+        payload: Dict[str, Any] = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+    except jwt.ExpiredSignatureError:
+        logger.debug("decode_token: token expired")
+        return None
+    except jwt.InvalidTokenError as e:
+        logger.debug("decode_token: invalid token -> %s", e)
+        return None
+    if payload.get("typ", "access") != token_type:
+        logger.debug("decode_token: expected a %s token", token_type)
+        return None
+    if not isinstance(payload.get("sub"), str):
+        logger.debug("decode_token: sub claim missing or not a string")
+        return None
+    if revocation.is_revoked(payload.get("jti")):
+        logger.debug("decode_token: token revoked")
+        return None
+    return payload
+
+def _issue_tokens(user_id: str) -> Dict[str, str]:
+    return {
+        "token": create_access_token(data={"sub": user_id}, expires_delta=timedelta(hours=1)),
+        "refreshToken": create_refresh_token(user_id),
+    }
+
+@metrics.instrument
+@ratelimit.limited
 def registerUser(
     event: Dict[str, Any],
     context: Any
 ) -> Dict[str, Any]:
     from handler import create_response
-    from pymongo.errors import DuplicateKeyError
     try:
-        body: Dict[str, Any] = json.loads(event.get("body", "{}"))
+        body: Dict[str, Any] = parse_body(event)
         email: Optional[str] = body.get("email")
         password: Optional[str] = body.get("password")
 
         if not email or not password:
             return create_response(400, {"error": "Email and password are required"})
 
-        users = get_users_collection()
-        if users.find_one({"email": email}):
+        users = user_repository()
+        if users.find_by_email(email):
             return create_response(400, {"error": "Email already registered"})
 
         new_user: Dict[str, Any] = {
@@ -52,73 +153,224 @@ def registerUser(
             "createdAt": time.time(),
         }
         try:
-            users.insert_one(new_user)
-        except DuplicateKeyError:
+            users.insert(new_user)
+        except DuplicateEmailError:
             return create_response(400, {"error": "Email already registered"})
         return create_response(201, {"message": "User registered successfully"})
 
+    except HashingBusyError:
+        return create_response(503, {"error": "Server busy, please retry"})
     except Exception as e:
         print(f"Error registering user: {e}")
         return create_response(500, {"error": "Internal Server Error"})
 
+@metrics.instrument
+@ratelimit.limited
 def loginUser(
     event: Dict[str, Any],
     context: Any
 ) -> Dict[str, Any]:
     from handler import create_response
     try:
-        body: Dict[str, Any] = json.loads(event.get("body", "{}"))
+        body: Dict[str, Any] = parse_body(event)
         email: Optional[str] = body.get("email")
         password: Optional[str] = body.get("password")
 
         if not email or not password:
             return create_response(400, {"error": "Email and password are required"})
 
-        users = get_users_collection()
-        user: Optional[Dict[str, Any]] = users.find_one({"email": email})
-        hashed = user.get("hashedPassword") or user.get("password") if user else None
-        if not user or not verify_password(password, hashed or ""):
+        users = user_repository()
+        user: Optional[Dict[str, Any]] = users.find_by_email(email)
+        hashed: str = (user or {}).get("hashedPassword") or ""
+        if not user or not hashed or not verify_password(password, hashed):
             return create_response(401, {"error": "Incorrect email or password"})
+        if password_needs_rehash(hashed):
+            try:
+                users.update_password_hash(user["_id"], hashed, get_password_hash(password))
+            except Exception as e:
+                print(f"Error upgrading password hash: {e}")
 
-        token: str = create_access_token(
-            data={"sub": user["_id"]},
-            expires_delta=timedelta(hours=1),
-        )
-        return create_response(200, {"token": token})
+        return create_response(200, _issue_tokens(str(user["_id"])))
 
+    except HashingBusyError:
+        return create_response(503, {"error": "Server busy, please retry"})
     except Exception as e:
         print(f"Error logging in user: {e}")
         return create_response(500, {"error": "Internal Server Error"})
 
+@metrics.instrument
+@ratelimit.limited
+def refreshToken(
+    event: Dict[str, Any],
+    context: Any
+) -> Dict[str, Any]:
+    """
+    Exchange a refresh token for a new access token without touching bcrypt.
+    The refresh token is rotated: the presented one is revoked and a new one issued.
+    """
+    from handler import create_response
+    try:
+        body: Dict[str, Any] = parse_body(event)
+        token: Optional[str] = body.get("refreshToken")
+        if not token:
+            return create_response(400, {"error": "refreshToken is required"})
+
+        payload = decode_token(token, "refresh")
+        # Revoking the token is the gate: of concurrent requests with the
+        # same refresh token, only the one whose revocation is recorded first
+        # gets new tokens.
+        if not payload or not payload.get("jti") or not revocation.claim(payload["jti"], float(payload["exp"])):
+            return create_response(401, {"error": "Invalid or expired refresh token"})
+        return create_response(200, _issue_tokens(payload["sub"]))
+
+    except Exception as e:
+        print(f"Error refreshing token: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+@metrics.instrument
+@ratelimit.limited
+def logoutUser(
+    event: Dict[str, Any],
+    context: Any
+) -> Dict[str, Any]:
+    """Revoke the presented access token and, if given, the refresh token."""
+    from handler import create_response
+    try:
+        headers: Dict[str, Any] = event.get("headers") or {}
+        auth_header: Any = headers.get("Authorization") or headers.get("authorization")
+        body: Dict[str, Any] = parse_body(event)
+
+        revoked = 0
+        candidates = []
+        if isinstance(auth_header, str) and auth_header.startswith("Bearer "):
+            candidates.append((auth_header.split(" ", 1)[1], "access"))
+        if body.get("refreshToken"):
+            candidates.append((body["refreshToken"], "refresh"))
+        for token, token_type in candidates:
+            payload = decode_token(token, token_type)
+            if payload and payload.get("jti"):
+                revocation.revoke(payload["jti"], float(payload["exp"]))
+                revoked += 1
+        if not revoked:
+            return create_response(401, {"error": "Unauthorized"})
+        return {"statusCode": 204}
+
+    except Exception as e:
+        print(f"Error logging out user: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+def migrate_legacy_passwords() -> int:
+    """
+    One-time migration of users still carrying the legacy `password` field:
+    bcrypt hashes are renamed to `hashedPassword`, anything else is hashed.
+    Returns the number of users migrated.
+    """
+    users = get_users_collection()
+    migrated = 0
+    for user in users.find({"password": {"$exists": True}}, {"password": 1, "hashedPassword": 1}):
+        if user.get("hashedPassword"):
+            update: Dict[str, Any] = {"$unset": {"password": ""}}
+        elif pwd_context.identify(user["password"]):
+            update = {"$rename": {"password": "hashedPassword"}}
+        else:
+            update = {"$set": {"hashedPassword": pwd_context.hash(user["password"])}, "$unset": {"password": ""}}
+        users.update_one({"_id": user["_id"]}, update)
+        migrated += 1
+    return migrated
+
+def clear_token_cache() -> None:
+    with _token_cache_lock:
+        _token_cache.clear()
+
+def _cached_user(digest: bytes) -> Optional[Tuple[str, Optional[str]]]:
+    with _token_cache_lock:
+        entry = _token_cache.get(digest)
+        if entry is None:
+            return None
+        user_id, exp, jti = entry
+        if exp <= time.time():
+            del _token_cache[digest]
+            return None
+        _token_cache.move_to_end(digest)
+    if revocation.is_revoked(jti):
+        return None
+    return user_id, jti
+
+def _cache_user(digest: bytes, user_id: str, exp: float, jti: Optional[str] = None) -> None:
+    if TOKEN_CACHE_SIZE <= 0:
+        return
+    with _token_cache_lock:
+        _token_cache[digest] = (user_id, exp, jti)
+        _token_cache.move_to_end(digest)
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+
 def verify_token(event: Dict[str, Any]) -> Optional[str]:
     """
     Extracts and verifies a Bearer JWT from the Lambda event.
     Returns the `sub` claim (user_id) on success, or None on failure.
+    Successfully verified tokens are cached in-process until their `exp`.
     """
-    print("verify_token: event.headers ->", event.get("headers"))
+    claims = verify_token_claims(event)
+    return claims[0] if claims else None
+
+def verify_token_claims(event: Dict[str, Any]) -> Optional[Tuple[str, Optional[str]]]:
+    """`verify_token`, returning the token's (`sub`, `jti`)."""
     headers = event.get("headers")
     if not isinstance(headers, dict):
-        print("verify_token: missing headers or wrong type")
+        logger.debug("verify_token: missing headers or wrong type")
         return None
 
     auth_header = headers.get("Authorization") or headers.get("authorization")
-    print("verify_token: raw auth_header ->", auth_header)
     if not isinstance(auth_header, str) or not auth_header.startswith("Bearer "):
-        print("verify_token: malformed or missing Bearer token")
+        logger.debug("verify_token: malformed or missing Bearer token")
         return None
 
     token = auth_header.split(" ", 1)[1]
-    try:
-        payload: Dict[str, Any] = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        print("verify_token: decoded payload ->", payload)
-        sub = payload.get("sub")
-        if not isinstance(sub, str):
-            print("verify_token: sub claim missing or not a string")
-            return None
-        return sub
-    except jwt.ExpiredSignatureError:
-        print("verify_token: token expired")
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    cached = _cached_user(digest)
+    if cached is not None:
+        return cached
+    payload = decode_token(token)
+    if payload is None:
         return None
-    except jwt.InvalidTokenError as e:
-        print("verify_token: invalid token ->", str(e))
-        return None
\ No newline at end of file
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        _cache_user(digest, payload["sub"], float(exp), payload.get("jti"))
+    return payload["sub"], payload.get("jti")
+
+def _authorizer_context(event: Dict[str, Any]) -> Dict[str, Any]:
+    return (event.get('requestContext') or {}).get('authorizer', {}).get('lambda', {})
+
+def authorizer_user(event: Dict[str, Any]) -> Optional[str]:
+    """
+    The user id set by the Lambda authorizer, if the request went through it.
+    API Gateway caches authorizer decisions, so the token id passed along is
+    checked against the revocation list here.
+    """
+    context: Dict[str, Any] = _authorizer_context(event)
+    user_id: Any = context.get('user_id')
+    if not isinstance(user_id, str) or not user_id:
+        return None
+    return None if revocation.is_revoked(context.get('jti')) else user_id
+
+def resolve_user(event: Dict[str, Any]) -> Optional[str]:
+    """
+    Returns the authenticated user's id. When the request already went through
+    the Lambda authorizer its context is trusted (unless the token has since
+    been revoked) and the token is not verified again; otherwise the Bearer
+    token is verified locally.
+    """
+    if _authorizer_context(event).get('user_id'):
+        return authorizer_user(event)
+    with metrics.phase("auth"):
+        return verify_token(event)
+
+async def aresolve_user(event: Dict[str, Any]) -> Optional[str]:
+    """
+    `resolve_user` for coroutines. Checking the token may sync the revocation
+    list from the database, so it runs in the default executor.
+    """
+    import asyncio
+
+    return await asyncio.get_running_loop().run_in_executor(None, resolve_user, event)
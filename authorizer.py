@@ -0,0 +1,22 @@
+"""
+HTTP API Lambda authorizer.
+
+Verifies the Bearer JWT once at the API Gateway edge and returns a simple
+response; API Gateway caches the decision per Authorization header for the
+configured result TTL, and the task handlers read the user id from
+`requestContext.authorizer.lambda.user_id` instead of verifying the token again.
+The token's `jti` is passed along too, so handlers still reject a token revoked
+while its decision is cached.
+"""
+from typing import Any, Dict, Optional, Tuple
+
+import auth_handlers
+
+
+def authorize(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Lambda authorizer handler (payload format 2.0, simple responses)."""
+    claims: Optional[Tuple[str, Optional[str]]] = auth_handlers.verify_token_claims(event)
+    if not claims:
+        return {"isAuthorized": False}
+    user_id, jti = claims
+    return {"isAuthorized": True, "context": {"user_id": user_id, "jti": jti or ""}}
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+First-request latency of a cold container, comparing the old connection path
+(client + ping + index creation on the first request) with the current one
+(connection opened during init by `db.warm_up`, indexes created by
+`manage.py indexes`).
+
+Runs against a local mongod when MONGO_URI is set (e.g.
+MONGO_URI=mongodb://localhost:27017 MONGO_TLS=false), otherwise against
+mongomock if it is installed. mongomock has no network cost, so only the
+local mongod numbers are representative.
+
+Usage: python benchmarks/bench_db_init.py [rounds]
+"""
+import os
+import statistics
+import sys
+import time
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db
+
+
+def _use_mongomock() -> None:
+    import mongomock
+    import pymongo
+    pymongo.MongoClient = mongomock.MongoClient
+    os.environ["MONGO_URI"] = "mongodb://mongomock"
+    os.environ["MONGO_TLS"] = "false"
+
+
+def _reset() -> None:
+    if db._client is not None:
+        db._client.close()
+    db._client = None
+    db._db = None
+
+
+def legacy_first_request() -> Tuple[float, float]:
+    """Old behaviour: everything happens inside the first request."""
+    _reset()
+    start = time.perf_counter()
+    database = db.init_db()
+    database.client.admin.command("ping")
+    for collection, keys, options in db.INDEXES:
+        database[collection].create_index(keys, **options)
+    list(database["tasks"].find({"userId": "bench-user"}).limit(50))
+    return 0.0, time.perf_counter() - start
+
+
+def warmed_first_request() -> Tuple[float, float]:
+    """New behaviour: warm-up during init, the request only runs its query."""
+    _reset()
+    start = time.perf_counter()
+    db.warm_up()
+    init = time.perf_counter() - start
+    start = time.perf_counter()
+    list(db.get_tasks_collection().find({"userId": "bench-user"}).limit(50))
+    return init, time.perf_counter() - start
+
+
+def measure(fn: Callable[[], Tuple[float, float]], rounds: int) -> Tuple[float, float]:
+    results: List[Tuple[float, float]] = [fn() for _ in range(rounds)]
+    return (
+        statistics.median(r[0] for r in results) * 1000,
+        statistics.median(r[1] for r in results) * 1000,
+    )
+
+
+def main() -> None:
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    if not os.getenv("MONGO_URI"):
+        try:
+            _use_mongomock()
+        except ImportError:
+            print("Set MONGO_URI to a local mongod or `pip install mongomock`")
+            sys.exit(1)
+        print("backend: mongomock (no network cost)")
+    else:
+        print(f"backend: {os.environ['MONGO_URI']}")
+
+    legacy_init, legacy_request = measure(legacy_first_request, rounds)
+    warm_init, warm_request = measure(warmed_first_request, rounds)
+    print(f"median over {rounds} cold starts")
+    print(f"  before: init {legacy_init:7.2f} ms, first request {legacy_request:7.2f} ms")
+    print(f"  after : init {warm_init:7.2f} ms, first request {warm_request:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
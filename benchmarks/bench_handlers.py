@@ -0,0 +1,604 @@
+#!/usr/bin/env python3
+"""
+Load test and benchmark of the Lambda entry points in `handler.py`,
+`auth_handlers.py` and `docs_handlers.py`.
+
+Handlers are invoked in-process with synthetic API Gateway v2 (HTTP API)
+events, as Lambda would call them, from a pool of threads. The database is an
+in-memory mongomock stand-in by default, a real mongod with --mongo, or one of
+the non-Mongo storage engines with --engine memory|sqlite:
+
+    python benchmarks/bench_handlers.py --users 20 --tasks-per-user 500 --concurrency 1,8
+    MONGO_URI=mongodb://localhost:27017 MONGO_TLS=false \\
+        python benchmarks/bench_handlers.py --mongo --requests 5000
+    python benchmarks/bench_handlers.py --engine sqlite
+
+With --mongo the suite drops and re-seeds the BENCH_DB_NAME database
+(default task_manager_bench), never the application database.
+
+The suite seeds users and tasks, then runs a weighted mix of reads and
+writes (--mix getTasks=30,createTask=10,...) at each concurrency level. It reports
+p50/p95/p99 latency, throughput and Mongo round trips per request, per
+operation. Round trips come from pymongo command monitoring with --mongo, and
+from counting collection calls on the stand-in; the memory and sqlite engines
+make none.
+
+Results can be stored as a baseline (--save-baseline NAME, written to
+benchmarks/baselines/NAME.json) and later runs compared against it
+(--compare NAME). The script exits non-zero when round trips per request grow
+or latency/throughput regress beyond --tolerance, so it can gate CI. Latency
+baselines are only comparable on the same hardware; round trips are portable.
+
+bcrypt runs at BCRYPT_ROUNDS=4 unless set, so logins do not dominate the mix.
+Rate limiting is off unless RATE_LIMIT_ENABLED is set, since a few synthetic
+users send every request.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("JWT_SECRET", "bench-secret-key-at-least-32-bytes")
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+# Operations with fewer samples than this are not checked for latency regressions.
+MIN_LATENCY_SAMPLES = 100
+PASSWORD = "bench-password"
+
+DEFAULT_MIX: Dict[str, int] = {
+    "getTasks": 30,
+    "getTaskById": 20,
+    "createTask": 10,
+    "updateTaskStatus": 8,
+    "updateTask": 5,
+    "deleteTask": 3,
+    "batchTasks": 2,
+    "getTaskChanges": 6,
+    "getTaskStats": 4,
+    "searchTasks": 3,
+    "loginUser": 2,
+    "refreshToken": 2,
+    "registerUser": 1,
+    "getDocs": 1,
+    "getOpenapi": 1,
+}
+# Not supported by the mongomock stand-in ($text search).
+MONGO_ONLY: Tuple[str, ...] = ("searchTasks",)
+WORDS: List[str] = ["invoice", "groceries", "report", "meeting", "deploy", "review", "call", "budget",
+                    "plan", "release", "design", "notes", "backup", "fix", "email", "travel"]
+
+
+class RoundTrips:
+    """Per-thread count of commands sent to Mongo."""
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+
+    def reset(self) -> None:
+        self._local.count = 0
+
+    def add(self, n: int = 1) -> None:
+        self._local.count = getattr(self._local, "count", 0) + n
+
+    @property
+    def count(self) -> int:
+        return getattr(self._local, "count", 0)
+
+
+ROUND_TRIPS = RoundTrips()
+
+# Collection methods that cost one round trip (a cursor's getMore batches are not counted).
+_COMMANDS = {
+    "find", "find_one", "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+    "delete_one", "delete_many", "find_one_and_update", "find_one_and_delete", "find_one_and_replace",
+    "bulk_write", "aggregate", "count_documents", "estimated_document_count", "distinct",
+}
+
+
+class CountingCollection:
+    def __init__(self, collection: Any) -> None:
+        self._collection = collection
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._collection, name)
+        if name not in _COMMANDS:
+            return attr
+
+        def counted(*args: Any, **kwargs: Any) -> Any:
+            ROUND_TRIPS.add()
+            return attr(*args, **kwargs)
+        return counted
+
+
+class MemoryCollection(CountingCollection):
+    """
+    Counting wrapper over a mongomock collection. mongomock's bulk_write does
+    not accept the request objects of current pymongo, so bulk writes are
+    applied one request at a time (still counted as one round trip).
+    """
+
+    def bulk_write(self, requests: List[Any], ordered: bool = True, **kwargs: Any) -> Any:
+        from pymongo import DeleteOne, InsertOne, ReplaceOne, UpdateOne
+        from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+        ROUND_TRIPS.add()
+        result = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "nUpserted": 0, "writeErrors": []}
+        for index, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    self._collection.insert_one(request._doc)
+                    result["nInserted"] += 1
+                    continue
+                if isinstance(request, DeleteOne):
+                    result["nRemoved"] += self._collection.delete_one(request._filter).deleted_count
+                    continue
+                if isinstance(request, UpdateOne):
+                    outcome = self._collection.update_one(request._filter, request._doc, upsert=request._upsert)
+                elif isinstance(request, ReplaceOne):
+                    outcome = self._collection.replace_one(request._filter, request._doc, upsert=request._upsert)
+                else:
+                    raise TypeError(f"Unsupported bulk request: {request!r}")
+                result["nMatched"] += outcome.matched_count
+                result["nModified"] += outcome.modified_count
+                result["nUpserted"] += 1 if outcome.upserted_id is not None else 0
+            except DuplicateKeyError as e:
+                result["writeErrors"].append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if result["writeErrors"]:
+            raise BulkWriteError(result)
+        return type("BulkWriteResult", (), {"bulk_api_result": result})()
+
+
+class CountingDatabase:
+    def __init__(self, database: Any, wrapper: type = CountingCollection) -> None:
+        self._database = database
+        self._wrapper = wrapper
+
+    def get_collection(self, name: str, *args: Any, **kwargs: Any) -> CountingCollection:
+        return self._wrapper(self._database.get_collection(name, *args, **kwargs))
+
+    def __getitem__(self, name: str) -> CountingCollection:
+        return self.get_collection(name)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._database, name)
+
+
+def use_memory_db() -> None:
+    import mongomock
+
+    import db
+
+    client = mongomock.MongoClient()
+    db._client = client
+    db._db = CountingDatabase(client.get_database(db.DB_NAME), MemoryCollection)
+
+
+def use_engine(engine: str) -> None:
+    import storage
+
+    # SQLITE_PATH defaults to a throwaway in-memory database here.
+    storage.SQLITE_PATH = os.getenv("SQLITE_PATH", ":memory:")
+    storage.use_engine(engine)
+
+
+def use_mongod() -> None:
+    from pymongo import monitoring
+
+    import db
+
+    class Listener(monitoring.CommandListener):
+        def started(self, event: Any) -> None:
+            ROUND_TRIPS.add()
+
+        def succeeded(self, event: Any) -> None:
+            pass
+
+        def failed(self, event: Any) -> None:
+            pass
+
+    if not os.getenv("MONGO_URI"):
+        print("Set MONGO_URI (and MONGO_TLS=false for a local mongod) to benchmark against mongod")
+        sys.exit(1)
+    monitoring.register(Listener())
+    # Never the application database: it is dropped and re-seeded on every run.
+    db.DB_NAME = os.getenv("BENCH_DB_NAME", "task_manager_bench")
+    database = db.init_db()
+    database.client.drop_database(db.DB_NAME)
+    db.ensure_indexes()
+
+
+class State:
+    """Users and task ids known to the workload, shared by all worker threads."""
+
+    def __init__(self, rng: random.Random) -> None:
+        self.rng = rng
+        self.users: List[Dict[str, str]] = []
+        self.tasks: Dict[str, List[str]] = {}
+        self.refresh_tokens: List[str] = []
+        self.lock = threading.Lock()
+
+    def user(self) -> Dict[str, str]:
+        with self.lock:
+            return self.rng.choice(self.users)
+
+    def task_id(self, user_id: str, remove: bool = False) -> str:
+        with self.lock:
+            ids = self.tasks[user_id]
+            if not ids:
+                return str(uuid.uuid4())
+            index = self.rng.randrange(len(ids))
+            if remove:
+                ids[index], ids[-1] = ids[-1], ids[index]
+                return ids.pop()
+            return ids[index]
+
+    def add_tasks(self, user_id: str, task_ids: List[str]) -> None:
+        with self.lock:
+            self.tasks[user_id].extend(task_ids)
+
+    def words(self, n: int) -> str:
+        with self.lock:
+            return " ".join(self.rng.choice(WORDS) for _ in range(n))
+
+    def pop_refresh_token(self) -> Optional[str]:
+        with self.lock:
+            return self.refresh_tokens.pop() if self.refresh_tokens else None
+
+    def push_refresh_token(self, token: str) -> None:
+        with self.lock:
+            self.refresh_tokens.append(token)
+
+
+def make_event(method: str, path: str, user_id: Optional[str] = None, body: Any = None,
+               query: Optional[Dict[str, str]] = None, path_params: Optional[Dict[str, str]] = None,
+               route: Optional[str] = None) -> Dict[str, Any]:
+    """API Gateway v2 event, including the context the Lambda authorizer adds."""
+    request_context: Dict[str, Any] = {
+        "http": {"method": method, "path": path, "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1"},
+        "routeKey": f"{method} {route or path}",
+        "stage": "$default",
+        "requestId": str(uuid.uuid4()),
+        "timeEpoch": int(time.time() * 1000),
+    }
+    if user_id is not None:
+        request_context["authorizer"] = {"lambda": {"user_id": user_id}}
+    return {
+        "version": "2.0",
+        "routeKey": f"{method} {route or path}",
+        "rawPath": path,
+        "rawQueryString": "&".join(f"{k}={v}" for k, v in (query or {}).items()),
+        "headers": {"accept-encoding": "gzip", "content-type": "application/json"},
+        "queryStringParameters": query,
+        "pathParameters": path_params,
+        "requestContext": request_context,
+        "body": json.dumps(body) if body is not None else None,
+        "isBase64Encoded": False,
+    }
+
+
+def seed(state: State, users: int, tasks_per_user: int) -> None:
+    import auth_handlers
+    import storage
+    from db import get_tasks_collection
+    from handler import new_task_document
+    from task_schema import to_storage
+
+    hashed = auth_handlers.get_password_hash(PASSWORD)
+    now = time.time()
+    for i in range(users):
+        user_id = f"bench-user-{i}"
+        email = f"bench-{i}@example.com"
+        storage.user_repository().insert({"_id": user_id, "email": email, "hashedPassword": hashed, "createdAt": now})
+        docs = [
+            new_task_document(user_id, f"{state.words(3)} {n}", state.words(12), now - tasks_per_user + n)
+            for n in range(tasks_per_user)
+        ]
+        if docs and storage.STORAGE_ENGINE == "mongo":
+            get_tasks_collection().insert_many([to_storage(d) for d in docs])
+        else:
+            for doc in docs:
+                storage.task_repository().insert(doc)
+        state.users.append({"id": user_id, "email": email})
+        state.tasks[user_id] = [d["_id"] for d in docs]
+        state.refresh_tokens.append(auth_handlers.create_refresh_token(user_id))
+
+
+def build_operations(state: State) -> Dict[str, Callable[[], Dict[str, Any]]]:
+    import auth_handlers
+    import docs_handlers
+    import handler
+
+    statuses = handler.ALLOWED_STATUSES
+
+    def get_tasks() -> Dict[str, Any]:
+        user = state.user()
+        query = {"limit": state.rng.choice(["20", "50"])}
+        if state.rng.random() < 0.3:
+            query["status"] = state.rng.choice(statuses)
+        return handler.getTasks(make_event("GET", "/tasks", user["id"], query=query), None)
+
+    def get_task_by_id() -> Dict[str, Any]:
+        user = state.user()
+        task_id = state.task_id(user["id"])
+        return handler.getTaskById(make_event("GET", f"/tasks/{task_id}", user["id"], path_params={"taskId": task_id},
+                                              route="/tasks/{taskId}"), None)
+
+    def create_task() -> Dict[str, Any]:
+        user = state.user()
+        response = handler.createTask(make_event("POST", "/tasks", user["id"],
+                                                 body={"title": state.words(3), "description": state.words(12)}), None)
+        if response["statusCode"] == 201:
+            state.add_tasks(user["id"], [json.loads(response["body"])["_id"]])
+        return response
+
+    def update_task_status() -> Dict[str, Any]:
+        user = state.user()
+        task_id = state.task_id(user["id"])
+        return handler.updateTaskStatus(make_event("PUT", f"/tasks/{task_id}/status", user["id"],
+                                                   body={"status": state.rng.choice(statuses)},
+                                                   path_params={"taskId": task_id}, route="/tasks/{taskId}/status"), None)
+
+    def update_task() -> Dict[str, Any]:
+        user = state.user()
+        task_id = state.task_id(user["id"])
+        return handler.updateTask(make_event("PATCH", f"/tasks/{task_id}", user["id"],
+                                             body={"title": state.words(4)}, path_params={"taskId": task_id},
+                                             route="/tasks/{taskId}"), None)
+
+    def delete_task() -> Dict[str, Any]:
+        user = state.user()
+        task_id = state.task_id(user["id"], remove=True)
+        return handler.deleteTask(make_event("DELETE", f"/tasks/{task_id}", user["id"], path_params={"taskId": task_id},
+                                             route="/tasks/{taskId}"), None)
+
+    def batch_tasks() -> Dict[str, Any]:
+        user = state.user()
+        operations: List[Dict[str, Any]] = [{"op": "create", "title": state.words(3)} for _ in range(5)]
+        operations += [{"op": "updateStatus", "taskId": state.task_id(user["id"]), "status": state.rng.choice(statuses)}
+                       for _ in range(5)]
+        response = handler.batchTasks(make_event("POST", "/tasks/batch", user["id"], body={"operations": operations}), None)
+        if response["statusCode"] == 200 and not response.get("isBase64Encoded"):
+            created = [r["taskId"] for r in json.loads(response["body"])["results"] if r["op"] == "create" and r["ok"]]
+            state.add_tasks(user["id"], created)
+        return response
+
+    def get_task_changes() -> Dict[str, Any]:
+        user = state.user()
+        return handler.getTaskChanges(make_event("GET", "/tasks/changes", user["id"], query={"limit": "50"}), None)
+
+    def get_task_stats() -> Dict[str, Any]:
+        return handler.getTaskStats(make_event("GET", "/tasks/stats", state.user()["id"]), None)
+
+    def search_tasks() -> Dict[str, Any]:
+        return handler.searchTasks(make_event("GET", "/tasks/search", state.user()["id"],
+                                              query={"q": state.words(1)}), None)
+
+    def login_user() -> Dict[str, Any]:
+        user = state.user()
+        response = auth_handlers.loginUser(make_event("POST", "/login",
+                                                      body={"email": user["email"], "password": PASSWORD}), None)
+        if response["statusCode"] == 200:
+            state.push_refresh_token(json.loads(response["body"])["refreshToken"])
+        return response
+
+    def refresh_token() -> Dict[str, Any]:
+        token = state.pop_refresh_token() or auth_handlers.create_refresh_token(state.user()["id"])
+        response = auth_handlers.refreshToken(make_event("POST", "/token/refresh", body={"refreshToken": token}), None)
+        if response["statusCode"] == 200:
+            state.push_refresh_token(json.loads(response["body"])["refreshToken"])
+        return response
+
+    def register_user() -> Dict[str, Any]:
+        email = f"bench-{uuid.uuid4().hex}@example.com"
+        return auth_handlers.registerUser(make_event("POST", "/register", body={"email": email, "password": PASSWORD}), None)
+
+    return {
+        "getTasks": get_tasks,
+        "getTaskById": get_task_by_id,
+        "createTask": create_task,
+        "updateTaskStatus": update_task_status,
+        "updateTask": update_task,
+        "deleteTask": delete_task,
+        "batchTasks": batch_tasks,
+        "getTaskChanges": get_task_changes,
+        "getTaskStats": get_task_stats,
+        "searchTasks": search_tasks,
+        "loginUser": login_user,
+        "refreshToken": refresh_token,
+        "registerUser": register_user,
+        "getDocs": lambda: docs_handlers.get_docs(make_event("GET", "/docs"), None),
+        "getOpenapi": lambda: docs_handlers.get_openapi(make_event("GET", "/openapi.yaml"), None),
+    }
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), int(round(p / 100 * len(sorted_values) + 0.5))))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples: List[Tuple[float, int, int]], elapsed: Optional[float] = None) -> Dict[str, Any]:
+    """Latency percentiles (ms), mean round trips and error count of (seconds, round trips, status) samples."""
+    latencies = sorted(s[0] * 1000 for s in samples)
+    summary: Dict[str, Any] = {
+        "count": len(samples),
+        "p50": round(percentile(latencies, 50), 3),
+        "p95": round(percentile(latencies, 95), 3),
+        "p99": round(percentile(latencies, 99), 3),
+        "roundTrips": round(sum(s[1] for s in samples) / len(samples), 3) if samples else 0.0,
+        "errors": sum(1 for s in samples if s[2] >= 500),
+    }
+    if elapsed is not None:
+        summary["throughput"] = round(len(samples) / elapsed, 1)
+    return summary
+
+
+def run_level(operations: Dict[str, Callable[[], Dict[str, Any]]], mix: Dict[str, int], requests: int,
+              concurrency: int, rng: random.Random) -> Dict[str, Any]:
+    names = list(mix)
+    plan = rng.choices(names, weights=[mix[n] for n in names], k=requests)
+    samples: Dict[str, List[Tuple[float, int, int]]] = {name: [] for name in names}
+    lock = threading.Lock()
+
+    def one(name: str) -> None:
+        ROUND_TRIPS.reset()
+        start = time.perf_counter()
+        try:
+            status = operations[name]()["statusCode"]
+        except Exception as e:
+            print(f"Error in {name}: {e}")
+            status = 599
+        sample = (time.perf_counter() - start, ROUND_TRIPS.count, status)
+        with lock:
+            samples[name].append(sample)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, plan))
+    elapsed = time.perf_counter() - start
+
+    every = [s for name in names for s in samples[name]]
+    return {
+        "overall": summarize(every, elapsed),
+        "operations": {name: summarize(samples[name]) for name in names if samples[name]},
+    }
+
+
+def print_level(concurrency: int, result: Dict[str, Any]) -> None:
+    overall = result["overall"]
+    print(f"\nconcurrency {concurrency}: {overall['count']} requests, {overall['throughput']:.1f} req/s")
+    print(f"  {'operation':<18}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'trips/req':>11}{'errors':>8}")
+    for name, row in list(result["operations"].items()) + [("overall", overall)]:
+        print(f"  {name:<18}{row['count']:>7}{row['p50']:>10.2f}{row['p95']:>10.2f}{row['p99']:>10.2f}"
+              f"{row['roundTrips']:>11.2f}{row['errors']:>8}")
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of `results` against `baseline`, as printable lines."""
+    problems: List[str] = []
+    if results["config"] != baseline["config"]:
+        print(f"warning: baseline was recorded with a different configuration: {baseline['config']}")
+    for level, base_level in baseline["levels"].items():
+        current = results["levels"].get(level)
+        if current is None:
+            continue
+        if current["overall"]["throughput"] < base_level["overall"]["throughput"] * (1 - tolerance):
+            problems.append(f"concurrency {level}: throughput {current['overall']['throughput']} req/s "
+                            f"< baseline {base_level['overall']['throughput']}")
+        for name, base in base_level["operations"].items():
+            row = current["operations"].get(name)
+            if row is None:
+                continue
+            if row["roundTrips"] > base["roundTrips"] + 0.05:
+                problems.append(f"concurrency {level} {name}: {row['roundTrips']} round trips/request "
+                                f"> baseline {base['roundTrips']}")
+            # Percentiles of a handful of samples, or sub-millisecond jitter, are noise.
+            if min(row["count"], base["count"]) < MIN_LATENCY_SAMPLES:
+                continue
+            for stat in ("p50", "p95"):
+                if row[stat] > base[stat] * (1 + tolerance) and row[stat] - base[stat] > 1.0:
+                    problems.append(f"concurrency {level} {name}: {stat} {row[stat]} ms > baseline {base[stat]} ms")
+    return problems
+
+
+def parse_mix(raw: Optional[str]) -> Dict[str, int]:
+    if not raw:
+        return dict(DEFAULT_MIX)
+    mix: Dict[str, int] = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown operation in --mix: {name} (choose from {', '.join(DEFAULT_MIX)})")
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo", action="store_true", help="use the mongod at MONGO_URI instead of the in-memory stand-in")
+    parser.add_argument("--engine", choices=("mongomock", "memory", "sqlite"), default="mongomock",
+                        help="storage engine when not using --mongo (STORAGE_ENGINE=memory|sqlite, or the mongomock stand-in)")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--tasks-per-user", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per concurrency level")
+    parser.add_argument("--concurrency", default="1,8", help="comma-separated worker thread counts")
+    parser.add_argument("--mix", help="operation weights, e.g. getTasks=50,createTask=10")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-cache", action="store_true", help="disable the read cache")
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed relative latency/throughput regression (round trips are checked exactly)")
+    args = parser.parse_args()
+
+    import read_cache
+
+    if args.no_cache:
+        read_cache.READ_CACHE_ENABLED = False
+    mix = parse_mix(args.mix)
+    if args.mongo:
+        use_mongod()
+    elif args.engine != "mongomock":
+        use_engine(args.engine)
+    else:
+        use_memory_db()
+        mix = {name: weight for name, weight in mix.items() if name not in MONGO_ONLY}
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    rng = random.Random(args.seed)
+    state = State(rng)
+    seed(state, args.users, args.tasks_per_user)
+    operations = build_operations(state)
+    config = {
+        "backend": "mongod" if args.mongo else "memory" if args.engine == "mongomock" else args.engine,
+        "users": args.users,
+        "tasksPerUser": args.tasks_per_user,
+        "requests": args.requests,
+        "mix": mix,
+        "readCache": read_cache.enabled(),
+    }
+    print(f"backend={config['backend']} users={args.users} tasks/user={args.tasks_per_user} "
+          f"requests/level={args.requests} read cache={'on' if config['readCache'] else 'off'}")
+
+    run_level(operations, mix, min(200, args.requests), levels[0], rng)  # warm up
+    results: Dict[str, Any] = {"config": config, "levels": {}}
+    for concurrency in levels:
+        result = run_level(operations, mix, args.requests, concurrency, rng)
+        results["levels"][str(concurrency)] = result
+        print_level(concurrency, result)
+    if config["readCache"]:
+        print(f"\nread cache: {read_cache.metrics()}")
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save_baseline}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nbaseline written to {path}")
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json"), encoding="utf-8") as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        if problems:
+            print(f"\nregressions against baseline '{args.compare}':")
+            for line in problems:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nno regressions against baseline '{args.compare}'")
+
+
+if __name__ == "__main__":
+    main()
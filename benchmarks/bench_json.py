@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark of response serialization for task lists of 1k/10k/100k tasks:
+the previous `json.dumps(body, default=str)` against `serialization.dumps`
+(orjson when installed), plus gzip/brotli compression cost and size.
+
+Usage: python benchmarks/bench_json.py [sizes...]
+"""
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bson import ObjectId
+
+import serialization
+
+
+def make_tasks(count: int) -> List[Dict[str, Any]]:
+    now = time.time()
+    return [
+        {
+            "_id": ObjectId() if i % 2 else str(uuid.uuid4()),
+            "title": f"Task {i}",
+            "description": "Lorem ipsum dolor sit amet, consectetur adipiscing elit.",
+            "status": ("TODO", "IN_PROGRESS", "DONE")[i % 3],
+            "createdAt": now - i,
+            "updatedAt": now - i / 2,
+            "dueDate": datetime.fromtimestamp(now + i, tz=timezone.utc),
+            "userId": "bench-user",
+        }
+        for i in range(count)
+    ]
+
+
+def timed(fn: Callable[[], Any], repeat: int) -> float:
+    """Best-of-`repeat` wall time in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> None:
+    sizes = [int(a) for a in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    backend = "orjson" if serialization.orjson is not None else "stdlib json"
+    print(f"serialization backend: {backend}")
+    for size in sizes:
+        body = {"items": make_tasks(size), "next": None}
+        repeat = 5 if size <= 10_000 else 2
+        old_ms = timed(lambda: json.dumps(body, default=str), repeat)
+        new_ms = timed(lambda: serialization.dumps(body), repeat)
+        text = serialization.dumps(body)
+        print(f"{size:>7} tasks  {len(text) / 1024:9.0f} KiB")
+        print(f"  json.dumps(default=str) : {old_ms:9.2f} ms")
+        print(f"  serialization.dumps     : {new_ms:9.2f} ms ({old_ms / new_ms:.1f}x faster)")
+        print(f"  parse (loads)           : {timed(lambda: serialization.loads(text), repeat):9.2f} ms")
+
+        response = {"statusCode": 200, "body": text}
+        for encoding in ("gzip", "br"):
+            if encoding == "br" and serialization._brotli() is None:
+                print("  br                      :   (brotli not installed)")
+                continue
+            compressed_ms = timed(lambda: serialization.compress_response(response, encoding), repeat)
+            out = serialization.compress_response(response, encoding)
+            ratio = len(text) / (len(out["body"]) * 3 / 4)
+            print(f"  {encoding:<24}: {compressed_ms:9.2f} ms (ratio {ratio:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
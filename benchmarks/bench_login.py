@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Login throughput at different bcrypt cost factors: password verifications per
+second on one thread and through a hashing pool the size of HASH_WORKERS
+(bcrypt releases the GIL, so the pool scales with available cores).
+
+Usage: python benchmarks/bench_login.py [--rounds 10 11 12] [--workers 2] [--logins 32]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from passlib.context import CryptContext
+
+
+def logins_per_second(ctx: CryptContext, hashed: str, logins: int, workers: int) -> float:
+    start = time.perf_counter()
+    if workers <= 1:
+        for _ in range(logins):
+            assert ctx.verify("correct horse", hashed)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            assert all(pool.map(lambda _: ctx.verify("correct horse", hashed), range(logins)))
+    return logins / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12, 13])
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("HASH_WORKERS", "2")))
+    parser.add_argument("--logins", type=int, default=32)
+    args = parser.parse_args()
+
+    print(f"{'rounds':>6} {'ms/login':>9} {'1 thread':>12} {f'{args.workers} workers':>12}")
+    for rounds in args.rounds:
+        ctx = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+        hashed = ctx.hash("correct horse")
+        single = logins_per_second(ctx, hashed, args.logins, 1)
+        pooled = logins_per_second(ctx, hashed, args.logins, args.workers)
+        print(f"{rounds:>6} {1000 / single:>9.1f} {single:>10.1f}/s {pooled:>10.1f}/s")
+
+
+if __name__ == "__main__":
+    main()
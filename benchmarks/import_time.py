@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Import-time (cold start) benchmark for the Lambda handler modules.
+
+Imports each module in a fresh interpreter with `python -X importtime`, takes
+the best cumulative time over several runs and compares it with the budget in
+`import_thresholds.json` (milliseconds). Exits non-zero if any module is over
+budget, so it can gate CI.
+
+Usage: python benchmarks/import_time.py [--repeat N] [module ...]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+THRESHOLDS_PATH = os.path.join(os.path.dirname(__file__), 'import_thresholds.json')
+
+
+def import_time_us(module: str) -> int:
+    """Cumulative import time of `module` in microseconds, from a fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr}")
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        # Top-level entries are not indented in the "imported package" column.
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    raise RuntimeError(f"no importtime entry for {module}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", help="modules to check (default: all with a threshold)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per module; the fastest is kept")
+    args = parser.parse_args()
+
+    with open(THRESHOLDS_PATH, 'r', encoding='utf-8') as f:
+        thresholds: Dict[str, float] = json.load(f)
+    modules: List[str] = args.modules or sorted(thresholds)
+
+    failed = False
+    for module in modules:
+        best_ms = min(import_time_us(module) for _ in range(args.repeat)) / 1000
+        budget = thresholds.get(module)
+        status = "ok"
+        if budget is not None and best_ms > budget:
+            status = "OVER BUDGET"
+            failed = True
+        budget_str = f"{budget:.0f} ms" if budget is not None else "-"
+        print(f"{module:<16} {best_ms:8.1f} ms  (budget {budget_str})  {status}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Load test comparing the synchronous Lambda handlers (one request at a time,
+as in a Lambda container) with the Motor-backed ASGI app serving many
+concurrent requests from one process.
+
+Requests are driven in-process (no HTTP stack) with a mixed workload of
+getTasks and createTask against a real MongoDB, e.g. a local mongod:
+
+    MONGO_URI=mongodb://localhost:27017 MONGO_TLS=false \\
+        python benchmarks/load_test.py --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# One user sends every request; measure the handlers, not the rate limiter.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import asgi
+import auth_handlers
+import handler
+
+USER_ID = "load-test-user"
+TOKEN = auth_handlers.create_access_token({"sub": USER_ID})
+
+
+def make_event(write: bool) -> Dict[str, Any]:
+    event: Dict[str, Any] = {"requestContext": {"authorizer": {"lambda": {"user_id": USER_ID}}}}
+    if write:
+        event["body"] = json.dumps({"title": "load test", "description": "x" * 64})
+    else:
+        event["queryStringParameters"] = {"limit": "50"}
+    return event
+
+
+def run_sync(requests: int, write_ratio: float) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        if random.random() < write_ratio:
+            response = handler.createTask(make_event(True), None)
+        else:
+            response = handler.getTasks(make_event(False), None)
+        assert response["statusCode"] < 500, response
+    return requests / (time.perf_counter() - start)
+
+
+async def _asgi_request(write: bool) -> int:
+    body = json.dumps({"title": "load test", "description": "x" * 64}).encode() if write else b""
+    scope = {
+        "type": "http",
+        "method": "POST" if write else "GET",
+        "path": "/tasks",
+        "query_string": b"" if write else b"limit=50",
+        "headers": [(b"authorization", f"Bearer {TOKEN}".encode())],
+    }
+    sent: List[Dict[str, Any]] = []
+
+    async def receive() -> Dict[str, Any]:
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message: Dict[str, Any]) -> None:
+        sent.append(message)
+
+    await asgi.app(scope, receive, send)
+    return sent[0]["status"]
+
+
+async def run_asgi(requests: int, concurrency: int, write_ratio: float) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            status = await _asgi_request(random.random() < write_ratio)
+            assert status < 500, status
+
+    await _asgi_request(False)
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+    if not os.getenv("MONGO_URI"):
+        print("Set MONGO_URI (and MONGO_TLS=false for a local mongod) to run the load test")
+        sys.exit(1)
+
+    handler.getTasks(make_event(False), None)
+    sync_rps = run_sync(args.requests, args.write_ratio)
+    asgi_rps = asyncio.run(run_asgi(args.requests, args.concurrency, args.write_ratio))
+    print(f"{args.requests} requests, {args.write_ratio:.0%} writes")
+    print(f"  sync handlers (1 at a time)     : {sync_rps:8.1f} req/s")
+    print(f"  ASGI + Motor (concurrency {args.concurrency:>3}) : {asgi_rps:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
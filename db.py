@@ -1,55 +1,185 @@
 import os
-from dotenv import load_dotenv
-from typing import Final, Optional
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 from urllib.parse import quote_plus
-from pymongo import MongoClient
-from pymongo.collection import Collection
-from pymongo.database import Database
-import certifi
-
-# Load environment variables
-load_dotenv()
-
-# Build MongoDB URI from separate credentials
-user: Final[str] = os.getenv("MONGO_USER", "")
-pw:   Final[str] = os.getenv("MONGO_PASS", "")
-host: Final[str] = os.getenv("MONGO_HOST", "")
-if not (user and pw and host):
-    raise RuntimeError("MONGO_USER, MONGO_PASS and MONGO_HOST must be set in .env")
-
-user_enc: Final[str] = quote_plus(user)
-pw_enc:   Final[str] = quote_plus(pw)
-MONGO_URI: Final[str] = (
-    f"mongodb+srv://{user_enc}:{pw_enc}@{host}"
-    "/task_manager_db?retryWrites=true"
-    "&w=majority&appName=Cluster0"
-)
-
-_client: Optional[MongoClient] = None
-_db:     Optional[Database]    = None
-
-def init_db() -> Database:
+
+# pymongo, certifi and dotenv are imported on first use so that modules which
+# only import this one (e.g. the authorizer) do not pay for them at cold start.
+if TYPE_CHECKING:
+    from pymongo import MongoClient
+    from pymongo.collection import Collection
+    from pymongo.database import Database
+
+IN_LAMBDA: bool = "AWS_LAMBDA_FUNCTION_NAME" in os.environ
+DB_NAME: str = "task_manager_db"
+
+# Indexes managed by `python manage.py indexes`: (collection, keys, options).
+INDEXES: List[Tuple[str, List[Tuple[str, Any]], Dict[str, Any]]] = [
+    ("users", [("email", 1)], {"unique": True}),
+    ("tasks", [("userId", 1), ("createdAt", 1), ("_id", 1)], {}),
+    ("tasks", [("userId", 1), ("status", 1), ("updatedAt", 1)], {}),
+    ("tasks", [("userId", 1), ("updatedAt", 1), ("_id", 1)], {}),
+    # Archival candidates; only DONE tasks are indexed, and they leave once archived.
+    ("tasks", [("updatedAt", 1), ("_id", 1)], {"partialFilterExpression": {"status": "DONE"}}),
+    # Text search is scoped per user through the userId equality prefix.
+    ("tasks", [("userId", 1), ("title", "text"), ("description", "text")],
+     {"name": "task_text_search", "weights": {"title": 3, "description": 1}}),
+    ("tasks_archive", [("userId", 1), ("createdAt", 1), ("_id", 1)], {}),
+    ("tasks_archive", [("userId", 1), ("updatedAt", 1)], {}),
+    ("task_tombstones", [("expiresAt", 1)], {"expireAfterSeconds": 0}),
+    ("task_tombstones", [("userId", 1), ("deletedAt", 1), ("_id", 1)], {}),
+    ("revoked_tokens", [("expiresAt", 1)], {"expireAfterSeconds": 0}),
+    ("revoked_tokens", [("revokedAt", 1)], {}),
+    ("rate_limits", [("expiresAt", 1)], {"expireAfterSeconds": 0}),
+]
+
+_client: Optional["MongoClient"] = None
+_db:     Optional["Database"]    = None
+_async_client: Any = None
+_async_db:     Any = None
+
+def _load_env() -> None:
+    if not IN_LAMBDA:
+        from dotenv import load_dotenv
+        load_dotenv()
+
+def _mongo_uri() -> str:
+    """MONGO_URI if set, otherwise a URI built from separate Atlas credentials."""
+    uri: str = os.getenv("MONGO_URI", "")
+    if uri:
+        return uri
+
+    user: str = os.getenv("MONGO_USER", "")
+    pw:   str = os.getenv("MONGO_PASS", "")
+    host: str = os.getenv("MONGO_HOST", "")
+    if not (user and pw and host):
+        raise RuntimeError("MONGO_USER, MONGO_PASS and MONGO_HOST must be set in .env")
+
+    return (
+        f"mongodb+srv://{quote_plus(user)}:{quote_plus(pw)}@{host}"
+        f"/{DB_NAME}?retryWrites=true"
+        "&w=majority&appName=Cluster0"
+    )
+
+def client_options() -> Dict[str, Any]:
+    """MongoClient keyword arguments, tunable through MONGO_* environment variables."""
+    options: Dict[str, Any] = {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "10")),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000")),
+        "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+        "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "10000")),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        "readPreference": os.getenv("MONGO_READ_PREFERENCE", "primary"),
+    }
+    compressors: str = os.getenv("MONGO_COMPRESSORS", "")
+    if compressors:
+        options["compressors"] = compressors
+    if os.getenv("MONGO_TLS", "true").lower() in ("1", "true", "yes"):
+        import certifi
+        options["tls"] = True
+        options["tlsCAFile"] = certifi.where()
+    return options
+
+def init_db() -> "Database":
+    """
+    Return the shared database handle, creating the MongoClient on first use.
+    The client connects lazily; no round trip is made here.
+    """
     global _client, _db
     if _client is None or _db is None:
-        _client = MongoClient(
-            MONGO_URI,
-            serverSelectionTimeoutMS=5_000,
-            tls=True,
-            tlsCAFile=certifi.where(),
-        )
-        _client.admin.command("ping")
-        _db = _client.get_database("task_manager_db")
-        try:
-            _db['users'].create_index("email", unique=True)
-        except Exception:
-            pass
+        from pymongo import MongoClient
+        from metrics import command_listeners
+
+        _load_env()
+        _client = MongoClient(_mongo_uri(), event_listeners=command_listeners(), **client_options())
+        _db = _client.get_database(DB_NAME)
     return _db
 
-def get_db() -> Database:
+def init_async_db() -> Any:
+    """
+    Return the shared Motor database handle. Motor binds to the event loop that
+    is running on first use, so callers must keep using that same loop.
+    """
+    global _async_client, _async_db
+    if _async_client is None or _async_db is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        _load_env()
+        _async_client = AsyncIOMotorClient(_mongo_uri(), **client_options())
+        _async_db = _async_client.get_database(DB_NAME)
+    return _async_db
+
+def get_async_tasks_collection() -> Any:
+    from task_schema import TASKS_COLLECTION
+    return init_async_db().get_collection(TASKS_COLLECTION)
+
+def get_async_archive_collection() -> Any:
+    from task_schema import ARCHIVE_COLLECTION
+    return init_async_db().get_collection(ARCHIVE_COLLECTION)
+
+def get_async_tombstones_collection() -> Any:
+    return init_async_db().get_collection("task_tombstones")
+
+def get_async_stats_collection() -> Any:
+    return init_async_db().get_collection("task_stats")
+
+def ensure_indexes() -> List[str]:
+    """
+    Create every index in INDEXES. Run as a one-off migration, not per request.
+    Task indexes are created on the collection and field names of TASK_SCHEMA.
+    """
+    from task_schema import storage_index, storage_index_options
+
+    database = init_db()
+    names: List[str] = []
+    for collection, keys, options in INDEXES:
+        options = storage_index_options(collection, options)
+        collection, keys = storage_index(collection, keys)
+        names.append(database[collection].create_index(keys, **options))
+    return names
+
+def warm_up() -> None:
+    """
+    Open a pooled connection ahead of the first request. Called at import time
+    when MONGO_WARMUP is enabled so the handshake runs in the Lambda init phase.
+    """
+    init_db().client.admin.command("ping")
+
+def health_check() -> Dict[str, Any]:
+    """Ping over the shared pool and report round-trip latency."""
+    start: float = time.perf_counter()
+    init_db().client.admin.command("ping")
+    return {"db": "ok", "latencyMs": round((time.perf_counter() - start) * 1000, 2)}
+
+def get_db() -> "Database":
     return init_db()
 
-def get_tasks_collection() -> Collection:
-    return init_db().get_collection("tasks")
+def get_tasks_collection() -> "Collection":
+    from task_schema import TASKS_COLLECTION
+    return init_db().get_collection(TASKS_COLLECTION)
+
+def get_archive_collection() -> "Collection":
+    from task_schema import ARCHIVE_COLLECTION
+    return init_db().get_collection(ARCHIVE_COLLECTION)
+
+def get_users_collection() -> "Collection":
+    return init_db().get_collection("users")
+
+def get_tombstones_collection() -> "Collection":
+    return init_db().get_collection("task_tombstones")
+
+def get_stats_collection() -> "Collection":
+    return init_db().get_collection("task_stats")
+
+def get_revocations_collection() -> "Collection":
+    return init_db().get_collection("revoked_tokens")
+
+def get_rate_limits_collection() -> "Collection":
+    return init_db().get_collection("rate_limits")
 
-def get_users_collection() -> Collection:
-    return init_db().get_collection("users")
\ No newline at end of file
+if os.getenv("MONGO_WARMUP", "").lower() in ("1", "true", "yes"):
+    try:
+        warm_up()
+    except Exception as e:
+        print(f"Mongo warm-up failed: {e}")
@@ -1,43 +1,146 @@
 """
 Handler for serving API documentation via AWS Lambda and HTTP API.
+
+The docs page and OpenAPI spec only change with a deploy, so each is loaded
+once per container together with its gzip (and, when the optional `brotli`
+package is installed, brotli) encoding and a strong ETag per encoding.
+Requests get the best encoding their Accept-Encoding allows, a long
+Cache-Control lifetime, and 304 when If-None-Match already names the ETag.
 """
+import base64
+import hashlib
 import os
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Optional
 
-def get_docs(event: Any, context: Any) -> Dict[str, Any]:
-    """AWS Lambda handler to return the API docs HTML."""
+DOCS_MAX_AGE: int = int(os.environ.get("DOCS_MAX_AGE", "86400"))
+
+# Preference order when the client accepts several encodings.
+ENCODINGS = ("br", "gzip")
+
+# name -> {"contentType", "bodies": {encoding: bytes}, "etags": {encoding: etag}}
+_assets: Dict[str, Dict[str, Any]] = {}
+
+
+def _read(filename: str) -> str:
     project_dir = os.path.dirname(__file__)
-    docs_path = os.path.join(project_dir, 'docs', 'index.html')
-    try:
-        with open(docs_path, 'r', encoding='utf-8') as f:
-            html = f.read()
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'text/plain'},
-            'body': f'Documentation not available: {e}'
+    with open(os.path.join(project_dir, 'docs', filename), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _openapi_json() -> str:
+    import yaml
+
+    from serialization import dumps
+
+    return dumps(yaml.safe_load(_read('openapi.yaml')))
+
+
+def _encode(raw: bytes) -> Dict[str, bytes]:
+    """The identity body plus every encoding that is actually smaller."""
+    import gzip
+
+    from serialization import _brotli
+
+    bodies: Dict[str, bytes] = {"identity": raw}
+    candidates: Dict[str, bytes] = {"gzip": gzip.compress(raw, compresslevel=9, mtime=0)}
+    brotli = _brotli()
+    if brotli is not None:
+        candidates["br"] = brotli.compress(raw, quality=11)
+    for encoding, body in candidates.items():
+        if len(body) < len(raw):
+            bodies[encoding] = body
+    return bodies
+
+
+def load_asset(name: str, content_type: str, loader: Callable[[], str]) -> Dict[str, Any]:
+    """Build (once per container) the cached representations of a docs asset."""
+    asset = _assets.get(name)
+    if asset is None:
+        raw: bytes = loader().encode('utf-8')
+        digest: str = hashlib.sha256(raw).hexdigest()[:32]
+        bodies = _encode(raw)
+        asset = {
+            "contentType": content_type,
+            "bodies": bodies,
+            "etags": {e: f'"{digest}"' if e == "identity" else f'"{digest}-{e}"' for e in bodies},
         }
+        _assets[name] = asset
+    return asset
+
+
+def clear_cache() -> None:
+    """Forget loaded assets (tests, or after editing docs/ in a long-lived process)."""
+    _assets.clear()
+
+
+def _header(event: Any, name: str) -> Optional[str]:
+    headers: Dict[str, str] = (event or {}).get('headers') or {}
+    for key, value in headers.items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+
+def _choose_encoding(asset: Dict[str, Any], accept_encoding: Optional[str]) -> str:
+    if not accept_encoding:
+        return "identity"
+    from serialization import _accepted_encodings
+
+    accepted = _accepted_encodings(accept_encoding)
+    for encoding in ENCODINGS:
+        if encoding in asset["bodies"] and (encoding in accepted or "*" in accepted):
+            return encoding
+    return "identity"
+
+
+def serve_asset(event: Any, asset: Dict[str, Any]) -> Dict[str, Any]:
+    """Response for a cached asset, negotiated against the request's headers."""
+    encoding = _choose_encoding(asset, _header(event, 'Accept-Encoding'))
+    etag: str = asset["etags"][encoding]
+    headers: Dict[str, str] = {
+        'Content-Type': asset["contentType"],
+        'ETag': etag,
+        'Cache-Control': f'public, max-age={DOCS_MAX_AGE}',
+        'Vary': 'Accept-Encoding',
+    }
+    if_none_match: Optional[str] = _header(event, 'If-None-Match')
+    if if_none_match and (if_none_match.strip() == '*' or etag in [t.strip() for t in if_none_match.split(',')]):
+        return {'statusCode': 304, 'headers': headers, 'body': ''}
+    body: bytes = asset["bodies"][encoding]
+    if encoding == "identity":
+        return {'statusCode': 200, 'headers': headers, 'body': body.decode('utf-8')}
+    headers['Content-Encoding'] = encoding
     return {
         'statusCode': 200,
-        'headers': {'Content-Type': 'text/html'},
-        'body': html
+        'headers': headers,
+        'body': base64.b64encode(body).decode('ascii'),
+        'isBase64Encoded': True,
     }
 
-def get_openapi(event: Any, context: Any) -> Dict[str, Any]:
-    """AWS Lambda handler to return the raw OpenAPI YAML spec."""
-    project_dir = os.path.dirname(__file__)
-    spec_path = os.path.join(project_dir, 'docs', 'openapi.yaml')
+
+def _serve(event: Any, name: str, content_type: str, loader: Callable[[], str], error: str) -> Dict[str, Any]:
     try:
-        with open(spec_path, 'r', encoding='utf-8') as f:
-            spec = f.read()
+        asset = load_asset(name, content_type, loader)
     except Exception as e:
         return {
             'statusCode': 500,
             'headers': {'Content-Type': 'text/plain'},
-            'body': f'OpenAPI spec not available: {e}'
+            'body': f'{error}: {e}'
         }
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/yaml'},
-        'body': spec
-    }
+    return serve_asset(event, asset)
+
+
+def get_docs(event: Any, context: Any) -> Dict[str, Any]:
+    """AWS Lambda handler to return the API docs HTML."""
+    return _serve(event, 'index.html', 'text/html', lambda: _read('index.html'), 'Documentation not available')
+
+
+def get_openapi(event: Any, context: Any) -> Dict[str, Any]:
+    """AWS Lambda handler to return the raw OpenAPI YAML spec."""
+    return _serve(event, 'openapi.yaml', 'application/yaml', lambda: _read('openapi.yaml'),
+                  'OpenAPI spec not available')
+
+
+def get_openapi_json(event: Any, context: Any) -> Dict[str, Any]:
+    """AWS Lambda handler to return the OpenAPI spec rendered as JSON."""
+    return _serve(event, 'openapi.json', 'application/json', _openapi_json, 'OpenAPI spec not available')
@@ -1,76 +1,355 @@
-from typing import Any, Dict, Optional, List
+from typing import Any, Dict, Optional, List, Set, Tuple
+from email.utils import formatdate
+import hashlib
 import json
+import os
 import uuid
 import time
-from bson import ObjectId
 from bson.errors import InvalidId
-from db import get_tasks_collection
+from pagination import decode_cursor, encode_cursor, keyset_filter, parse_limit
+from search import build_results, build_search_query
+from serialization import compress_response, dumps, parse_body
+from storage import (
+    TOMBSTONE_TTL_DAYS,
+    BulkOperation,
+    TaskRepository,
+    health_check,
+    sort_key,
+    task_repository,
+)
+from task_schema import timestamp
 
 import auth_handlers
+import metrics
+import ratelimit
+import read_cache
+import stats
 
-def create_response(status_code: int, body: Any) -> Dict[str, Any]:
+ALLOWED_STATUSES: List[str] = ["TODO", "IN_PROGRESS", "DONE"]
+TASK_FIELDS: List[str] = ["title", "description", "status", "createdAt", "updatedAt", "userId"]
+PAGE_SORT_FIELDS: List[str] = ["createdAt", "_id"]
+CHANGE_SORT_FIELDS: List[str] = ["updatedAt", "_id"]
+TOMBSTONE_SORT_FIELDS: List[str] = ["deletedAt", "_id"]
+BATCH_MAX_OPERATIONS: int = int(os.environ.get("BATCH_MAX_OPERATIONS", "500"))
+
+def create_response(status_code: int, body: Any, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    with metrics.phase("serialization"):
+        response: Dict[str, Any] = {
+            "statusCode": status_code,
+            "body": dumps(body)
+        }
+    if headers:
+        response["headers"] = headers
+    return response
+
+def compressed(event: Dict[str, Any], response: Dict[str, Any]) -> Dict[str, Any]:
+    """Compress a (potentially large) response if the client's Accept-Encoding allows."""
+    with metrics.phase("compression"):
+        return compress_response(response, get_header(event, 'Accept-Encoding'))
+
+def cache_headers(etag: str, last_modified: Optional[float] = None) -> Dict[str, str]:
+    """Validator headers for a private, always-revalidated representation."""
+    headers: Dict[str, str] = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    return headers
+
+def not_modified(event: Dict[str, Any], etag: str) -> bool:
+    """True if the request's If-None-Match already names `etag`."""
+    if_none_match: Optional[str] = get_header(event, 'If-None-Match')
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(',')]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def not_modified_response(headers: Dict[str, str]) -> Dict[str, Any]:
+    return {"statusCode": 304, "headers": headers}
+
+def _id_tag(task_id: Any) -> str:
+    return hashlib.sha1(str(task_id).encode("utf-8")).hexdigest()[:12]
+
+def task_etag(task: Dict[str, Any]) -> str:
+    """Strong ETag of a task: its id tag plus `updatedAt`, usable as an If-Match version."""
+    return f'"{_id_tag(task["_id"])}-{task.get("updatedAt")!r}"'
+
+def task_headers(task: Dict[str, Any]) -> Dict[str, str]:
+    return cache_headers(task_etag(task), task.get("updatedAt"))
+
+def list_etag(user_id: str, params: Dict[str, Any], latest: Optional[float], count: int) -> str:
+    """
+    ETag of a getTasks page, derived from the user's task count and newest
+    `updatedAt` (both answered from the (userId, updatedAt) index) and the query.
+    """
+    query = "&".join(f"{k}={params[k]}" for k in sorted(params))
+    raw = f"{user_id}|{latest!r}|{count}|{query}"
+    return f'"{hashlib.sha1(raw.encode("utf-8")).hexdigest()}"'
+
+def task_list_state(tasks: TaskRepository, user_id: str, archived: bool = False) -> Tuple[Optional[float], int]:
+    """(newest updatedAt, task count) for a user, from index-only queries."""
+    query: Dict[str, Any] = {"userId": user_id}
+    latest = tasks.find(query, {"_id": 0, "updatedAt": 1}, [("updatedAt", -1)], 1, archived)
+    count: int = tasks.count(query, archived)
+    return (latest[0].get("updatedAt") if latest else None), count
+
+def restore_archived(tasks: TaskRepository, user_id: str, task_id: Any) -> bool:
+    """Move an archived task back so a write to it can go ahead; False if it is not archived."""
+    if tasks.restore(user_id, task_id) is None:
+        return False
+    read_cache.invalidate(user_id)
+    return True
+
+def get_header(event: Dict[str, Any], name: str) -> Optional[str]:
+    """Case-insensitive lookup of a request header."""
+    headers: Any = event.get('headers')
+    if not isinstance(headers, dict):
+        return None
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+def parse_version(value: str, task_id: Any = None) -> Optional[float]:
+    """
+    Parse an `If-Match` value into the `updatedAt` it names. Accepts the task's
+    ETag or a bare `updatedAt`, quoted or weak. Returns None if the ETag belongs
+    to another task; raises ValueError if the value is malformed.
+    """
+    value = value.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    value = value.strip('"')
+    if "-" in value:
+        tag, value = value.split("-", 1)
+        if task_id is not None and tag != _id_tag(task_id):
+            return None
+    return float(value)
+
+def status_error() -> str:
+    return f"Invalid status. Must be one of: {', '.join(ALLOWED_STATUSES)}"
+
+def new_task_document(user_id: str, title: str, description: str = '', now: Optional[float] = None) -> Dict[str, Any]:
+    now = timestamp() if now is None else now
+    return {
+        "_id": str(uuid.uuid4()),
+        "title": title,
+        "description": description,
+        "status": "TODO",
+        "createdAt": now,
+        "updatedAt": now,
+        "userId": user_id
+    }
+
+def build_list_query(user_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Translate getTasks query parameters into a Mongo query plan
+    (filter, projection, sort, limit). Raises ValueError on invalid input.
+    """
+    limit: int = parse_limit(params.get('limit'))
+    order: str = params.get('order', 'desc')
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be 'asc' or 'desc'")
+    descending: bool = order == "desc"
+
+    query: Dict[str, Any] = {"userId": user_id}
+    status: Optional[str] = params.get('status')
+    if status:
+        if status not in ALLOWED_STATUSES:
+            raise ValueError(status_error())
+        query["status"] = status
+    updated_since: Optional[str] = params.get('updatedSince')
+    if updated_since:
+        try:
+            query["updatedAt"] = {"$gt": float(updated_since)}
+        except ValueError:
+            raise ValueError("updatedSince must be a Unix timestamp")
+    include_archived: str = params.get('includeArchived', 'false')
+    if include_archived not in ("true", "false"):
+        raise ValueError("includeArchived must be 'true' or 'false'")
+    cursor: Optional[str] = params.get('cursor')
+    if cursor:
+        query.update(keyset_filter(PAGE_SORT_FIELDS, decode_cursor(cursor, len(PAGE_SORT_FIELDS)), descending))
+
+    projection: Optional[Dict[str, int]] = None
+    requested_fields: Optional[List[str]] = None
+    if params.get('fields'):
+        requested_fields = [f.strip() for f in params['fields'].split(',') if f.strip()]
+        unknown = [f for f in requested_fields if f not in TASK_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        projection = {f: 1 for f in requested_fields + PAGE_SORT_FIELDS}
+
+    direction: int = -1 if descending else 1
     return {
-        "statusCode": status_code,
-        "body": json.dumps(body, default=str)
+        "filter": query,
+        "projection": projection,
+        "sort": [(f, direction) for f in PAGE_SORT_FIELDS],
+        "limit": limit,
+        "fields": requested_fields,
+        "includeArchived": include_archived == "true",
     }
 
+def find_with_archive(tasks: TaskRepository, plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    One limit+1 page over the active and archived tasks: both are read with the
+    same keyset query and merged. Archived tasks are flagged `archived: true`;
+    a task found in both (mid-move) is reported once, as active.
+    """
+    n: int = plan["limit"] + 1
+    active = tasks.find(plan["filter"], plan["projection"], plan["sort"], n)
+    ids = {task["_id"] for task in active}
+    archived = [
+        {**task, "archived": True}
+        for task in tasks.find(plan["filter"], plan["projection"], plan["sort"], n, archived=True)
+        if task["_id"] not in ids
+    ]
+    return sorted(active + archived, key=sort_key(plan["sort"]))[:n]
+
+def build_page(tasks: List[Dict[str, Any]], plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Trim the limit+1 lookahead row, compute the next cursor and drop helper fields."""
+    limit: int = plan["limit"]
+    next_cursor: Optional[str] = None
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        next_cursor = encode_cursor([tasks[-1].get(f) for f in PAGE_SORT_FIELDS])
+    if plan["fields"] is not None and "createdAt" not in plan["fields"]:
+        for task in tasks:
+            task.pop("createdAt", None)
+    return {"items": tasks, "next": next_cursor}
+
+def build_changes_query(params: Dict[str, Any], now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Parse getTaskChanges query parameters into (since, limit). A missing
+    `since` starts from the beginning. Raises ValueError on invalid input and
+    LookupError if the watermark is older than the tombstone retention.
+    """
+    now = time.time() if now is None else now
+    limit: int = parse_limit(params.get('limit'))
+    since: List[Any] = [0, ""]
+    if params.get('since'):
+        since = decode_cursor(params['since'], len(CHANGE_SORT_FIELDS))
+        if not isinstance(since[0], (int, float)):
+            raise ValueError("Invalid cursor")
+        if since[0] and since[0] < now - TOMBSTONE_TTL_DAYS * 86400:
+            raise LookupError("Watermark has expired; fetch the full task list again")
+    return {"since": since, "limit": limit}
+
+def changes_queries(user_id: str, since: List[Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Filters selecting the user's tasks and tombstones after the `since` watermark."""
+    return (
+        {"userId": user_id, **keyset_filter(CHANGE_SORT_FIELDS, since, False)},
+        {"userId": user_id, **keyset_filter(TOMBSTONE_SORT_FIELDS, since, False)},
+    )
+
+def build_changes(tasks: List[Dict[str, Any]], tombstones: List[Dict[str, Any]], plan: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Merge the limit+1 lookahead rows of both collections in (timestamp, _id)
+    order, keep the first `limit` and return them with the next watermark.
+    """
+    entries: List[Tuple[float, str, Dict[str, Any]]] = [
+        (task["updatedAt"], task["_id"], task) for task in tasks
+    ] + [
+        (tomb["deletedAt"], tomb["_id"], {"taskId": tomb["_id"], "deletedAt": tomb["deletedAt"]})
+        for tomb in tombstones
+    ]
+    entries.sort(key=lambda entry: (entry[0], entry[1]))
+    page = entries[:plan["limit"]]
+    last: List[Any] = [page[-1][0], page[-1][1]] if page else plan["since"]
+    return {
+        "changes": [item for _, _, item in page if "taskId" not in item],
+        "deleted": [item for _, _, item in page if "taskId" in item],
+        "watermark": encode_cursor(last),
+        "hasMore": len(entries) > plan["limit"],
+    }
+
+def parse_task_changes(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a PATCH body into a `$set` document. Raises ValueError on invalid input."""
+    changes: Dict[str, Any] = {}
+    if 'title' in body:
+        if not body['title'] or not isinstance(body['title'], str):
+            raise ValueError("Title must be a non-empty string")
+        changes['title'] = body['title']
+    if 'description' in body:
+        if not isinstance(body['description'], str):
+            raise ValueError("Description must be a string")
+        changes['description'] = body['description']
+    if 'status' in body:
+        if body['status'] not in ALLOWED_STATUSES:
+            raise ValueError(status_error())
+        changes['status'] = body['status']
+    if not changes:
+        raise ValueError("At least one of title, description or status is required")
+    return changes
+
+@metrics.instrument
+@ratelimit.limited
 def createTask(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    user_id: Optional[str] = auth_handlers.verify_token(event)
-    if not user_id:
-        user_id = event.get('requestContext', {}).get('authorizer', {}).get('lambda', {}).get('user_id')
+    user_id: Optional[str] = auth_handlers.resolve_user(event)
     if not user_id:
         return create_response(401, {"error": "Unauthorized"})
     try:
-        body: Dict[str, Any] = json.loads(event.get('body', '{}'))
+        body: Dict[str, Any] = parse_body(event)
         title: Optional[str] = body.get('title')
         description: str = body.get('description', '')
 
         if not title:
             return create_response(400, {"error": "Title is required"})
 
-        tasks_collection = get_tasks_collection()
-        new_task: Dict[str, Any] = {
-            "_id": str(uuid.uuid4()),
-            "title": title,
-            "description": description,
-            "status": "TODO",
-            "createdAt": time.time(),
-            "updatedAt": time.time(),
-            "userId": user_id
-        }
-        result = tasks_collection.insert_one(new_task)
-
-        created_task = tasks_collection.find_one({"_id": new_task["_id"]})
-        if not created_task:
-            return create_response(500, {"error": "Failed to retrieve created task"})
-
-        return create_response(201, created_task)
+        new_task: Dict[str, Any] = new_task_document(user_id, title, description)
+        task_repository().insert(new_task)
+        read_cache.invalidate(user_id)
+        stats.record(user_id, stats.status_change(None, new_task["status"], new_task["createdAt"]))
+        return create_response(201, new_task, task_headers(new_task))
 
     except Exception as e:
         print(f"Error creating task: {e}")
         return create_response(500, {"error": "Internal Server Error"})
 
+@metrics.instrument
+@ratelimit.limited
 def getTasks(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    print("getTasks • incoming headers ->", event.get("headers"))
-    user_id: Optional[str] = auth_handlers.verify_token(event)
-    if not user_id:
-        user_id = event.get('requestContext', {}).get('authorizer', {}).get('lambda', {}).get('user_id')
-    print("getTasks • verify_token returned ->", user_id)
+    user_id: Optional[str] = auth_handlers.resolve_user(event)
     if not user_id:
         return create_response(401, {"error": "Unauthorized"})
+    params: Dict[str, Any] = event.get('queryStringParameters') or {}
     try:
-        tasks_collection = get_tasks_collection()
-        tasks: List[Dict[str, Any]] = list(tasks_collection.find({"userId": user_id}))
-        return create_response(200, tasks)
+        plan: Dict[str, Any] = build_list_query(user_id, params)
+    except ValueError as e:
+        return create_response(400, {"error": str(e)})
+
+    try:
+        key: str = read_cache.query_key("tasks", params)
+        generation = read_cache.generation(user_id)
+        response: Optional[Dict[str, Any]] = read_cache.get(user_id, key, generation)
+        if response is None:
+            tasks = task_repository()
+            latest, count = task_list_state(tasks, user_id)
+            etag: str = list_etag(user_id, params, latest, count)
+            if plan["includeArchived"]:
+                # Deleting an archived task leaves the active state unchanged.
+                etag = list_etag(user_id, {"etag": etag}, *task_list_state(tasks, user_id, archived=True))
+            headers: Dict[str, str] = cache_headers(etag, latest)
+            if not_modified(event, headers["ETag"]):
+                return not_modified_response(headers)
+
+            if plan["includeArchived"]:
+                page: List[Dict[str, Any]] = find_with_archive(tasks, plan)
+            else:
+                page = tasks.find(plan["filter"], plan["projection"], plan["sort"], plan["limit"] + 1)
+            response = create_response(200, build_page(page, plan), headers)
+            read_cache.put(user_id, key, generation, response)
+        elif not_modified(event, response["headers"]["ETag"]):
+            return not_modified_response(response["headers"])
+        return compressed(event, response)
     except Exception as e:
         print(f"Error fetching tasks: {e}")
         return create_response(500, {"error": "Internal Server Error"})
 
 
+@metrics.instrument
+@ratelimit.limited
 def updateTaskStatus(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    user_id: Optional[str] = auth_handlers.verify_token(event)
-    if not user_id:
-        user_id = event.get('requestContext', {}).get('authorizer', {}).get('lambda', {}).get('user_id')
+    user_id: Optional[str] = auth_handlers.resolve_user(event)
     if not user_id:
         return create_response(401, {"error": "Unauthorized"})
     try:
@@ -78,25 +357,25 @@ def updateTaskStatus(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         task_id: Optional[str] = params.get('taskId')
         if not task_id:
             return create_response(400, {"error": "Task ID is required"})
-        body: Dict[str, Any] = json.loads(event.get('body', '{}'))
+        body: Dict[str, Any] = parse_body(event)
         status: Optional[str] = body.get('status')
         if not status:
             return create_response(400, {"error": "Status is required"})
 
-        allowed_statuses = ["TODO", "IN_PROGRESS", "DONE"]
-        if status not in allowed_statuses:
-            return create_response(400, {"error": f"Invalid status. Must be one of: {', '.join(allowed_statuses)}"})
+        if status not in ALLOWED_STATUSES:
+            return create_response(400, {"error": status_error()})
 
-        tasks_collection = get_tasks_collection()
-        result = tasks_collection.update_one(
-            {"_id": task_id, "userId": user_id},
-            {"$set": {"status": status, "updatedAt": time.time()}}
-        )
-        if result.modified_count == 0:
+        changes: Dict[str, Any] = {"status": status, "updatedAt": timestamp()}
+        tasks = task_repository()
+        previous = tasks.update(user_id, task_id, changes)
+        if not previous and restore_archived(tasks, user_id, task_id):
+            previous = tasks.update(user_id, task_id, changes)
+        if not previous:
             return create_response(404, {"error": "Task not found"})
-
-        updated_task = tasks_collection.find_one({"_id": task_id, "userId": user_id})
-        return create_response(200, updated_task)
+        read_cache.invalidate(user_id)
+        stats.record(user_id, stats.status_change(previous.get("status"), status, changes["updatedAt"]))
+        updated_task: Dict[str, Any] = {**previous, **changes}
+        return create_response(200, updated_task, task_headers(updated_task))
     except InvalidId as e:
         return create_response(400, {"error": "Invalid Task ID"})
     except Exception as e:
@@ -104,10 +383,66 @@ def updateTaskStatus(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         return create_response(500, {"error": "Internal Server Error"})
 
 
-def deleteTask(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    user_id: Optional[str] = auth_handlers.verify_token(event)
+@metrics.instrument
+@ratelimit.limited
+def updateTask(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Partially update a task's title, description and/or status in one round trip.
+    When an `If-Match` header carrying the task's `updatedAt` is sent, the update
+    only applies if the task has not changed since, otherwise 412 is returned.
+    """
+    user_id: Optional[str] = auth_handlers.resolve_user(event)
     if not user_id:
-        user_id = event.get('requestContext', {}).get('authorizer', {}).get('lambda', {}).get('user_id')
+        return create_response(401, {"error": "Unauthorized"})
+    try:
+        params: Dict[str, Any] = event.get('pathParameters', {}) or {}
+        task_id: Optional[str] = params.get('taskId')
+        if not task_id:
+            return create_response(400, {"error": "Task ID is required"})
+        body: Dict[str, Any] = parse_body(event)
+
+        try:
+            changes: Dict[str, Any] = parse_task_changes(body)
+        except ValueError as e:
+            return create_response(400, {"error": str(e)})
+
+        version: Optional[float] = None
+        if_match: Optional[str] = get_header(event, 'If-Match')
+        if if_match:
+            try:
+                version = parse_version(if_match, task_id)
+            except ValueError:
+                return create_response(400, {"error": "Invalid If-Match header"})
+            if version is None:
+                return create_response(412, {"error": "Task has been modified"})
+
+        changes["updatedAt"] = timestamp()
+        tasks = task_repository()
+        previous = tasks.update(user_id, task_id, changes, version)
+        if not previous and restore_archived(tasks, user_id, task_id):
+            previous = tasks.update(user_id, task_id, changes, version)
+        if not previous:
+            if if_match and tasks.get(user_id, task_id, {"_id": 1}):
+                return create_response(412, {"error": "Task has been modified"})
+            return create_response(404, {"error": "Task not found"})
+        read_cache.invalidate(user_id)
+        if "status" in changes:
+            stats.record(user_id, stats.status_change(previous.get("status"), changes["status"], changes["updatedAt"]))
+        updated_task: Dict[str, Any] = {**previous, **changes}
+        return create_response(200, updated_task, task_headers(updated_task))
+    except InvalidId:
+        return create_response(400, {"error": "Invalid Task ID"})
+    except json.JSONDecodeError:
+        return create_response(400, {"error": "Invalid JSON body"})
+    except Exception as e:
+        print(f"Error updating task: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+
+@metrics.instrument
+@ratelimit.limited
+def deleteTask(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    user_id: Optional[str] = auth_handlers.resolve_user(event)
     if not user_id:
         return create_response(401, {"error": "Unauthorized"})
     try:
@@ -116,10 +451,15 @@ def deleteTask(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         if not task_id:
             return create_response(400, {"error": "Task ID is required"})
 
-        tasks_collection = get_tasks_collection()
-        result = tasks_collection.delete_one({"_id": task_id, "userId": user_id})
-        if result.deleted_count == 0:
+        now: float = time.time()
+        tasks = task_repository()
+        deleted = tasks.delete(user_id, task_id, now)
+        if not deleted and restore_archived(tasks, user_id, task_id):
+            deleted = tasks.delete(user_id, task_id, now)
+        if not deleted:
             return create_response(404, {"error": "Task not found"})
+        read_cache.invalidate(user_id)
+        stats.record(user_id, stats.status_change(deleted.get("status"), None, now))
         return {"statusCode": 204}
     except InvalidId as e:
         return create_response(400, {"error": "Invalid Task ID"})
@@ -127,11 +467,49 @@ def deleteTask(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         print(f"Error deleting task: {e}")
         return create_response(500, {"error": "Internal Server Error"})
 
+@metrics.instrument
+@ratelimit.limited
 def getTaskById(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    """Fetch a single task by ID for the authenticated user."""
-    user_id: Optional[str] = auth_handlers.verify_token(event)
+    """Fetch a single task by ID for the authenticated user, falling back to the archive."""
+    user_id: Optional[str] = auth_handlers.resolve_user(event)
     if not user_id:
-        user_id = event.get('requestContext', {}).get('authorizer', {}).get('lambda', {}).get('user_id')
+        return create_response(401, {"error": "Unauthorized"})
+    try:
+        params: Dict[str, Any] = event.get('pathParameters', {}) or {}
+        task_id: Optional[str] = params.get('taskId')
+        if not task_id:
+            return create_response(400, {"error": "Task ID is required"})
+
+        key: str = read_cache.query_key("task", {"taskId": task_id})
+        generation = read_cache.generation(user_id)
+        response: Optional[Dict[str, Any]] = read_cache.get(user_id, key, generation)
+        if response is None:
+            tasks = task_repository()
+            task = tasks.get(user_id, task_id)
+            if not task:
+                task = tasks.get(user_id, task_id, archived=True)
+                if not task:
+                    return create_response(404, {"error": "Task not found"})
+                task["archived"] = True
+            response = create_response(200, task, task_headers(task))
+            read_cache.put(user_id, key, generation, response)
+        if not_modified(event, response["headers"]["ETag"]):
+            return not_modified_response(response["headers"])
+        return response
+    except InvalidId:
+        return create_response(400, {"error": "Invalid Task ID"})
+    except Exception as e:
+        print(f"Error fetching task by ID: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+@metrics.instrument
+@ratelimit.limited
+def restoreTask(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Move an archived task back to the active tasks. Its `updatedAt` is bumped
+    so the next archival run does not pick it up again straight away.
+    """
+    user_id: Optional[str] = auth_handlers.resolve_user(event)
     if not user_id:
         return create_response(401, {"error": "Unauthorized"})
     try:
@@ -140,13 +518,207 @@ def getTaskById(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         if not task_id:
             return create_response(400, {"error": "Task ID is required"})
 
-        tasks_collection = get_tasks_collection()
-        task = tasks_collection.find_one({"_id": task_id, "userId": user_id})
-        if not task:
+        tasks = task_repository()
+        if not restore_archived(tasks, user_id, task_id):
+            active = tasks.get(user_id, task_id)
+            if not active:
+                return create_response(404, {"error": "Task not found"})
+            return create_response(200, active, task_headers(active))
+        changes: Dict[str, Any] = {"updatedAt": timestamp()}
+        previous = tasks.update(user_id, task_id, changes)
+        # A read between the restore and this bump may have cached the old version.
+        read_cache.invalidate(user_id)
+        if not previous:
             return create_response(404, {"error": "Task not found"})
-        return create_response(200, task)
+        task: Dict[str, Any] = {**previous, **changes}
+        return create_response(200, task, task_headers(task))
     except InvalidId:
         return create_response(400, {"error": "Invalid Task ID"})
     except Exception as e:
-        print(f"Error fetching task by ID: {e}")
-        return create_response(500, {"error": "Internal Server Error"})
\ No newline at end of file
+        print(f"Error restoring task: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+@metrics.instrument
+@ratelimit.limited
+def getTaskChanges(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Delta sync: tasks created or updated and tasks deleted after the `since`
+    watermark, oldest first, plus the watermark to send next time.
+    """
+    user_id: Optional[str] = auth_handlers.resolve_user(event)
+    if not user_id:
+        return create_response(401, {"error": "Unauthorized"})
+    try:
+        plan: Dict[str, Any] = build_changes_query(event.get('queryStringParameters') or {})
+    except ValueError as e:
+        return create_response(400, {"error": str(e)})
+    except LookupError as e:
+        return create_response(410, {"error": str(e)})
+
+    try:
+        fetch: int = plan["limit"] + 1
+        task_filter, tombstone_filter = changes_queries(user_id, plan["since"])
+        repository = task_repository()
+        tasks: List[Dict[str, Any]] = repository.find(task_filter, None, [(f, 1) for f in CHANGE_SORT_FIELDS], fetch)
+        tombstones: List[Dict[str, Any]] = repository.find_tombstones(
+            tombstone_filter, [(f, 1) for f in TOMBSTONE_SORT_FIELDS], fetch
+        )
+        return compressed(event, create_response(200, build_changes(tasks, tombstones, plan)))
+    except Exception as e:
+        print(f"Error fetching task changes: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+@metrics.instrument
+@ratelimit.limited
+def searchTasks(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Tasks whose title or description match `q`, best match first, with highlight snippets."""
+    user_id: Optional[str] = auth_handlers.resolve_user(event)
+    if not user_id:
+        return create_response(401, {"error": "Unauthorized"})
+    try:
+        plan: Dict[str, Any] = build_search_query(user_id, event.get('queryStringParameters') or {}, ALLOWED_STATUSES)
+    except ValueError as e:
+        return create_response(400, {"error": str(e)})
+
+    try:
+        tasks: List[Dict[str, Any]] = task_repository().search(plan)
+        return compressed(event, create_response(200, build_results(tasks, plan)))
+    except Exception as e:
+        print(f"Error searching tasks: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+@metrics.instrument
+@ratelimit.limited
+def getTaskStats(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Per-status counts and recent activity from the user's summary document."""
+    user_id: Optional[str] = auth_handlers.resolve_user(event)
+    if not user_id:
+        return create_response(401, {"error": "Unauthorized"})
+    try:
+        return create_response(200, stats.summarize(task_repository().get_stats(user_id)))
+    except Exception as e:
+        print(f"Error fetching task stats: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+@metrics.instrument
+@ratelimit.limited
+def batchTasks(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Apply up to BATCH_MAX_OPERATIONS create/updateStatus/delete operations
+    with a single unordered bulk write, returning a result per operation.
+    """
+    user_id: Optional[str] = auth_handlers.resolve_user(event)
+    if not user_id:
+        return create_response(401, {"error": "Unauthorized"})
+    try:
+        body: Dict[str, Any] = parse_body(event)
+        operations: Any = body.get('operations')
+        if not isinstance(operations, list) or not operations:
+            return create_response(400, {"error": "operations must be a non-empty list"})
+        if len(operations) > BATCH_MAX_OPERATIONS:
+            return create_response(400, {"error": f"At most {BATCH_MAX_OPERATIONS} operations are allowed per batch"})
+
+        results: List[Dict[str, Any]] = []
+        pending: List[Tuple[Dict[str, Any], BulkOperation]] = []
+        now: float = timestamp()
+        for index, op in enumerate(operations):
+            result: Dict[str, Any] = {"index": index, "op": op.get('op') if isinstance(op, dict) else None}
+            results.append(result)
+            if not isinstance(op, dict):
+                result["error"] = "Operation must be an object"
+                continue
+            kind: Any = op.get('op')
+            if kind == "create":
+                if not op.get('title'):
+                    result["error"] = "Title is required"
+                    continue
+                new_task: Dict[str, Any] = new_task_document(user_id, op['title'], op.get('description', ''), now)
+                pending.append((result, {"op": "create", "task": new_task}))
+                result["taskId"] = new_task["_id"]
+                result["task"] = new_task
+            elif kind in ("updateStatus", "delete"):
+                task_id: Any = op.get('taskId')
+                if not task_id:
+                    result["error"] = "Task ID is required"
+                    continue
+                result["taskId"] = task_id
+                if kind == "delete":
+                    pending.append((result, {"op": "delete", "taskId": task_id}))
+                else:
+                    status: Any = op.get('status')
+                    if status not in ALLOWED_STATUSES:
+                        result["error"] = status_error()
+                        continue
+                    pending.append((result, {"op": kind, "taskId": task_id, "changes": {"status": status, "updatedAt": now}}))
+            else:
+                result["error"] = "op must be one of: create, updateStatus, delete"
+
+        summary: Dict[str, int] = {"inserted": 0, "matched": 0, "modified": 0, "deleted": 0}
+        if pending:
+            tasks = task_repository()
+            # Current status of every task touched by an update or delete, to
+            # reject missing ids and adjust tombstones and stats afterwards.
+            # Archived tasks are restored first, as by the single-task endpoints.
+            target_ids: List[Any] = list(dict.fromkeys(r["taskId"] for r, _ in pending if r["op"] != "create"))
+            current: Dict[Any, Any] = tasks.statuses(user_id, target_ids) if target_ids else {}
+            restored: List[Any] = [t for t in target_ids if t not in current and restore_archived(tasks, user_id, t)]
+            if restored:
+                current.update(tasks.statuses(user_id, restored))
+            present: Set[Any] = set(current)
+            requests: List[BulkOperation] = []
+            request_results: List[Dict[str, Any]] = []
+            for result, request in pending:
+                if request["op"] != "create":
+                    if request["taskId"] not in present:
+                        result["error"] = "Task not found"
+                        continue
+                    if request["op"] == "delete":
+                        present.discard(request["taskId"])
+                requests.append(request)
+                request_results.append(result)
+            errors: Dict[int, str] = {}
+            if requests:
+                summary, errors = tasks.bulk_write(user_id, requests)
+            for index, message in errors.items():
+                failed: Dict[str, Any] = request_results[index]
+                failed.pop("task", None)
+                failed["error"] = message
+            read_cache.invalidate(user_id)
+            deleted_ids: List[Any] = []
+            increments: List[Dict[str, int]] = []
+            for result in request_results:
+                if "error" in result:
+                    continue
+                if result["op"] == "create":
+                    increments.append(stats.status_change(None, "TODO", now))
+                elif result["taskId"] in current:
+                    before: Any = current[result["taskId"]]
+                    if result["op"] == "delete":
+                        del current[result["taskId"]]
+                        deleted_ids.append(result["taskId"])
+                        increments.append(stats.status_change(before, None, now))
+                    else:
+                        current[result["taskId"]] = operations[result["index"]]["status"]
+                        increments.append(stats.status_change(before, current[result["taskId"]], now))
+            if deleted_ids:
+                tasks.add_tombstones(user_id, deleted_ids, now)
+            stats.record(user_id, stats.merge(increments))
+
+        for result in results:
+            result["ok"] = "error" not in result
+        return compressed(event, create_response(200, {"results": results, **summary}))
+    except json.JSONDecodeError:
+        return create_response(400, {"error": "Invalid JSON body"})
+    except Exception as e:
+        print(f"Error applying task batch: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+
+@metrics.instrument
+def healthCheck(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Report database reachability using the container's pooled connection."""
+    try:
+        return create_response(200, {"status": "ok", **health_check(), "cache": read_cache.metrics()})
+    except Exception as e:
+        print(f"Health check failed: {e}")
+        return create_response(503, {"status": "unavailable", "db": "unreachable"})
@@ -0,0 +1,30 @@
+"""
+Deferred construction of expensive module-level objects.
+"""
+import importlib
+from typing import Any, Callable
+
+
+class LazyObject:
+    """
+    Proxy that builds the wrapped object on first attribute access, so a module
+    can expose e.g. `jwt` or `pwd_context` without importing their dependencies
+    until a request actually needs them.
+    """
+
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        self._factory = factory
+        self._wrapped: Any = None
+
+    def _resolve(self) -> Any:
+        if self._wrapped is None:
+            self._wrapped = self._factory()
+        return self._wrapped
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._resolve(), name)
+
+
+def lazy_module(name: str) -> LazyObject:
+    """Return a proxy that imports module `name` on first attribute access."""
+    return LazyObject(lambda: importlib.import_module(name))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+One-off maintenance commands that must not run on the request path.
+
+Usage:
+    python manage.py indexes              # create/verify all MongoDB indexes
+    python manage.py migrate-passwords    # move legacy `password` fields to `hashedPassword`
+    python manage.py migrate-task-schema  # copy `tasks` and `tasks_archive` into the compact schema
+    python manage.py reconcile-stats      # rebuild per-user task stats from the tasks
+    python manage.py archive-tasks        # move long-completed tasks to `tasks_archive`
+"""
+import argparse
+import sys
+
+import archive
+import auth_handlers
+import db
+import stats
+import task_schema
+
+
+def cmd_indexes(args: argparse.Namespace) -> None:
+    for name in db.ensure_indexes():
+        print(f"index ok: {name}")
+
+
+def cmd_migrate_passwords(args: argparse.Namespace) -> None:
+    print(f"migrated {auth_handlers.migrate_legacy_passwords()} users")
+
+
+def cmd_migrate_task_schema(args: argparse.Namespace) -> None:
+    print(f"migrated {task_schema.migrate_legacy_tasks(args.batch_size, args.full)} tasks")
+
+
+def cmd_reconcile_stats(args: argparse.Namespace) -> None:
+    print(f"reconciled stats for {stats.reconcile(args.user)} users")
+
+
+def cmd_archive_tasks(args: argparse.Namespace) -> None:
+    print(f"archived {archive.archive_completed(days=args.days, batch_size=args.batch_size)} tasks")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Task manager maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    indexes = subparsers.add_parser("indexes", help="create all MongoDB indexes")
+    indexes.set_defaults(func=cmd_indexes)
+
+    passwords = subparsers.add_parser("migrate-passwords", help="migrate legacy user password fields")
+    passwords.set_defaults(func=cmd_migrate_passwords)
+
+    task_schema_cmd = subparsers.add_parser("migrate-task-schema", help="copy tasks into the compact schema")
+    task_schema_cmd.add_argument("--batch-size", type=int, default=1000)
+    task_schema_cmd.add_argument("--full", action="store_true", help="copy every task, not only those changed since the last run")
+    task_schema_cmd.set_defaults(func=cmd_migrate_task_schema)
+
+    reconcile = subparsers.add_parser("reconcile-stats", help="rebuild task stats documents from the tasks")
+    reconcile.add_argument("--user", help="only reconcile this user id")
+    reconcile.set_defaults(func=cmd_reconcile_stats)
+
+    archive_cmd = subparsers.add_parser("archive-tasks", help="move long-completed tasks to the archive")
+    archive_cmd.add_argument("--days", type=float, default=archive.ARCHIVE_AFTER_DAYS)
+    archive_cmd.add_argument("--batch-size", type=int, default=archive.ARCHIVE_BATCH_SIZE)
+    archive_cmd.set_defaults(func=cmd_archive_tasks)
+
+    args = parser.parse_args()
+    try:
+        args.func(args)
+    except Exception as e:
+        print(f"{args.command} failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
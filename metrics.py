@@ -0,0 +1,197 @@
+"""
+Per-request phase timing, emitted as CloudWatch Embedded Metric Format.
+
+`instrument` wraps a Lambda handler. While it runs, `phase("auth")` blocks and
+the Mongo command listener add their time to a per-invocation recorder (held in
+a context variable, so nothing is threaded through the handlers). When the
+handler returns, one EMF JSON line goes to stdout. CloudWatch turns it into
+metrics (Duration, AuthTime, MongoTime, SerializationTime, ResponseBytes, ...)
+with a `Function` dimension; the other fields stay queryable in Logs Insights.
+
+Every invocation is emitted, so percentiles and the cold-start rate that
+CloudWatch computes from the metric values are unbiased. Only the detail
+fields are sampled: a METRICS_SAMPLE_RATE fraction of records, plus every
+cold start and 5xx, carry the per-command Mongo breakdown and, with
+METRICS_TRACE enabled, the individual spans (phase or Mongo command, offset
+and duration) and the X-Ray trace id, to see where a slow request spent its
+time.
+
+This module must stay cheap to import: it is loaded by the authorizer path.
+"""
+import functools
+import json
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+IN_LAMBDA: bool = "AWS_LAMBDA_FUNCTION_NAME" in os.environ
+METRICS_ENABLED: bool = os.environ.get("METRICS_ENABLED", "true" if IN_LAMBDA else "false").lower() in ("1", "true", "yes")
+METRICS_NAMESPACE: str = os.environ.get("METRICS_NAMESPACE", "TaskManager")
+METRICS_SAMPLE_RATE: float = float(os.environ.get("METRICS_SAMPLE_RATE", "0.1"))
+METRICS_TRACE: bool = os.environ.get("METRICS_TRACE", "false").lower() in ("1", "true", "yes")
+
+# Phase name -> metric name; phases not listed here are still reported as spans.
+PHASE_METRICS: Dict[str, str] = {
+    "auth": "AuthTime",
+    "hash": "HashTime",
+    "serialization": "SerializationTime",
+    "compression": "CompressionTime",
+}
+
+_cold: bool = True
+
+
+class Recorder:
+    """Timings collected during one handler invocation."""
+
+    def __init__(self, function: str, cold_start: bool) -> None:
+        self.function = function
+        self.cold_start = cold_start
+        self.start = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.mongo: Dict[str, List[float]] = {}
+        self.spans: List[Dict[str, Any]] = []
+
+    def _span(self, name: str, started: float, seconds: float) -> None:
+        if METRICS_TRACE:
+            self.spans.append({
+                "name": name,
+                "startMs": round((started - self.start) * 1000, 3),
+                "durationMs": round(seconds * 1000, 3),
+            })
+
+    def add_phase(self, name: str, started: float, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+        self._span(name, started, seconds)
+
+    def add_command(self, command: str, seconds: float) -> None:
+        totals = self.mongo.setdefault(command, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += 1
+        self._span(f"mongo.{command}", time.perf_counter() - seconds, seconds)
+
+
+_current: ContextVar[Optional[Recorder]] = ContextVar("metrics_recorder", default=None)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Attribute the enclosed block's wall time to `name` in the current invocation."""
+    recorder = _current.get()
+    if recorder is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add_phase(name, started, time.perf_counter() - started)
+
+
+def record_command(command: str, duration_micros: int) -> None:
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.add_command(command, duration_micros / 1_000_000)
+
+
+def command_listeners() -> List[Any]:
+    """pymongo event listeners feeding Mongo time into the current invocation."""
+    if not METRICS_ENABLED:
+        return []
+    from pymongo import monitoring
+
+    class CommandTimer(monitoring.CommandListener):
+        def started(self, event: Any) -> None:
+            pass
+
+        def succeeded(self, event: Any) -> None:
+            record_command(event.command_name, event.duration_micros)
+
+        def failed(self, event: Any) -> None:
+            record_command(event.command_name, event.duration_micros)
+
+    return [CommandTimer()]
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+def build_record(recorder: Recorder, response: Any, context: Any = None, detailed: bool = True) -> Dict[str, Any]:
+    """The EMF document for a finished invocation; `detailed` adds the sampled breakdown fields."""
+    duration = time.perf_counter() - recorder.start
+    status: Optional[int] = response.get("statusCode") if isinstance(response, dict) else None
+    body: Any = response.get("body") if isinstance(response, dict) else None
+    values: Dict[str, Any] = {
+        "Duration": _ms(duration),
+        "ColdStart": 1 if recorder.cold_start else 0,
+        "MongoTime": _ms(sum(t for t, _ in recorder.mongo.values())),
+        "MongoCalls": sum(int(n) for _, n in recorder.mongo.values()),
+        "ResponseBytes": len(body.encode("utf-8")) if isinstance(body, str) else 0,
+    }
+    for name, metric in PHASE_METRICS.items():
+        values[metric] = _ms(recorder.phases.get(name, 0.0))
+    units = {name: "Count" if name in ("ColdStart", "MongoCalls") else "Bytes" if name == "ResponseBytes"
+             else "Milliseconds" for name in values}
+    for command, (seconds, _) in recorder.mongo.items():
+        values[f"MongoTime.{command}"] = _ms(seconds)
+        units[f"MongoTime.{command}"] = "Milliseconds"
+
+    record: Dict[str, Any] = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [["Function"]],
+                "Metrics": [{"Name": name, "Unit": unit} for name, unit in units.items()],
+            }],
+        },
+        "Function": recorder.function,
+        **values,
+        "StatusCode": status,
+    }
+    request_id = getattr(context, "aws_request_id", None)
+    if request_id:
+        record["RequestId"] = request_id
+    if not detailed:
+        return record
+    record["SampleRate"] = METRICS_SAMPLE_RATE
+    record["MongoCommands"] = {command: {"ms": _ms(t), "calls": int(n)} for command, (t, n) in recorder.mongo.items()}
+    if METRICS_TRACE:
+        record["TraceId"] = os.environ.get("_X_AMZN_TRACE_ID")
+        record["Spans"] = recorder.spans
+    return record
+
+
+def _emit(recorder: Recorder, response: Any, context: Any) -> None:
+    status = response.get("statusCode") if isinstance(response, dict) else 500
+    detailed: bool = recorder.cold_start or (status or 500) >= 500 or random.random() < METRICS_SAMPLE_RATE
+    try:
+        print(json.dumps(build_record(recorder, response, context, detailed), separators=(",", ":")))
+    except Exception as e:
+        print(f"Error emitting metrics: {e}")
+
+
+def instrument(handler: Callable[[Dict[str, Any], Any], Any]) -> Callable[[Dict[str, Any], Any], Any]:
+    """Decorator for Lambda handlers: time the invocation and emit its metrics."""
+
+    @functools.wraps(handler)
+    def wrapper(event: Dict[str, Any], context: Any) -> Any:
+        global _cold
+        if not METRICS_ENABLED:
+            return handler(event, context)
+        recorder = Recorder(handler.__name__, _cold)
+        _cold = False
+        token = _current.set(recorder)
+        response: Any = None
+        try:
+            response = handler(event, context)
+            return response
+        finally:
+            _current.reset(token)
+            _emit(recorder, response, context)
+
+    return wrapper
@@ -0,0 +1,54 @@
+"""
+Helpers for keyset (cursor) pagination over task queries.
+"""
+import base64
+import json
+from typing import Any, Dict, List, Optional
+
+DEFAULT_PAGE_SIZE: int = 50
+MAX_PAGE_SIZE: int = 200
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Encode the sort-key values of the last returned item as an opaque token."""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, size: int) -> List[Any]:
+    """Decode a token produced by `encode_cursor`, raising ValueError if it is malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def parse_limit(raw: Optional[str], default: int = DEFAULT_PAGE_SIZE, maximum: int = MAX_PAGE_SIZE) -> int:
+    """Parse the `limit` query parameter, clamping it to `maximum`."""
+    if raw is None or raw == "":
+        return default
+    try:
+        limit = int(raw)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, maximum)
+
+
+def keyset_filter(fields: List[str], values: List[Any], descending: bool) -> Dict[str, Any]:
+    """
+    Build the Mongo filter selecting documents strictly after `values`
+    in the (`fields`...) sort order.
+    """
+    op = "$lt" if descending else "$gt"
+    clauses: List[Dict[str, Any]] = []
+    for i, field in enumerate(fields):
+        clause: Dict[str, Any] = {fields[j]: values[j] for j in range(i)}
+        clause[field] = {op: values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
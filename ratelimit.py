@@ -0,0 +1,253 @@
+"""
+Per-client rate limiting for the API handlers.
+
+Every limited route has a budget of `limit` requests per `window` seconds,
+counted per user id for authenticated requests and per client IP otherwise
+(`registerUser`, `loginUser`, ...). Budgets are set per route by handler name
+in RATE_LIMITS, e.g. `loginUser=10/60,getTasks=300/60`; routes not listed use
+the `default` budget. Over budget, the handler is not run and the client gets
+429 with `Retry-After`.
+
+Each container keeps a token bucket per (route, client) in an in-process LRU,
+so a client that exceeds its budget against one container is rejected
+without any I/O. Lambda spreads a client over many containers, so when
+RATE_LIMIT_STORE is set admitted requests are also counted in a shared
+fixed-window counter (`mongo`: an atomic `$inc` upsert in the TTL-indexed
+`rate_limits` collection; `memory`: an in-process stand-in). Counts are
+added in batches of RATE_LIMIT_BATCH_FRACTION of the budget (one write per
+12 requests at 120/min), and one at a time once the last shared count seen
+is within a batch of the limit. A container can therefore admit up to a
+batch more than the budget before it sees the shared count. Once that count
+is over budget the client is blocked locally until the window ends, with no
+further writes. Counter failures are logged and the request is let through.
+"""
+import functools
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+IN_LAMBDA: bool = "AWS_LAMBDA_FUNCTION_NAME" in os.environ
+RATE_LIMIT_ENABLED: bool = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# Containers only see part of a client's traffic on Lambda, so count it centrally there.
+RATE_LIMIT_STORE: str = os.environ.get("RATE_LIMIT_STORE", "mongo" if IN_LAMBDA else "")
+# (route, client) buckets kept per container; the least recently used are dropped.
+RATE_LIMIT_MAX_KEYS: int = int(os.environ.get("RATE_LIMIT_MAX_KEYS", "10000"))
+# Fraction of a route's budget a container admits before adding it to the shared count.
+RATE_LIMIT_BATCH_FRACTION: float = float(os.environ.get("RATE_LIMIT_BATCH_FRACTION", "0.1"))
+
+DEFAULT_RATE_LIMITS: str = (
+    "default=120/60,"
+    "registerUser=5/300,loginUser=10/60,refreshToken=30/60,"
+    "searchTasks=60/60,batchTasks=30/60,exportTasks=5/60,importTasks=5/60"
+)
+
+Handler = Callable[[Dict[str, Any], Any], Any]
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[int, float]]:
+    """Parse `name=limit/seconds,...` into {name: (limit, seconds)}."""
+    limits: Dict[str, Tuple[int, float]] = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, budget = item.partition("=")
+        count, _, window = budget.partition("/")
+        limit, seconds = int(count), float(window or "60")
+        if limit < 0 or seconds <= 0:
+            raise ValueError(f"Invalid rate limit: {item.strip()}")
+        limits[name.strip()] = (limit, seconds)
+    return limits
+
+
+RATE_LIMITS: Dict[str, Tuple[int, float]] = {
+    **parse_limits(DEFAULT_RATE_LIMITS),
+    **parse_limits(os.environ.get("RATE_LIMITS", "")),
+}
+
+
+class CounterStore:
+    """Shared request counters, one per (route, client, window)."""
+
+    def incr(self, key: str, expires_at: float, amount: int = 1) -> int:
+        """Add `amount` to `key` (created at zero, dropped after `expires_at`) and return the new count."""
+        raise NotImplementedError
+
+
+class MemoryCounterStore(CounterStore):
+    """In-process stand-in for the shared store (tests, single-process runs)."""
+
+    def __init__(self) -> None:
+        self._counts: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, key: str, expires_at: float, amount: int = 1) -> int:
+        now = time.time()
+        with self._lock:
+            for expired in [k for k, (_, exp) in self._counts.items() if exp <= now]:
+                del self._counts[expired]
+            count = self._counts.get(key, (0, expires_at))[0] + amount
+            self._counts[key] = (count, expires_at)
+            return count
+
+
+class MongoCounterStore(CounterStore):
+    """Counters in `rate_limits`; the TTL index on `expiresAt` deletes past windows."""
+
+    def incr(self, key: str, expires_at: float, amount: int = 1) -> int:
+        from pymongo import ReturnDocument
+
+        from db import get_rate_limits_collection
+
+        doc = get_rate_limits_collection().find_one_and_update(
+            {"_id": key},
+            {"$inc": {"n": amount}, "$setOnInsert": {"expiresAt": datetime.fromtimestamp(expires_at, timezone.utc)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return int(doc["n"])
+
+
+def make_store(name: str) -> Optional[CounterStore]:
+    if not name:
+        return None
+    if name == "memory":
+        return MemoryCounterStore()
+    if name == "mongo":
+        return MongoCounterStore()
+    raise ValueError(f"Unsupported RATE_LIMIT_STORE: {name}")
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated", "blocked_until", "window", "pending", "shared")
+
+    def __init__(self, tokens: float, now: float) -> None:
+        self.tokens = tokens
+        self.updated = now
+        self.blocked_until = 0.0
+        # Shared window start, requests admitted but not yet counted, last shared count seen.
+        self.window = 0.0
+        self.pending = 0
+        self.shared = 0
+
+
+_store: Optional[CounterStore] = None
+_store_ready: bool = False
+_buckets: "OrderedDict[Tuple[str, str], _Bucket]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def store() -> Optional[CounterStore]:
+    global _store, _store_ready
+    if not _store_ready:
+        try:
+            _store = make_store(RATE_LIMIT_STORE)
+        except Exception as e:
+            print(f"Error configuring rate limit store: {e}")
+            _store = None
+        _store_ready = True
+    return _store
+
+
+def set_store(shared: Optional[CounterStore]) -> None:
+    """Replace the shared counter store (tests and benchmarks)."""
+    global _store, _store_ready
+    _store, _store_ready = shared, True
+
+
+def client_id(event: Dict[str, Any]) -> str:
+    """`user:<id>` for an authenticated request, otherwise `ip:<source address>`."""
+    from auth_handlers import resolve_user
+
+    try:
+        user_id: Optional[str] = resolve_user(event)
+    except Exception:
+        user_id = None
+    if user_id:
+        return f"user:{user_id}"
+    http: Dict[str, Any] = (event.get("requestContext") or {}).get("http") or {}
+    return f"ip:{http.get('sourceIp') or 'unknown'}"
+
+
+def _take(route: str, client: str, limit: int, window: float, now: float) -> float:
+    """Take a token from the local bucket; returns 0, or the seconds until one is available."""
+    with _lock:
+        bucket = _buckets.get((route, client))
+        if bucket is None:
+            bucket = _buckets[(route, client)] = _Bucket(float(limit), now)
+            while len(_buckets) > RATE_LIMIT_MAX_KEYS:
+                _buckets.popitem(last=False)
+        else:
+            _buckets.move_to_end((route, client))
+        if bucket.blocked_until > now:
+            return bucket.blocked_until - now
+        rate: float = limit / window
+        bucket.tokens = min(float(limit), bucket.tokens + (now - bucket.updated) * rate)
+        bucket.updated = now
+        if bucket.tokens < 1:
+            return (1 - bucket.tokens) / rate if rate else window
+        bucket.tokens -= 1
+        return 0.0
+
+
+def _count_shared(route: str, client: str, limit: int, window: float, now: float) -> float:
+    """Count the request in the shared window; returns 0, or the seconds until the window ends."""
+    shared = store()
+    if shared is None:
+        return 0.0
+    start: float = math.floor(now / window) * window
+    batch: int = max(1, math.ceil(limit * RATE_LIMIT_BATCH_FRACTION))
+    with _lock:
+        bucket = _buckets.get((route, client)) or _Bucket(float(limit), now)
+        if bucket.window != start:
+            bucket.window, bucket.pending, bucket.shared = start, 0, 0
+        bucket.pending += 1
+        if bucket.pending < batch and bucket.shared + batch <= limit:
+            return 0.0
+        amount, bucket.pending = bucket.pending, 0
+    try:
+        count = shared.incr(f"{route}:{client}:{int(start)}", start + window, amount)
+    except Exception as e:
+        print(f"Error counting request for rate limit: {e}")
+        return 0.0
+    with _lock:
+        if bucket.window == start:
+            bucket.shared = max(bucket.shared, count)
+        if count > limit:
+            bucket.blocked_until = start + window
+    return start + window - now if count > limit else 0.0
+
+
+def check(route: str, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The 429 response if this request is over the route's budget, else None."""
+    if not RATE_LIMIT_ENABLED:
+        return None
+    limit, window = RATE_LIMITS.get(route) or RATE_LIMITS.get("default") or (0, 0.0)
+    if not window:
+        return None
+    client: str = client_id(event)
+    now: float = time.time()
+    wait: float = _take(route, client, limit, window, now) or _count_shared(route, client, limit, window, now)
+    if not wait:
+        return None
+    from handler import create_response
+
+    return create_response(429, {"error": "Too Many Requests"}, {"Retry-After": str(max(1, math.ceil(wait)))})
+
+
+def limited(handler: Handler) -> Handler:
+    """Decorator for Lambda handlers: answer 429 instead of running `handler` when over budget."""
+    @functools.wraps(handler)
+    def wrapper(event: Dict[str, Any], context: Any) -> Any:
+        return check(handler.__name__, event) or handler(event, context)
+
+    return wrapper
+
+
+def reset() -> None:
+    """Forget all local buckets (tests)."""
+    with _lock:
+        _buckets.clear()
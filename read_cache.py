@@ -0,0 +1,324 @@
+"""
+Read cache for getTasks/getTaskById responses.
+
+Responses are cached per user and query in a bounded in-process LRU (entry
+count, total body bytes and a TTL). Every task write calls `invalidate`, which
+bumps the user's generation number; the generation is part of each cache key,
+so entries written before the bump can no longer be found and simply age out.
+A read takes the generation *before* querying Mongo, so a response computed
+concurrently with a write is stored under the old generation and never served.
+
+Lambda runs each handler in its own containers, so a write in the createTask
+container cannot reach the getTasks container's memory. Set READ_CACHE_URL to
+add a shared tier (`redis://...` for any Redis-compatible server, or
+`memory://` for an in-process stand-in): generations are then kept there
+(INCR on write, GET on read) and responses are written through to it, making
+invalidation visible to every container. Without a shared tier the cache is
+only enabled outside Lambda (the ASGI app serves all routes in one process).
+
+Cache failures never fail a request: shared-tier errors are logged and the
+request goes to Mongo as a miss.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from serialization import dumps, loads
+
+IN_LAMBDA: bool = "AWS_LAMBDA_FUNCTION_NAME" in os.environ
+READ_CACHE_URL: str = os.environ.get("READ_CACHE_URL", "")
+READ_CACHE_ENABLED: bool = os.environ.get(
+    "READ_CACHE_ENABLED", "false" if IN_LAMBDA and not READ_CACHE_URL else "true"
+).lower() in ("1", "true", "yes")
+READ_CACHE_MAX_ENTRIES: int = int(os.environ.get("READ_CACHE_MAX_ENTRIES", "1000"))
+READ_CACHE_MAX_BYTES: int = int(os.environ.get("READ_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+READ_CACHE_TTL_SECONDS: float = float(os.environ.get("READ_CACHE_TTL_SECONDS", "30"))
+READ_CACHE_TIMEOUT_MS: int = int(os.environ.get("READ_CACHE_TIMEOUT_MS", "50"))
+
+# (local generation, shared generation); None when the cache is bypassed.
+Generation = Optional[Tuple[int, int]]
+
+
+class CacheBackend:
+    """Shared cache tier. Values are bytes; keys are strings."""
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """In-process stand-in for a shared server (tests, benchmarks, single-process runs)."""
+
+    def __init__(self) -> None:
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] <= time.monotonic():
+                del self._data[key]
+                return None
+            return entry[0]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = int(self._data.get(key, (b"0", None))[0]) + 1
+            self._data[key] = (str(value).encode("ascii"), None)
+            return value
+
+
+class RedisBackend(CacheBackend):
+    """Any server speaking the Redis protocol; needs the `redis` package."""
+
+    def __init__(self, url: str) -> None:
+        import redis
+
+        timeout = READ_CACHE_TIMEOUT_MS / 1000
+        self._client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._client.set(key, value, px=max(1, int(ttl * 1000)))
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(key))
+
+
+def make_backend(url: str) -> Optional[CacheBackend]:
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return MemoryBackend()
+    if url.split("://", 1)[0] in ("redis", "rediss", "unix"):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported READ_CACHE_URL scheme: {url}")
+
+
+_backend: Optional[CacheBackend] = None
+_backend_ready: bool = False
+# key -> (response, size, expires at)
+_entries: "OrderedDict[Tuple[str, int, int, str], Tuple[Dict[str, Any], int, float]]" = OrderedDict()
+_generations: Dict[str, int] = {}
+_bytes: int = 0
+_counters: Dict[str, int] = {}
+_lock = threading.Lock()
+_COUNTERS = ("hits", "misses", "sharedHits", "evictions", "expirations", "invalidations", "errors")
+
+
+def _count(name: str, n: int = 1) -> None:
+    _counters[name] = _counters.get(name, 0) + n
+
+
+def backend() -> Optional[CacheBackend]:
+    global _backend, _backend_ready
+    if not _backend_ready:
+        try:
+            _backend = make_backend(READ_CACHE_URL)
+        except Exception as e:
+            print(f"Error configuring read cache backend: {e}")
+            _backend = None
+        _backend_ready = True
+    return _backend
+
+
+def set_backend(shared: Optional[CacheBackend]) -> None:
+    """Replace the shared tier (tests and benchmarks)."""
+    global _backend, _backend_ready
+    _backend, _backend_ready = shared, True
+
+
+def enabled() -> bool:
+    return READ_CACHE_ENABLED and READ_CACHE_MAX_ENTRIES > 0 and READ_CACHE_TTL_SECONDS > 0
+
+
+def query_key(kind: str, params: Dict[str, Any]) -> str:
+    """Stable key for a read of `kind` with the given parameters."""
+    query = "&".join(f"{k}={params[k]}" for k in sorted(params))
+    return f"{kind}:{hashlib.sha1(query.encode('utf-8')).hexdigest()}"
+
+
+def _generation_key(user_id: str) -> str:
+    return f"gen:{user_id}"
+
+
+def _shared_key(user_id: str, shared_gen: int, key: str) -> str:
+    return f"read:{user_id}:{shared_gen}:{key}"
+
+
+def generation(user_id: str) -> Generation:
+    """Current generation of a user's cached reads; take it before querying Mongo."""
+    if not enabled():
+        return None
+    shared_gen = 0
+    shared = backend()
+    if shared is not None:
+        try:
+            shared_gen = int(shared.get(_generation_key(user_id)) or 0)
+        except Exception as e:
+            print(f"Error reading cache generation: {e}")
+            with _lock:
+                _count("errors")
+            return None
+    with _lock:
+        return _generations.get(user_id, 0), shared_gen
+
+
+def _copy(response: Dict[str, Any]) -> Dict[str, Any]:
+    copy = dict(response)
+    if "headers" in copy:
+        copy["headers"] = dict(copy["headers"])
+    return copy
+
+
+def _insert(local_key: Tuple[str, int, int, str], response: Dict[str, Any], size: int, expires_at: float) -> None:
+    global _bytes
+    old = _entries.pop(local_key, None)
+    if old is not None:
+        _bytes -= old[1]
+    _entries[local_key] = (response, size, expires_at)
+    _bytes += size
+    while _entries and (len(_entries) > READ_CACHE_MAX_ENTRIES or _bytes > READ_CACHE_MAX_BYTES):
+        _, (_, evicted_size, _) = _entries.popitem(last=False)
+        _bytes -= evicted_size
+        _count("evictions")
+
+
+def get(user_id: str, key: str, gen: Generation) -> Optional[Dict[str, Any]]:
+    """A cached response for `key` at generation `gen`, or None on a miss."""
+    global _bytes
+    if gen is None:
+        return None
+    local_key = (user_id, gen[0], gen[1], key)
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(local_key)
+        if entry is not None:
+            if entry[2] > now:
+                _entries.move_to_end(local_key)
+                _count("hits")
+                return _copy(entry[0])
+            del _entries[local_key]
+            _bytes -= entry[1]
+            _count("expirations")
+
+    shared = backend()
+    if shared is not None:
+        try:
+            raw = shared.get(_shared_key(user_id, gen[1], key))
+        except Exception as e:
+            print(f"Error reading shared cache: {e}")
+            raw = None
+            with _lock:
+                _count("errors")
+        if raw is not None:
+            response: Dict[str, Any] = loads(raw)
+            with _lock:
+                _insert(local_key, response, len(raw), now + READ_CACHE_TTL_SECONDS)
+                _count("sharedHits")
+            return _copy(response)
+    with _lock:
+        _count("misses")
+    return None
+
+
+def put(user_id: str, key: str, gen: Generation, response: Dict[str, Any]) -> None:
+    """Cache a 200 response computed after `generation` returned `gen`."""
+    if gen is None or response.get("statusCode") != 200:
+        return
+    raw: str = dumps(response)
+    size: int = len(raw)
+    if size > READ_CACHE_MAX_BYTES:
+        return
+    with _lock:
+        _insert((user_id, gen[0], gen[1], key), _copy(response), size, time.monotonic() + READ_CACHE_TTL_SECONDS)
+    shared = backend()
+    if shared is not None:
+        try:
+            shared.set(_shared_key(user_id, gen[1], key), raw.encode("utf-8"), READ_CACHE_TTL_SECONDS)
+        except Exception as e:
+            print(f"Error writing shared cache: {e}")
+            with _lock:
+                _count("errors")
+
+
+def invalidate(user_id: str) -> None:
+    """Make every cached read of `user_id` unreachable; call after each task write."""
+    if not enabled():
+        return
+    with _lock:
+        # Unbounded, but one small int per user who wrote through this container.
+        _generations[user_id] = _generations.get(user_id, 0) + 1
+        _count("invalidations")
+    shared = backend()
+    if shared is not None:
+        try:
+            shared.incr(_generation_key(user_id))
+        except Exception as e:
+            # Other containers keep serving their entries until the TTL expires.
+            print(f"Error invalidating shared cache for {user_id}: {e}")
+            with _lock:
+                _count("errors")
+
+
+async def _offload(fn: Callable[..., Any], *args: Any) -> Any:
+    """Call `fn` inline, or in the default executor when a shared tier makes it do network I/O."""
+    if backend() is None:
+        return fn(*args)
+    import asyncio
+
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+async def ageneration(user_id: str) -> Generation:
+    return await _offload(generation, user_id)
+
+
+async def aget(user_id: str, key: str, gen: Generation) -> Optional[Dict[str, Any]]:
+    return await _offload(get, user_id, key, gen)
+
+
+async def aput(user_id: str, key: str, gen: Generation, response: Dict[str, Any]) -> None:
+    await _offload(put, user_id, key, gen, response)
+
+
+async def ainvalidate(user_id: str) -> None:
+    await _offload(invalidate, user_id)
+
+
+def metrics() -> Dict[str, Any]:
+    """Counters for sizing the cache, plus current occupancy."""
+    with _lock:
+        counters: Dict[str, Any] = {name: _counters.get(name, 0) for name in _COUNTERS}
+        counters["entries"] = len(_entries)
+        counters["bytes"] = _bytes
+    lookups = counters["hits"] + counters["sharedHits"] + counters["misses"]
+    counters["hitRatio"] = round((counters["hits"] + counters["sharedHits"]) / lookups, 4) if lookups else None
+    return counters
+
+
+def reset() -> None:
+    """Drop all local entries, generations and counters (tests)."""
+    global _bytes
+    with _lock:
+        _entries.clear()
+        _generations.clear()
+        _counters.clear()
+        _bytes = 0
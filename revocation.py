@@ -0,0 +1,88 @@
+"""
+Token revocation list.
+
+Revoked token ids (`jti`) are stored through the user repository; in Mongo
+that is the `revoked_tokens` collection with a TTL index on `expiresAt`, so
+entries disappear once the token would have expired anyway. Each container
+keeps an in-memory copy and pulls new entries at most every
+REVOCATION_SYNC_SECONDS, so `is_revoked` is a dict lookup on the request path
+rather than a database round trip.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from storage import user_repository
+
+REVOCATION_SYNC_SECONDS: float = float(os.environ.get("REVOCATION_SYNC_SECONDS", "30"))
+# Re-read entries this far behind the watermark to tolerate clock skew and
+# late-committing writes between containers.
+_SYNC_OVERLAP = timedelta(seconds=5)
+
+_revoked: Dict[str, float] = {}
+_watermark: Optional[datetime] = None
+_last_sync: float = 0.0
+_lock = threading.Lock()
+
+
+def revoke(jti: str, expires_at: float) -> None:
+    """Revoke token `jti` until its expiry (Unix timestamp)."""
+    now = datetime.now(timezone.utc)
+    user_repository().revoke_token(jti, now, datetime.fromtimestamp(expires_at, timezone.utc))
+    with _lock:
+        _revoked[jti] = expires_at
+
+
+def claim(jti: str, expires_at: float) -> bool:
+    """
+    Revoke token `jti` as one atomic write; False if it was already revoked,
+    here or by another container. Gate for single-use tokens.
+    """
+    now = datetime.now(timezone.utc)
+    claimed: bool = user_repository().claim_token(jti, now, datetime.fromtimestamp(expires_at, timezone.utc))
+    with _lock:
+        _revoked[jti] = expires_at
+    return claimed
+
+
+def sync(force: bool = False) -> None:
+    """Pull revocations recorded since the last sync into the local set."""
+    global _watermark, _last_sync
+    now = time.time()
+    if not force and now - _last_sync < REVOCATION_SYNC_SECONDS:
+        return
+    _last_sync = now
+    since: Optional[datetime] = _watermark - _SYNC_OVERLAP if _watermark is not None else None
+    try:
+        docs = user_repository().revoked_tokens(since)
+    except Exception as e:
+        print(f"Error syncing token revocations: {e}")
+        return
+    with _lock:
+        for doc in docs:
+            expires_at: datetime = doc["expiresAt"]
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            _revoked[doc["_id"]] = expires_at.timestamp()
+            if _watermark is None or doc["revokedAt"] > _watermark:
+                _watermark = doc["revokedAt"]
+        for jti in [j for j, exp in _revoked.items() if exp <= now]:
+            del _revoked[jti]
+
+
+def is_revoked(jti: Optional[str]) -> bool:
+    if not jti:
+        return False
+    sync()
+    return jti in _revoked
+
+
+def reset() -> None:
+    """Forget all local state (tests)."""
+    global _watermark, _last_sync
+    with _lock:
+        _revoked.clear()
+    _watermark = None
+    _last_sync = 0.0
@@ -0,0 +1,157 @@
+"""
+Single Lambda entry point for every HTTP route.
+
+Deployed with serverless.router.yml, one function serves all endpoints, so
+traffic shares one warm container fleet and each container holds one Mongo
+connection pool, token cache and read cache instead of one per endpoint.
+`route` dispatches API Gateway v2 events by `routeKey` to the same handler
+functions the per-endpoint deployment uses. Events from a catch-all route
+(`$default`, `ANY /{proxy+}`) are matched by method and path instead, with
+path parameters extracted here, OPTIONS preflights answered and 404/405
+returned for unknown paths and methods.
+
+ROUTES is also the route table of the ASGI adapter (`asgi.py`).
+"""
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import auth_handlers
+import docs_handlers
+import handler
+import transfer
+
+Handler = Callable[[Dict[str, Any], Any], Any]
+
+CORS_ALLOWED_ORIGINS: List[str] = [
+    o.strip() for o in os.environ.get("CORS_ALLOWED_ORIGINS", "http://localhost:5173").split(",") if o.strip()
+]
+CORS_ALLOWED_HEADERS: str = "Content-Type, Content-Encoding, Authorization, If-Match, If-None-Match"
+CORS_MAX_AGE: str = os.environ.get("CORS_MAX_AGE", "600")
+
+ROUTES: List[Tuple[str, str, Handler]] = [
+    ("POST", "/register", auth_handlers.registerUser),
+    ("POST", "/login", auth_handlers.loginUser),
+    ("POST", "/token/refresh", auth_handlers.refreshToken),
+    ("POST", "/logout", auth_handlers.logoutUser),
+    ("POST", "/tasks", handler.createTask),
+    ("GET", "/tasks", handler.getTasks),
+    ("POST", "/tasks/batch", handler.batchTasks),
+    ("GET", "/tasks/changes", handler.getTaskChanges),
+    ("GET", "/tasks/stats", handler.getTaskStats),
+    ("GET", "/tasks/search", handler.searchTasks),
+    ("GET", "/tasks/export", transfer.exportTasks),
+    ("POST", "/tasks/import", transfer.importTasks),
+    ("GET", "/tasks/{taskId}", handler.getTaskById),
+    ("PATCH", "/tasks/{taskId}", handler.updateTask),
+    ("DELETE", "/tasks/{taskId}", handler.deleteTask),
+    ("PUT", "/tasks/{taskId}/status", handler.updateTaskStatus),
+    ("POST", "/tasks/{taskId}/restore", handler.restoreTask),
+    ("GET", "/health", handler.healthCheck),
+    ("GET", "/docs", docs_handlers.get_docs),
+    ("GET", "/openapi.yaml", docs_handlers.get_openapi),
+    ("GET", "/openapi.json", docs_handlers.get_openapi_json),
+]
+
+ROUTE_KEYS: Dict[str, Handler] = {f"{method} {pattern}": fn for method, pattern, fn in ROUTES}
+
+
+def _match_pattern(pattern: str, segments: List[str]) -> Optional[Dict[str, str]]:
+    parts = [p for p in pattern.split("/") if p]
+    if len(parts) != len(segments):
+        return None
+    params: Dict[str, str] = {}
+    for part, segment in zip(parts, segments):
+        if part.startswith("{") and part.endswith("}"):
+            params[part[1:-1]] = segment
+        elif part != segment:
+            return None
+    return params
+
+
+def match_route(
+    method: str, path: str, routes: Optional[List[Tuple[str, str, Handler]]] = None
+) -> Tuple[Optional[Handler], Dict[str, str], str, bool]:
+    """
+    Find the handler for `method` and `path`. Returns (handler, path parameters,
+    route key, path_exists); path_exists distinguishes 405 from 404 when
+    handler is None.
+    """
+    segments = [s for s in path.split("/") if s]
+    path_exists = False
+    for route_method, pattern, fn in ROUTES if routes is None else routes:
+        params = _match_pattern(pattern, segments)
+        if params is None:
+            continue
+        path_exists = True
+        if route_method == method:
+            return fn, params, f"{route_method} {pattern}", True
+    return None, {}, "", path_exists
+
+
+def allowed_methods(path: str, routes: Optional[List[Tuple[str, str, Handler]]] = None) -> List[str]:
+    """Methods routed for `path`, plus OPTIONS; empty if the path is unknown."""
+    segments = [s for s in path.split("/") if s]
+    methods = {
+        m for m, pattern, _ in (ROUTES if routes is None else routes) if _match_pattern(pattern, segments) is not None
+    }
+    return sorted(methods) + ["OPTIONS"] if methods else []
+
+
+def cors_headers(origin: Optional[str]) -> Dict[str, str]:
+    """CORS response headers for a request from `origin` (none if it is not allowed)."""
+    if not origin:
+        return {}
+    if "*" in CORS_ALLOWED_ORIGINS:
+        return {"Access-Control-Allow-Origin": "*"}
+    if origin not in CORS_ALLOWED_ORIGINS:
+        return {}
+    return {
+        "Access-Control-Allow-Origin": origin,
+        "Access-Control-Allow-Credentials": "true",
+        "Access-Control-Expose-Headers": "ETag, Last-Modified, Retry-After",
+        "Vary": "Origin",
+    }
+
+
+def preflight(event: Dict[str, Any], methods: List[str]) -> Dict[str, Any]:
+    headers: Dict[str, str] = cors_headers(handler.get_header(event, "Origin"))
+    headers["Allow"] = ", ".join(methods)
+    if "Access-Control-Allow-Origin" in headers:
+        headers["Access-Control-Allow-Methods"] = ", ".join(methods)
+        headers["Access-Control-Allow-Headers"] = CORS_ALLOWED_HEADERS
+        headers["Access-Control-Max-Age"] = CORS_MAX_AGE
+    return {"statusCode": 204, "headers": headers, "body": ""}
+
+
+def route(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    http: Dict[str, Any] = (event.get("requestContext") or {}).get("http") or {}
+    method: str = http.get("method", "")
+    path: str = event.get("rawPath") or http.get("path") or "/"
+
+    fn: Optional[Handler] = ROUTE_KEYS.get(event.get("routeKey", ""))
+    # Routed by API Gateway itself, which also applies the CORS configuration.
+    if fn is not None:
+        return fn(event, context)
+
+    if method == "OPTIONS":
+        methods = allowed_methods(path)
+        if methods:
+            return preflight(event, methods)
+        return handler.create_response(404, {"error": "Not Found"})
+    fn, path_params, route_key, path_exists = match_route(method, path)
+    if fn is None:
+        if path_exists:
+            return handler.create_response(
+                405, {"error": "Method Not Allowed"}, {"Allow": ", ".join(allowed_methods(path))}
+            )
+        return handler.create_response(404, {"error": "Not Found"})
+    event = {**event, "routeKey": route_key, "pathParameters": path_params or None}
+    try:
+        response: Dict[str, Any] = fn(event, context)
+    except Exception as e:
+        print(f"Unhandled error in {method} {path}: {e}")
+        response = handler.create_response(500, {"error": "Internal Server Error"})
+    cors = cors_headers(handler.get_header(event, "Origin"))
+    if cors:
+        response = {**response, "headers": {**(response.get("headers") or {}), **cors}}
+    return response
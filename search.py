@@ -0,0 +1,189 @@
+"""
+Full-text search over task titles and descriptions.
+
+Queries run against the compound text index `(userId, title text, description
+text)` from `db.INDEXES`. Because `userId` is an equality prefix of the index,
+a search only walks the caller's own index entries, so its cost follows the
+number of matching tasks rather than the size of the collection.
+
+Results are ranked by Mongo's `textScore` (title matches weigh more) and
+paged with a keyset cursor over (score, _id). Highlight snippets are computed
+here from the returned documents; Mongo does not report which words matched,
+so matching is approximate (case-insensitive, on a crudely stemmed prefix).
+Storage engines without a Mongo text index (see `storage.py`) look up
+candidates in their own word index (`index_words`, `term_prefixes`), then
+score and order them with `rank`, which applies the same matching and weights.
+"""
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pagination import decode_cursor, encode_cursor, keyset_filter, parse_limit
+from task_schema import storage_filter
+
+SEARCH_SORT_FIELDS: List[str] = ["score", "_id"]
+SEARCH_FIELDS: List[str] = ["title", "description"]
+# Same weights as the `task_text_search` index in `db.INDEXES`.
+SEARCH_WEIGHTS: Dict[str, int] = {"title": 3, "description": 1}
+MAX_QUERY_LENGTH: int = 200
+DEFAULT_SEARCH_LIMIT: int = 20
+SNIPPET_CHARS: int = 120
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_PHRASE = re.compile(r'"([^"]*)"')
+_SUFFIXES: Tuple[str, ...] = ("ing", "ed", "es", "s")
+
+
+def query_terms(q: str) -> List[str]:
+    """Words of a `$search` string to highlight; negated terms (`-word`) are skipped."""
+    text: str = _PHRASE.sub(lambda m: " " + m.group(1) + " ", q)
+    terms: List[str] = []
+    for token in text.split():
+        if token.startswith("-"):
+            continue
+        terms.extend(w.lower() for w in _WORD.findall(token))
+    return list(dict.fromkeys(terms))
+
+
+def excluded_terms(q: str) -> List[str]:
+    """Negated words (`-word`) of a `$search` string."""
+    return [w.lower() for token in q.split() if token.startswith("-") for w in _WORD.findall(token)]
+
+
+def _stem(term: str) -> str:
+    for suffix in _SUFFIXES:
+        if term.endswith(suffix) and len(term) - len(suffix) >= 3:
+            return term[:-len(suffix)]
+    return term
+
+
+def match_spans(text: str, terms: List[str]) -> List[Tuple[int, int]]:
+    """(start, end) offsets of the words in `text` that start with a stemmed term."""
+    stems: List[str] = [_stem(t) for t in terms]
+    return [
+        (m.start(), m.end()) for m in _WORD.finditer(text)
+        if any(m.group().lower().startswith(stem) for stem in stems)
+    ]
+
+
+def index_words(task: Dict[str, Any]) -> Set[str]:
+    """Lower-cased words of a task's searchable fields, as keyed in a word index."""
+    return {w.lower() for field in SEARCH_FIELDS for w in _WORD.findall(task.get(field) or "")}
+
+
+def term_prefixes(terms: List[str]) -> List[str]:
+    """Prefixes to look up in a word index: a word matches a term if it starts with one."""
+    return list(dict.fromkeys(_stem(t) for t in terms))
+
+
+def snippet(text: str, terms: List[str], width: int = SNIPPET_CHARS) -> Optional[Dict[str, Any]]:
+    """
+    A window of at most `width` characters around the first match, with the
+    match offsets relative to the returned text; None if nothing matches.
+    """
+    spans: List[Tuple[int, int]] = match_spans(text, terms)
+    if not spans:
+        return None
+    start: int = 0
+    if len(text) > width:
+        start = max(0, min(spans[0][0] - width // 4, len(text) - width))
+    end: int = min(len(text), start + width)
+    prefix: str = "…" if start > 0 else ""
+    suffix: str = "…" if end < len(text) else ""
+    shift: int = len(prefix) - start
+    return {
+        "text": prefix + text[start:end] + suffix,
+        "matches": [[s + shift, e + shift] for s, e in spans if s >= start and e <= end],
+    }
+
+
+def build_search_query(user_id: str, params: Dict[str, Any], allowed_statuses: List[str]) -> Dict[str, Any]:
+    """
+    Translate searchTasks query parameters into an aggregation pipeline plan.
+    Raises ValueError on invalid input.
+    """
+    q: str = (params.get('q') or '').strip()
+    if not q:
+        raise ValueError("q is required")
+    if len(q) > MAX_QUERY_LENGTH:
+        raise ValueError(f"q must be at most {MAX_QUERY_LENGTH} characters")
+    limit: int = parse_limit(params.get('limit'), default=DEFAULT_SEARCH_LIMIT)
+
+    match: Dict[str, Any] = {"userId": user_id, "$text": {"$search": q}}
+    status: Optional[str] = params.get('status')
+    if status:
+        if status not in allowed_statuses:
+            raise ValueError(f"Invalid status. Allowed values: {', '.join(allowed_statuses)}")
+        match["status"] = status
+
+    pipeline: List[Dict[str, Any]] = [
+        {"$match": storage_filter(match)},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+    ]
+    cursor: Optional[str] = params.get('cursor')
+    after: Optional[List[Any]] = None
+    if cursor:
+        after = decode_cursor(cursor, len(SEARCH_SORT_FIELDS))
+        if not isinstance(after[0], (int, float)):
+            raise ValueError("Invalid cursor")
+        pipeline.append({"$match": storage_filter(keyset_filter(SEARCH_SORT_FIELDS, after, True))})
+    pipeline += [
+        {"$sort": {"score": -1, "_id": -1}},
+        {"$limit": limit + 1},
+    ]
+    return {
+        "pipeline": pipeline,
+        "limit": limit,
+        "terms": query_terms(q),
+        "excluded": excluded_terms(q),
+        "userId": user_id,
+        "status": status,
+        "after": after,
+    }
+
+
+def text_score(task: Dict[str, Any], terms: List[str], excluded: List[str]) -> float:
+    """Weighted count of matching words; 0 if nothing matches or a negated word does."""
+    score: float = 0.0
+    for field, weight in SEARCH_WEIGHTS.items():
+        text: str = task.get(field) or ""
+        if excluded and match_spans(text, excluded):
+            return 0.0
+        score += weight * len(match_spans(text, terms))
+    return score
+
+
+def rank(tasks: List[Dict[str, Any]], plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    The page of `tasks` (all of the user's) a text-index query would return for
+    `plan`: matches only, with `score`, ordered by (score, _id) descending.
+    """
+    results: List[Dict[str, Any]] = []
+    for task in tasks:
+        if plan["status"] and task.get("status") != plan["status"]:
+            continue
+        score = text_score(task, plan["terms"], plan["excluded"])
+        if score <= 0:
+            continue
+        task["score"] = score
+        if plan["after"] and (score, task["_id"]) >= (plan["after"][0], plan["after"][1]):
+            continue
+        results.append(task)
+    results.sort(key=lambda t: (t["score"], t["_id"]), reverse=True)
+    return results[:plan["limit"] + 1]
+
+
+def build_results(tasks: List[Dict[str, Any]], plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Trim the lookahead row, attach highlight snippets and compute the next cursor."""
+    limit: int = plan["limit"]
+    next_cursor: Optional[str] = None
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        next_cursor = encode_cursor([tasks[-1].get(f) for f in SEARCH_SORT_FIELDS])
+    for task in tasks:
+        highlights: Dict[str, Any] = {}
+        for field in SEARCH_FIELDS:
+            found = snippet(task.get(field) or "", plan["terms"])
+            if found:
+                highlights[field] = found
+        task["highlights"] = highlights
+    return {"items": tasks, "next": next_cursor}
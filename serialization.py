@@ -0,0 +1,123 @@
+"""
+JSON encoding/decoding and response compression for the handlers.
+
+Uses orjson when it is installed and falls back to the stdlib `json` module
+otherwise; both paths emit the same representation for the BSON types we
+store (ObjectId and Decimal128 as strings, datetimes as ISO 8601).
+"""
+import base64
+import datetime
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson installed
+    orjson = None
+
+# Bodies shorter than this are sent uncompressed; the framing overhead and
+# CPU cost outweigh the saving.
+COMPRESSION_MIN_BYTES: int = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL: int = int(os.environ.get("GZIP_LEVEL", "5"))
+BROTLI_QUALITY: int = int(os.environ.get("BROTLI_QUALITY", "4"))
+
+
+def _default(value: Any) -> Any:
+    # bson is imported here rather than at module level so that importing this
+    # module stays cheap for the authorizer.
+    from bson import ObjectId
+    from bson.decimal128 import Decimal128
+
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps(value: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(value, default=_default).decode("utf-8")
+    return json.dumps(value, default=_default, separators=(",", ":"))
+
+
+def loads(data: Any) -> Any:
+    """Parse JSON text or bytes. Raises json.JSONDecodeError on invalid input."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def parse_body(event: Dict[str, Any]) -> Any:
+    """Decode the JSON request body of an API Gateway event; a missing body is `{}`."""
+    body: Any = event.get('body')
+    if not body:
+        return {}
+    if event.get('isBase64Encoded'):
+        body = base64.b64decode(body)
+    return loads(body)
+
+
+def _accepted_encodings(accept_encoding: str) -> List[str]:
+    encodings: List[str] = []
+    for part in accept_encoding.split(","):
+        name, *params = part.split(";")
+        quality: float = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            encodings.append(name.strip().lower())
+    return encodings
+
+
+def _brotli() -> Optional[Any]:
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def compress_response(response: Dict[str, Any], accept_encoding: Optional[str]) -> Dict[str, Any]:
+    """
+    Compress a handler response body with brotli (if installed) or gzip when
+    the client accepts it and the body is at least COMPRESSION_MIN_BYTES.
+    """
+    body: Any = response.get("body")
+    if not accept_encoding or not isinstance(body, str) or response.get("isBase64Encoded"):
+        return response
+    raw: bytes = body.encode("utf-8")
+    if len(raw) < COMPRESSION_MIN_BYTES:
+        return response
+
+    encodings = _accepted_encodings(accept_encoding)
+    brotli = _brotli() if "br" in encodings else None
+    if brotli is not None:
+        encoding, compressed = "br", brotli.compress(raw, quality=BROTLI_QUALITY)
+    elif "gzip" in encodings or "*" in encodings:
+        import gzip
+        encoding, compressed = "gzip", gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+    else:
+        return response
+
+    headers: Dict[str, str] = dict(response.get("headers") or {})
+    # The encoded bytes differ from the identity representation, so a strong
+    # validator becomes weak (conditional requests accept both forms).
+    if "ETag" in headers and not headers["ETag"].startswith("W/"):
+        headers["ETag"] = f"W/{headers['ETag']}"
+    headers["Content-Encoding"] = encoding
+    headers["Vary"] = "Accept-Encoding"
+    return {
+        **response,
+        "headers": headers,
+        "body": base64.b64encode(compressed).decode("ascii"),
+        "isBase64Encoded": True,
+    }
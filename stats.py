@@ -0,0 +1,192 @@
+"""
+Per-user task statistics.
+
+Each user has one summary document in `task_stats`:
+
+    {"_id": userId, "total": 7, "byStatus": {"TODO": 3, "DONE": 4, ...},
+     "activity": {"2024-05-01": {"created": 2, "completed": 1, "deleted": 0}},
+     "updatedAt": <epoch seconds>}
+
+The task handlers keep it current with a single `$inc` per write, so
+`GET /tasks/stats` is one `_id` lookup. Counter updates are best effort; any
+drift (failed counter writes, races in batches) is repaired by `reconcile`,
+which recomputes the documents from the tasks (active and archived) and
+tombstones with aggregation pipelines (`python manage.py reconcile-stats`).
+"""
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from db import (
+    get_archive_collection,
+    get_async_stats_collection,
+    get_stats_collection,
+    get_tasks_collection,
+    get_tombstones_collection,
+)
+from storage import task_repository
+import task_schema
+
+STATUSES: List[str] = ["TODO", "IN_PROGRESS", "DONE"]
+ACTIVITY_KINDS: List[str] = ["created", "completed", "deleted"]
+# Days of activity returned by the endpoint and kept by reconciliation.
+STATS_ACTIVITY_DAYS: int = int(os.environ.get("STATS_ACTIVITY_DAYS", "14"))
+
+
+def day_bucket(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def status_change(before: Optional[str], after: Optional[str], now: float) -> Dict[str, int]:
+    """
+    Counter increments for one task going from status `before` to `after`;
+    `before` is None for a new task and `after` is None for a deleted one.
+    """
+    inc: Dict[str, int] = {}
+    day: str = day_bucket(now)
+    if before is None:
+        inc["total"] = 1
+        inc[f"activity.{day}.created"] = 1
+    else:
+        inc[f"byStatus.{before}"] = -1
+    if after is None:
+        inc["total"] = inc.get("total", 0) - 1
+        inc[f"activity.{day}.deleted"] = 1
+    else:
+        inc[f"byStatus.{after}"] = inc.get(f"byStatus.{after}", 0) + 1
+        if after == "DONE" and before != "DONE":
+            inc[f"activity.{day}.completed"] = 1
+    return {field: n for field, n in inc.items() if n}
+
+
+def merge(increments: Iterable[Dict[str, int]]) -> Dict[str, int]:
+    total: Dict[str, int] = defaultdict(int)
+    for inc in increments:
+        for field, n in inc.items():
+            total[field] += n
+    return {field: n for field, n in total.items() if n}
+
+
+def _update(inc: Dict[str, int]) -> Dict[str, Any]:
+    return {"$inc": inc, "$set": {"updatedAt": time.time()}}
+
+
+def record(user_id: str, inc: Dict[str, int]) -> None:
+    """Apply counter increments; failures are logged and left to `reconcile`."""
+    if not inc:
+        return
+    try:
+        task_repository().increment_stats(user_id, inc)
+    except Exception as e:
+        print(f"Error updating task stats for {user_id}: {e}")
+
+
+async def arecord(user_id: str, inc: Dict[str, int]) -> None:
+    if not inc:
+        return
+    try:
+        await get_async_stats_collection().update_one({"_id": user_id}, _update(inc), upsert=True)
+    except Exception as e:
+        print(f"Error updating task stats for {user_id}: {e}")
+
+
+def summarize(doc: Optional[Dict[str, Any]], now: Optional[float] = None) -> Dict[str, Any]:
+    """Response body for a stats document: every status and the last STATS_ACTIVITY_DAYS days."""
+    doc = doc or {}
+    now = time.time() if now is None else now
+    by_status: Dict[str, int] = doc.get("byStatus") or {}
+    activity: Dict[str, Dict[str, int]] = doc.get("activity") or {}
+    days: List[str] = [day_bucket(now - 86400 * i) for i in range(STATS_ACTIVITY_DAYS - 1, -1, -1)]
+    return {
+        "total": doc.get("total", 0),
+        "byStatus": {status: by_status.get(status, 0) for status in STATUSES},
+        "activity": [
+            {"date": day, **{kind: (activity.get(day) or {}).get(kind, 0) for kind in ACTIVITY_KINDS}}
+            for day in days
+        ],
+        "updatedAt": doc.get("updatedAt"),
+    }
+
+
+def _empty_summary() -> Dict[str, Any]:
+    return {"total": 0, "byStatus": {}, "activity": {}}
+
+
+def _day_expression(field: str) -> Dict[str, Any]:
+    """$dateToString of a task timestamp field, stored as epoch seconds or a BSON date."""
+    stored: str = f"${task_schema.FIELDS[field]}" if task_schema.COMPACT else f"${field}"
+    date: Any = stored if task_schema.COMPACT else {"$toDate": {"$multiply": [stored, 1000]}}
+    return {"$dateToString": {"format": "%Y-%m-%d", "date": date}}
+
+
+def _user_match(user_id: Optional[str], extra: Dict[str, Any]) -> Dict[str, Any]:
+    match: Dict[str, Any] = dict(extra)
+    if user_id is not None:
+        match["userId"] = user_id
+    return match
+
+
+def reconcile(user_id: Optional[str] = None, now: Optional[float] = None) -> int:
+    """
+    Rebuild the summary documents of one user (or all users) from the tasks,
+    archived tasks and tombstones. Returns the number of documents written.
+    """
+    from pymongo import ReplaceOne
+
+    now = time.time() if now is None else now
+    cutoff: float = now - 86400 * STATS_ACTIVITY_DAYS
+    user_field: str = f"${task_schema.FIELDS['userId']}" if task_schema.COMPACT else "$userId"
+    status_field: str = f"${task_schema.FIELDS['status']}" if task_schema.COMPACT else "$status"
+    stats = get_stats_collection()
+    docs: Dict[str, Dict[str, Any]] = defaultdict(_empty_summary)
+
+    def add_activity(rows: Iterable[Dict[str, Any]], kind: str) -> None:
+        for row in rows:
+            day = docs[row["_id"]["u"]]["activity"].setdefault(row["_id"]["day"], {})
+            day[kind] = day.get(kind, 0) + row["n"]
+
+    # Archived tasks still exist for the user, so they count like active ones.
+    for tasks in (get_tasks_collection(), get_archive_collection()):
+        status_rows = tasks.aggregate([
+            {"$match": task_schema.storage_filter(_user_match(user_id, {}))},
+            {"$group": {"_id": {"u": user_field, "s": status_field}, "n": {"$sum": 1}}},
+        ])
+        for row in status_rows:
+            doc = docs[row["_id"]["u"]]
+            status = task_schema.STATUS_NAMES.get(row["_id"]["s"], row["_id"]["s"]) if task_schema.COMPACT else row["_id"]["s"]
+            doc["byStatus"][status] = doc["byStatus"].get(status, 0) + row["n"]
+            doc["total"] += row["n"]
+
+        add_activity(tasks.aggregate([
+            {"$match": task_schema.storage_filter(_user_match(user_id, {"createdAt": {"$gte": cutoff}}))},
+            {"$group": {"_id": {"u": user_field, "day": _day_expression("createdAt")}, "n": {"$sum": 1}}},
+        ]), "created")
+        # Approximation: a task counts as completed on the day it was last updated
+        # while DONE; the live counters record the actual transition.
+        add_activity(tasks.aggregate([
+            {"$match": task_schema.storage_filter(
+                _user_match(user_id, {"status": "DONE", "updatedAt": {"$gte": cutoff}}))},
+            {"$group": {"_id": {"u": user_field, "day": _day_expression("updatedAt")}, "n": {"$sum": 1}}},
+        ]), "completed")
+    add_activity(get_tombstones_collection().aggregate([
+        {"$match": _user_match(user_id, {"deletedAt": {"$gte": cutoff}})},
+        {"$group": {
+            "_id": {"u": "$userId", "day": {"$dateToString": {
+                "format": "%Y-%m-%d", "date": {"$toDate": {"$multiply": ["$deletedAt", 1000]}}}}},
+            "n": {"$sum": 1},
+        }},
+    ]), "deleted")
+
+    # Users whose tasks are all gone are reset to zero rather than left stale.
+    existing: Iterable[Any] = [user_id] if user_id is not None else (d["_id"] for d in stats.find({}, {"_id": 1}))
+    for uid in existing:
+        docs.setdefault(uid, _empty_summary())
+    requests = [
+        ReplaceOne({"_id": uid}, {**doc, "updatedAt": now}, upsert=True)
+        for uid, doc in docs.items()
+    ]
+    if requests:
+        stats.bulk_write(requests, ordered=False)
+    return len(requests)
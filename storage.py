@@ -0,0 +1,340 @@
+"""
+Storage engines behind the task and user handlers.
+
+`handler.py` and `auth_handlers.py` only talk to a `TaskRepository` and a
+`UserRepository`. STORAGE_ENGINE selects the implementation:
+
+- `mongo` (default): MongoDB through pymongo (`storage_mongo.py`), with the
+  task_schema storage mapping and the indexes in `db.INDEXES`.
+- `memory`: a process-local dict store with per-user secondary indexes
+  (`storage_memory.py`), for tests, local runs and high-volume benchmarks.
+- `sqlite`: an embedded SQLite database at SQLITE_PATH with indexes matching
+  the Mongo ones (`storage_sqlite.py`), for small single-node deployments.
+
+Queries are passed in the Mongo filter vocabulary the handlers already build
+(equality, `$gt`/`$lt`-style comparisons, `$in`, `$or`/`$and` for keyset
+cursors); the memory and SQLite engines evaluate that subset with `matches`
+and `sort_key`. The Motor-based `async_handler.py`, the SSE stream and the
+maintenance commands in `manage.py` (index builds, migrations, stats
+reconciliation) remain Mongo-only.
+
+This module must stay cheap to import: it is loaded by the authorizer path.
+"""
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pagination import keyset_filter
+
+STORAGE_ENGINE: str = os.environ.get("STORAGE_ENGINE", "mongo").lower()
+SQLITE_PATH: str = os.environ.get("SQLITE_PATH", "task_manager.sqlite3")
+# Deleted tasks stay visible to /tasks/changes for this long; older watermarks get 410.
+TOMBSTONE_TTL_DAYS: int = int(os.environ.get("TOMBSTONE_TTL_DAYS", "30"))
+
+# Operation accepted by `TaskRepository.bulk_write`:
+#   {"op": "create", "task": {...}}
+#   {"op": "updateStatus", "taskId": ..., "changes": {"status": ..., "updatedAt": ...}}
+#   {"op": "delete", "taskId": ...}
+BulkOperation = Dict[str, Any]
+BULK_SUMMARY_FIELDS: Tuple[str, ...] = ("inserted", "matched", "modified", "deleted")
+# Order of `TaskRepository.scan`, served by the (userId, createdAt, _id) index.
+SCAN_SORT: List[Tuple[str, int]] = [("createdAt", 1), ("_id", 1)]
+# Order in which `TaskRepository.archive` picks tasks, oldest update first.
+ARCHIVE_SORT: List[Tuple[str, int]] = [("updatedAt", 1), ("_id", 1)]
+
+
+class DuplicateEmailError(Exception):
+    """A user with this email address already exists."""
+
+
+class TaskRepository:
+    """
+    Task, tombstone and stats-counter operations used by `handler.py`.
+
+    Reads take `archived=True` to query the archive of long-completed tasks
+    (see `archive.py`) instead of the active tasks.
+    """
+
+    def insert(self, task: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def get(
+        self, user_id: str, task_id: Any, projection: Optional[Dict[str, int]] = None, archived: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def find(
+        self,
+        query: Dict[str, Any],
+        projection: Optional[Dict[str, int]] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        limit: int = 0,
+        archived: bool = False,
+    ) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def count(self, query: Dict[str, Any], archived: bool = False) -> int:
+        raise NotImplementedError
+
+    def scan(self, user_id: str, batch_size: int, archived: bool = False) -> Iterator[List[Dict[str, Any]]]:
+        """
+        All of the user's tasks in SCAN_SORT order, in batches of at most
+        `batch_size`, so only one batch is held in memory at a time. This
+        default pages with keyset queries; engines may stream a cursor instead.
+        """
+        query: Dict[str, Any] = {"userId": user_id}
+        while True:
+            batch = self.find(query, None, SCAN_SORT, batch_size, archived)
+            if batch:
+                yield batch
+            if len(batch) < batch_size:
+                return
+            last: List[Any] = [batch[-1][field] for field, _ in SCAN_SORT]
+            query = {"userId": user_id, **keyset_filter([field for field, _ in SCAN_SORT], last, False)}
+
+    def update(
+        self, user_id: str, task_id: Any, changes: Dict[str, Any], version: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Apply `changes` to the task (only if its `updatedAt` equals `version`,
+        when given). Returns the task as it was before, or None if nothing matched.
+        """
+        raise NotImplementedError
+
+    def delete(self, user_id: str, task_id: Any, now: float) -> Optional[Dict[str, Any]]:
+        """Delete the task and record its tombstone; returns its `_id` and `status`, or None."""
+        raise NotImplementedError
+
+    def statuses(self, user_id: str, task_ids: List[Any]) -> Dict[Any, Any]:
+        """Current status of each of the user's tasks in `task_ids` that exists."""
+        raise NotImplementedError
+
+    def bulk_write(self, user_id: str, operations: List[BulkOperation]) -> Tuple[Dict[str, int], Dict[int, str]]:
+        """
+        Apply the operations unordered. Returns the counts in
+        BULK_SUMMARY_FIELDS and an error message per failed operation index.
+        """
+        raise NotImplementedError
+
+    def add_tombstones(self, user_id: str, task_ids: List[Any], now: float) -> None:
+        raise NotImplementedError
+
+    def find_tombstones(self, query: Dict[str, Any], sort: List[Tuple[str, int]], limit: int) -> List[Dict[str, Any]]:
+        """Unexpired tombstones (`_id`, `deletedAt`) matching `query`."""
+        raise NotImplementedError
+
+    def search(self, plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Tasks for a `search.build_search_query` plan, with `score`, best first."""
+        raise NotImplementedError
+
+    def archive(self, cutoff: float, limit: int) -> List[str]:
+        """
+        Move up to `limit` tasks that are DONE and were last updated before
+        `cutoff` (oldest first, ARCHIVE_SORT) to the archive. Returns the
+        owner of each moved task. Safe to repeat after a partial failure, and
+        a task changed or deleted while it is being moved stays where it is.
+        """
+        raise NotImplementedError
+
+    def restore(self, user_id: str, task_id: Any) -> Optional[Dict[str, Any]]:
+        """Move an archived task back to the active tasks; None if it is not archived."""
+        raise NotImplementedError
+
+    def increment_stats(self, user_id: str, inc: Dict[str, int]) -> None:
+        """Add `inc` (dotted counter paths) to the user's stats document."""
+        raise NotImplementedError
+
+    def get_stats(self, user_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class UserRepository:
+    """User and revoked-token operations used by `auth_handlers.py` and `revocation.py`."""
+
+    def find_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def insert(self, user: Dict[str, Any]) -> None:
+        """Raises DuplicateEmailError if the email is taken."""
+        raise NotImplementedError
+
+    def update_password_hash(self, user_id: str, current: str, new: str) -> None:
+        """Replace the user's hash, unless it has changed from `current` meanwhile."""
+        raise NotImplementedError
+
+    def revoke_token(self, jti: str, revoked_at: datetime, expires_at: datetime) -> None:
+        raise NotImplementedError
+
+    def claim_token(self, jti: str, revoked_at: datetime, expires_at: datetime) -> bool:
+        """Revoke `jti` unless it already is; True only for the call that revoked it."""
+        raise NotImplementedError
+
+    def revoked_tokens(self, since: Optional[datetime]) -> List[Dict[str, Any]]:
+        """Revocations (`_id`, `revokedAt`, `expiresAt`) recorded after `since`."""
+        raise NotImplementedError
+
+
+def tombstone_document(user_id: str, task_id: Any, now: float) -> Dict[str, Any]:
+    """Record of a deleted task; `expiresAt` drives the TTL index."""
+    return {
+        "_id": task_id,
+        "userId": user_id,
+        "deletedAt": now,
+        "expiresAt": datetime.fromtimestamp(now + TOMBSTONE_TTL_DAYS * 86400, tz=timezone.utc),
+    }
+
+
+def tombstone_requests(user_id: str, task_ids: List[Any], now: float) -> List[Any]:
+    from pymongo import ReplaceOne
+
+    return [ReplaceOne({"_id": task_id}, tombstone_document(user_id, task_id, now), upsert=True) for task_id in task_ids]
+
+
+def _compare(value: Any, op: str, operand: Any) -> bool:
+    if op == "$in":
+        return value in operand
+    if op == "$nin":
+        return value not in operand
+    if op == "$ne":
+        return value != operand
+    if op == "$exists":
+        return (value is not None) == bool(operand)
+    if op == "$eq":
+        return value == operand
+    if value is None:
+        return False
+    try:
+        if op == "$gt":
+            return value > operand
+        if op == "$gte":
+            return value >= operand
+        if op == "$lt":
+            return value < operand
+        if op == "$lte":
+            return value <= operand
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported query operator: {op}")
+
+
+def matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    """Whether `doc` satisfies a Mongo-style filter (the subset the handlers build)."""
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(doc, clause) for clause in condition):
+                return False
+        elif field == "$and":
+            if not all(matches(doc, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            if not all(_compare(doc.get(field), op, operand) for op, operand in condition.items()):
+                return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+
+class _Descending:
+    """Sort key wrapper inverting the order of a value."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def __lt__(self, other: "_Descending") -> bool:
+        return other.value < self.value
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Descending) and other.value == self.value
+
+
+def sort_key(sort: List[Tuple[str, int]]) -> Any:
+    """Key function ordering documents like a Mongo `sort` specification."""
+
+    def key(doc: Dict[str, Any]) -> Tuple[Any, ...]:
+        # (missing, value) so documents without the field sort first, as in Mongo.
+        parts = [(doc.get(f) is not None, doc.get(f) if doc.get(f) is not None else 0) for f, _ in sort]
+        return tuple(part if direction >= 0 else _Descending(part) for part, (_, direction) in zip(parts, sort))
+
+    return key
+
+
+def project(doc: Dict[str, Any], projection: Optional[Dict[str, int]]) -> Dict[str, Any]:
+    """Apply an inclusion (or `_id`-exclusion) projection to a document copy."""
+    if not projection:
+        return dict(doc)
+    included = [f for f, v in projection.items() if v]
+    if not included:
+        return {k: v for k, v in doc.items() if projection.get(k, 1)}
+    fields = set(included)
+    if projection.get("_id", 1):
+        fields.add("_id")
+    return {k: v for k, v in doc.items() if k in fields}
+
+
+def apply_increments(doc: Dict[str, Any], inc: Dict[str, int]) -> None:
+    """`$inc` with dotted paths on a plain dict."""
+    for path, n in inc.items():
+        target = doc
+        *parents, leaf = path.split(".")
+        for part in parents:
+            target = target.setdefault(part, {})
+        target[leaf] = target.get(leaf, 0) + n
+
+
+_lock = threading.Lock()
+_repositories: Dict[str, Any] = {}
+
+
+def _create(engine: str) -> Tuple[TaskRepository, UserRepository]:
+    if engine == "mongo":
+        import storage_mongo
+
+        return storage_mongo.MongoTaskRepository(), storage_mongo.MongoUserRepository()
+    if engine == "memory":
+        import storage_memory
+
+        store = storage_memory.MemoryStore()
+        return storage_memory.MemoryTaskRepository(store), storage_memory.MemoryUserRepository(store)
+    if engine == "sqlite":
+        import storage_sqlite
+
+        database = storage_sqlite.SqliteDatabase(SQLITE_PATH)
+        return storage_sqlite.SqliteTaskRepository(database), storage_sqlite.SqliteUserRepository(database)
+    raise ValueError(f"Unsupported STORAGE_ENGINE: {engine}")
+
+
+def _get(kind: str) -> Any:
+    repository = _repositories.get(kind)
+    if repository is None:
+        with _lock:
+            if not _repositories:
+                _repositories["tasks"], _repositories["users"] = _create(STORAGE_ENGINE)
+            repository = _repositories[kind]
+    return repository
+
+
+def task_repository() -> TaskRepository:
+    return _get("tasks")
+
+
+def user_repository() -> UserRepository:
+    return _get("users")
+
+
+def use_engine(engine: str) -> None:
+    """Switch engines for this process, with fresh state (tests and benchmarks)."""
+    global STORAGE_ENGINE
+    with _lock:
+        STORAGE_ENGINE = engine
+        _repositories.clear()
+
+
+def health_check() -> Dict[str, Any]:
+    if STORAGE_ENGINE == "mongo":
+        from db import health_check as mongo_health_check
+
+        return mongo_health_check()
+    return {"db": "ok", "engine": STORAGE_ENGINE}
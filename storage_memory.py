@@ -0,0 +1,325 @@
+"""
+In-memory storage engine (STORAGE_ENGINE=memory).
+
+Tasks live in a dict keyed by id, with a per-user secondary index so every
+user-scoped query only scans that user's tasks, and a per-user word index
+(word -> task ids) so a search only scores the tasks containing its terms. State is per process and is
+lost on restart; all operations hold one lock, so the store is safe to share
+between the threads of the ASGI app or a benchmark.
+"""
+import bisect
+import copy
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import search
+from storage import (
+    ARCHIVE_SORT,
+    SCAN_SORT,
+    TOMBSTONE_TTL_DAYS,
+    BulkOperation,
+    DuplicateEmailError,
+    TaskRepository,
+    UserRepository,
+    apply_increments,
+    matches,
+    project,
+    sort_key,
+)
+
+
+class MemoryStore:
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+        self.tasks: Dict[Any, Dict[str, Any]] = {}
+        self.tasks_by_user: Dict[str, Set[Any]] = {}
+        # Active tasks only, like the Mongo text index; `search_vocabulary` is
+        # the sorted key list of a user's word index, rebuilt when it changes.
+        self.search_index: Dict[str, Dict[str, Set[Any]]] = {}
+        self.search_vocabulary: Dict[str, List[str]] = {}
+        self.archive: Dict[Any, Dict[str, Any]] = {}
+        self.archive_by_user: Dict[str, Set[Any]] = {}
+        self.tombstones: Dict[Any, Dict[str, Any]] = {}
+        self.tombstones_by_user: Dict[str, Set[Any]] = {}
+        self.stats: Dict[str, Dict[str, Any]] = {}
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.users_by_email: Dict[str, str] = {}
+        self.revocations: Dict[str, Dict[str, Any]] = {}
+
+
+class MemoryTaskRepository(TaskRepository):
+    def __init__(self, store: MemoryStore) -> None:
+        self.store = store
+
+    def _tables(self, archived: bool) -> Tuple[Dict[Any, Dict[str, Any]], Dict[str, Set[Any]]]:
+        if archived:
+            return self.store.archive, self.store.archive_by_user
+        return self.store.tasks, self.store.tasks_by_user
+
+    def _candidates(self, query: Dict[str, Any], archived: bool = False) -> List[Dict[str, Any]]:
+        tasks, by_user = self._tables(archived)
+        user_id: Any = query.get("userId")
+        if isinstance(user_id, str):
+            ids: Any = by_user.get(user_id, ())
+            return [tasks[task_id] for task_id in ids]
+        return list(tasks.values())
+
+    def _owned(self, user_id: str, task_id: Any, archived: bool = False) -> Optional[Dict[str, Any]]:
+        task = self._tables(archived)[0].get(task_id)
+        return task if task is not None and task.get("userId") == user_id else None
+
+    def _index(self, task: Dict[str, Any]) -> None:
+        index = self.store.search_index.setdefault(task["userId"], {})
+        for word in search.index_words(task):
+            if word not in index:
+                index[word] = set()
+                self.store.search_vocabulary.pop(task["userId"], None)
+            index[word].add(task["_id"])
+
+    def _unindex(self, task: Dict[str, Any]) -> None:
+        index = self.store.search_index.get(task["userId"], {})
+        for word in search.index_words(task):
+            ids = index.get(word)
+            if ids is None:
+                continue
+            ids.discard(task["_id"])
+            if not ids:
+                del index[word]
+                self.store.search_vocabulary.pop(task["userId"], None)
+
+    def _insert(self, task: Dict[str, Any]) -> None:
+        if task["_id"] in self.store.tasks:
+            raise ValueError(f"Duplicate task id: {task['_id']}")
+        self.store.tasks[task["_id"]] = dict(task)
+        self.store.tasks_by_user.setdefault(task["userId"], set()).add(task["_id"])
+        self._index(task)
+
+    def _remove(self, task_id: Any) -> Dict[str, Any]:
+        task = self.store.tasks.pop(task_id)
+        self.store.tasks_by_user.get(task["userId"], set()).discard(task_id)
+        self._unindex(task)
+        return task
+
+    def insert(self, task: Dict[str, Any]) -> None:
+        with self.store.lock:
+            self._insert(task)
+
+    def get(
+        self, user_id: str, task_id: Any, projection: Optional[Dict[str, int]] = None, archived: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        with self.store.lock:
+            task = self._owned(user_id, task_id, archived)
+            return project(task, projection) if task is not None else None
+
+    def find(
+        self,
+        query: Dict[str, Any],
+        projection: Optional[Dict[str, int]] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        limit: int = 0,
+        archived: bool = False,
+    ) -> List[Dict[str, Any]]:
+        with self.store.lock:
+            found = [task for task in self._candidates(query, archived) if matches(task, query)]
+            if sort:
+                found.sort(key=sort_key(sort))
+            if limit:
+                found = found[:limit]
+            return [project(task, projection) for task in found]
+
+    def count(self, query: Dict[str, Any], archived: bool = False) -> int:
+        with self.store.lock:
+            return sum(1 for task in self._candidates(query, archived) if matches(task, query))
+
+    def scan(self, user_id: str, batch_size: int, archived: bool = False) -> Iterator[List[Dict[str, Any]]]:
+        # Order the ids once rather than re-sorting the user's tasks per page;
+        # tasks deleted during the scan are skipped.
+        table = self._tables(archived)[0]
+        with self.store.lock:
+            tasks = self._candidates({"userId": user_id}, archived)
+            tasks.sort(key=sort_key(SCAN_SORT))
+            ids: List[Any] = [task["_id"] for task in tasks]
+        for start in range(0, len(ids), batch_size):
+            with self.store.lock:
+                batch = [dict(table[i]) for i in ids[start:start + batch_size] if i in table]
+            if batch:
+                yield batch
+
+    def _update(self, user_id: str, task_id: Any, changes: Dict[str, Any], version: Optional[float]) -> Optional[Dict[str, Any]]:
+        task = self._owned(user_id, task_id)
+        if task is None or (version is not None and task.get("updatedAt") != version):
+            return None
+        previous = dict(task)
+        task.update(changes)
+        if any(field in changes for field in search.SEARCH_FIELDS):
+            self._unindex(previous)
+            self._index(task)
+        return previous
+
+    def update(
+        self, user_id: str, task_id: Any, changes: Dict[str, Any], version: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        with self.store.lock:
+            return self._update(user_id, task_id, changes, version)
+
+    def delete(self, user_id: str, task_id: Any, now: float) -> Optional[Dict[str, Any]]:
+        with self.store.lock:
+            if self._owned(user_id, task_id) is None:
+                return None
+            task = self._remove(task_id)
+            self._add_tombstones(user_id, [task_id], now)
+            return {"_id": task["_id"], "status": task.get("status")}
+
+    def statuses(self, user_id: str, task_ids: List[Any]) -> Dict[Any, Any]:
+        with self.store.lock:
+            return {
+                task_id: task.get("status") for task_id in task_ids
+                for task in [self._owned(user_id, task_id)] if task is not None
+            }
+
+    def bulk_write(self, user_id: str, operations: List[BulkOperation]) -> Tuple[Dict[str, int], Dict[int, str]]:
+        summary: Dict[str, int] = {"inserted": 0, "matched": 0, "modified": 0, "deleted": 0}
+        errors: Dict[int, str] = {}
+        with self.store.lock:
+            for index, op in enumerate(operations):
+                if op["op"] == "create":
+                    try:
+                        self._insert(op["task"])
+                    except ValueError as e:
+                        errors[index] = str(e)
+                        continue
+                    summary["inserted"] += 1
+                elif op["op"] == "delete":
+                    if self._owned(user_id, op["taskId"]) is not None:
+                        self._remove(op["taskId"])
+                        summary["deleted"] += 1
+                else:
+                    previous = self._update(user_id, op["taskId"], op["changes"], None)
+                    if previous is not None:
+                        summary["matched"] += 1
+                        if any(previous.get(k) != v for k, v in op["changes"].items()):
+                            summary["modified"] += 1
+        return summary, errors
+
+    def _add_tombstones(self, user_id: str, task_ids: List[Any], now: float) -> None:
+        expires_at: float = now + TOMBSTONE_TTL_DAYS * 86400
+        for task_id in task_ids:
+            self.store.tombstones[task_id] = {"_id": task_id, "userId": user_id, "deletedAt": now, "expiresAt": expires_at}
+            self.store.tombstones_by_user.setdefault(user_id, set()).add(task_id)
+
+    def add_tombstones(self, user_id: str, task_ids: List[Any], now: float) -> None:
+        with self.store.lock:
+            self._add_tombstones(user_id, task_ids, now)
+
+    def find_tombstones(self, query: Dict[str, Any], sort: List[Tuple[str, int]], limit: int) -> List[Dict[str, Any]]:
+        now: float = time.time()
+        with self.store.lock:
+            user_id: Any = query.get("userId")
+            ids: Any = self.store.tombstones_by_user.get(user_id, ()) if isinstance(user_id, str) else self.store.tombstones
+            expired: List[Any] = []
+            found: List[Dict[str, Any]] = []
+            for task_id in ids:
+                tombstone = self.store.tombstones[task_id]
+                if tombstone["expiresAt"] <= now:
+                    expired.append(task_id)
+                elif matches(tombstone, query):
+                    found.append(tombstone)
+            for task_id in expired:
+                tombstone = self.store.tombstones.pop(task_id)
+                self.store.tombstones_by_user.get(tombstone["userId"], set()).discard(task_id)
+            found.sort(key=sort_key(sort))
+            return [{"_id": t["_id"], "deletedAt": t["deletedAt"]} for t in found[:limit]]
+
+    def search(self, plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+        user_id: str = plan["userId"]
+        ids: Set[Any] = set()
+        with self.store.lock:
+            index = self.store.search_index.get(user_id, {})
+            vocabulary = self.store.search_vocabulary.get(user_id)
+            if vocabulary is None:
+                vocabulary = self.store.search_vocabulary[user_id] = sorted(index)
+            # Words starting with a prefix are a contiguous run of the sorted vocabulary.
+            for prefix in search.term_prefixes(plan["terms"]):
+                position = bisect.bisect_left(vocabulary, prefix)
+                while position < len(vocabulary) and vocabulary[position].startswith(prefix):
+                    ids |= index[vocabulary[position]]
+                    position += 1
+            tasks = [dict(self.store.tasks[task_id]) for task_id in ids]
+        return search.rank(tasks, plan)
+
+    def archive(self, cutoff: float, limit: int) -> List[str]:
+        with self.store.lock:
+            due = [task for task in self.store.tasks.values()
+                   if task.get("status") == "DONE" and task.get("updatedAt", cutoff) < cutoff]
+            due.sort(key=sort_key(ARCHIVE_SORT))
+            moved: List[str] = []
+            for task in due[:limit]:
+                self._remove(task["_id"])
+                self.store.archive[task["_id"]] = task
+                self.store.archive_by_user.setdefault(task["userId"], set()).add(task["_id"])
+                moved.append(task["userId"])
+            return moved
+
+    def restore(self, user_id: str, task_id: Any) -> Optional[Dict[str, Any]]:
+        with self.store.lock:
+            if self._owned(user_id, task_id, archived=True) is None:
+                return None
+            task = self.store.archive.pop(task_id)
+            self.store.archive_by_user.get(user_id, set()).discard(task_id)
+            if task_id not in self.store.tasks:
+                self._insert(task)
+            return dict(self.store.tasks[task_id])
+
+    def increment_stats(self, user_id: str, inc: Dict[str, int]) -> None:
+        with self.store.lock:
+            doc = self.store.stats.setdefault(user_id, {"_id": user_id})
+            apply_increments(doc, inc)
+            doc["updatedAt"] = time.time()
+
+    def get_stats(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self.store.lock:
+            doc = self.store.stats.get(user_id)
+            return copy.deepcopy(doc) if doc is not None else None
+
+
+class MemoryUserRepository(UserRepository):
+    def __init__(self, store: MemoryStore) -> None:
+        self.store = store
+
+    def find_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        with self.store.lock:
+            user_id = self.store.users_by_email.get(email)
+            return dict(self.store.users[user_id]) if user_id is not None else None
+
+    def insert(self, user: Dict[str, Any]) -> None:
+        with self.store.lock:
+            if user["email"] in self.store.users_by_email:
+                raise DuplicateEmailError(user["email"])
+            self.store.users[user["_id"]] = dict(user)
+            self.store.users_by_email[user["email"]] = user["_id"]
+
+    def update_password_hash(self, user_id: str, current: str, new: str) -> None:
+        with self.store.lock:
+            user = self.store.users.get(user_id)
+            if user is not None and user.get("hashedPassword") == current:
+                user["hashedPassword"] = new
+
+    def revoke_token(self, jti: str, revoked_at: datetime, expires_at: datetime) -> None:
+        with self.store.lock:
+            self.store.revocations[jti] = {"_id": jti, "revokedAt": revoked_at, "expiresAt": expires_at}
+
+    def claim_token(self, jti: str, revoked_at: datetime, expires_at: datetime) -> bool:
+        with self.store.lock:
+            if jti in self.store.revocations:
+                return False
+            self.store.revocations[jti] = {"_id": jti, "revokedAt": revoked_at, "expiresAt": expires_at}
+            return True
+
+    def revoked_tokens(self, since: Optional[datetime]) -> List[Dict[str, Any]]:
+        now: float = time.time()
+        with self.store.lock:
+            for jti in [j for j, doc in self.store.revocations.items() if doc["expiresAt"].timestamp() <= now]:
+                del self.store.revocations[jti]
+            return [dict(doc) for doc in self.store.revocations.values() if since is None or doc["revokedAt"] > since]
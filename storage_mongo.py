@@ -0,0 +1,229 @@
+"""
+MongoDB storage engine (the default): the repository operations as pymongo
+calls on the collections from `db`, mapped through `task_schema`.
+"""
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pymongo import DeleteOne, InsertOne, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from db import (
+    get_archive_collection,
+    get_revocations_collection,
+    get_stats_collection,
+    get_tasks_collection,
+    get_tombstones_collection,
+    get_users_collection,
+)
+from storage import ARCHIVE_SORT, SCAN_SORT, BulkOperation, DuplicateEmailError, TaskRepository, UserRepository, tombstone_requests
+from task_schema import (
+    from_storage,
+    storage_filter,
+    storage_projection,
+    storage_sort,
+    storage_update,
+    to_storage,
+)
+
+
+def _collection(archived: bool) -> Any:
+    return get_archive_collection() if archived else get_tasks_collection()
+
+
+class MongoTaskRepository(TaskRepository):
+    def insert(self, task: Dict[str, Any]) -> None:
+        get_tasks_collection().insert_one(to_storage(task))
+
+    def get(
+        self, user_id: str, task_id: Any, projection: Optional[Dict[str, int]] = None, archived: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        query: Dict[str, Any] = storage_filter({"_id": task_id, "userId": user_id})
+        if projection is None:
+            return from_storage(_collection(archived).find_one(query))
+        return from_storage(_collection(archived).find_one(query, storage_projection(projection)))
+
+    def find(
+        self,
+        query: Dict[str, Any],
+        projection: Optional[Dict[str, int]] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        limit: int = 0,
+        archived: bool = False,
+    ) -> List[Dict[str, Any]]:
+        cursor: Any = _collection(archived).find(storage_filter(query), storage_projection(projection))
+        if sort:
+            cursor = cursor.sort(storage_sort(sort))
+        if limit:
+            cursor = cursor.limit(limit)
+        return [from_storage(doc) for doc in cursor]
+
+    def count(self, query: Dict[str, Any], archived: bool = False) -> int:
+        return _collection(archived).count_documents(storage_filter(query))
+
+    def scan(self, user_id: str, batch_size: int, archived: bool = False) -> Iterator[List[Dict[str, Any]]]:
+        # One cursor for the whole scan: the server returns `batch_size`
+        # documents per getMore, and only the current batch is held here.
+        cursor: Any = _collection(archived).find(storage_filter({"userId": user_id})).sort(storage_sort(SCAN_SORT))
+        batch: List[Dict[str, Any]] = []
+        for doc in cursor.batch_size(batch_size):
+            batch.append(from_storage(doc))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def update(
+        self, user_id: str, task_id: Any, changes: Dict[str, Any], version: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        query: Dict[str, Any] = {"_id": task_id, "userId": user_id}
+        if version is not None:
+            query["updatedAt"] = version
+        return from_storage(get_tasks_collection().find_one_and_update(
+            storage_filter(query),
+            storage_update({"$set": changes}),
+            return_document=ReturnDocument.BEFORE
+        ))
+
+    def delete(self, user_id: str, task_id: Any, now: float) -> Optional[Dict[str, Any]]:
+        deleted = from_storage(get_tasks_collection().find_one_and_delete(
+            storage_filter({"_id": task_id, "userId": user_id}),
+            projection=storage_projection({"status": 1})
+        ))
+        if deleted:
+            self.add_tombstones(user_id, [task_id], now)
+        return deleted
+
+    def statuses(self, user_id: str, task_ids: List[Any]) -> Dict[Any, Any]:
+        current: Dict[Any, Any] = {}
+        for doc in get_tasks_collection().find(
+            storage_filter({"_id": {"$in": task_ids}, "userId": user_id}),
+            storage_projection({"status": 1})
+        ):
+            task = from_storage(doc)
+            current[task["_id"]] = task.get("status")
+        return current
+
+    def bulk_write(self, user_id: str, operations: List[BulkOperation]) -> Tuple[Dict[str, int], Dict[int, str]]:
+        requests: List[Any] = []
+        for op in operations:
+            if op["op"] == "create":
+                requests.append(InsertOne(to_storage(op["task"])))
+            elif op["op"] == "delete":
+                requests.append(DeleteOne(storage_filter({"_id": op["taskId"], "userId": user_id})))
+            else:
+                requests.append(UpdateOne(
+                    storage_filter({"_id": op["taskId"], "userId": user_id}),
+                    storage_update({"$set": op["changes"]})
+                ))
+        errors: Dict[int, str] = {}
+        try:
+            details: Dict[str, Any] = get_tasks_collection().bulk_write(requests, ordered=False).bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            for write_error in details.get("writeErrors", []):
+                errors[write_error["index"]] = write_error.get("errmsg", "Write failed")
+        summary: Dict[str, int] = {
+            "inserted": details.get("nInserted", 0),
+            "matched": details.get("nMatched", 0),
+            "modified": details.get("nModified", 0),
+            "deleted": details.get("nRemoved", 0),
+        }
+        return summary, errors
+
+    def add_tombstones(self, user_id: str, task_ids: List[Any], now: float) -> None:
+        get_tombstones_collection().bulk_write(tombstone_requests(user_id, task_ids, now), ordered=False)
+
+    def find_tombstones(self, query: Dict[str, Any], sort: List[Tuple[str, int]], limit: int) -> List[Dict[str, Any]]:
+        return list(get_tombstones_collection().find(query, {"deletedAt": 1}).sort(sort).limit(limit))
+
+    def search(self, plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [from_storage(doc) for doc in get_tasks_collection().aggregate(plan["pipeline"])]
+
+    def archive(self, cutoff: float, limit: int) -> List[str]:
+        tasks = get_tasks_collection()
+        archive = get_archive_collection()
+        candidates: List[Dict[str, Any]] = list(
+            tasks.find(storage_filter({"status": "DONE", "updatedAt": {"$lt": cutoff}}))
+            .sort(storage_sort(ARCHIVE_SORT))
+            .limit(limit)
+        )
+        if not candidates:
+            return []
+        # Copy first, then delete only copies whose source is unchanged. A
+        # crash in between leaves a duplicate that the next run overwrites.
+        archive.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in candidates], ordered=False)
+        moved: List[Dict[str, Any]] = [from_storage(doc) for doc in candidates]
+        result: Any = tasks.bulk_write([
+            DeleteOne(storage_filter({"_id": task["_id"], "updatedAt": task["updatedAt"], "status": "DONE"}))
+            for task in moved
+        ], ordered=False)
+        if result.deleted_count < len(moved):
+            # Updated or deleted meanwhile: the hot copy (or the tombstone) wins.
+            # Tombstones are keyed by public id, so compare everything in that form.
+            ids: List[Any] = [task["_id"] for task in moved]
+            kept = {from_storage(doc)["_id"] for doc in tasks.find(storage_filter({"_id": {"$in": ids}}), {"_id": 1})}
+            kept.update(doc["_id"] for doc in get_tombstones_collection().find({"_id": {"$in": ids}}, {"_id": 1}))
+            archive.delete_many(storage_filter({"_id": {"$in": list(kept)}}))
+            moved = [task for task in moved if task["_id"] not in kept]
+        return [task["userId"] for task in moved]
+
+    def restore(self, user_id: str, task_id: Any) -> Optional[Dict[str, Any]]:
+        query: Dict[str, Any] = storage_filter({"_id": task_id, "userId": user_id})
+        doc: Optional[Dict[str, Any]] = get_archive_collection().find_one(query)
+        if doc is None:
+            return None
+        try:
+            get_tasks_collection().insert_one(doc)
+        except DuplicateKeyError:
+            # Restored concurrently (or left behind by an interrupted archive run).
+            doc = get_tasks_collection().find_one(query)
+        get_archive_collection().delete_one(query)
+        return from_storage(doc)
+
+    def increment_stats(self, user_id: str, inc: Dict[str, int]) -> None:
+        get_stats_collection().update_one(
+            {"_id": user_id}, {"$inc": inc, "$set": {"updatedAt": time.time()}}, upsert=True
+        )
+
+    def get_stats(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return get_stats_collection().find_one({"_id": user_id})
+
+
+class MongoUserRepository(UserRepository):
+    def find_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        return get_users_collection().find_one({"email": email})
+
+    def insert(self, user: Dict[str, Any]) -> None:
+        try:
+            get_users_collection().insert_one(user)
+        except DuplicateKeyError as e:
+            raise DuplicateEmailError(user.get("email")) from e
+
+    def update_password_hash(self, user_id: str, current: str, new: str) -> None:
+        get_users_collection().update_one(
+            {"_id": user_id, "hashedPassword": current},
+            {"$set": {"hashedPassword": new}}
+        )
+
+    def revoke_token(self, jti: str, revoked_at: datetime, expires_at: datetime) -> None:
+        get_revocations_collection().update_one(
+            {"_id": jti},
+            {"$set": {"revokedAt": revoked_at, "expiresAt": expires_at}},
+            upsert=True,
+        )
+
+    def claim_token(self, jti: str, revoked_at: datetime, expires_at: datetime) -> bool:
+        try:
+            get_revocations_collection().insert_one({"_id": jti, "revokedAt": revoked_at, "expiresAt": expires_at})
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def revoked_tokens(self, since: Optional[datetime]) -> List[Dict[str, Any]]:
+        query: Dict[str, Any] = {}
+        if since is not None:
+            query["revokedAt"] = {"$gt": since}
+        return list(get_revocations_collection().find(query, {"revokedAt": 1, "expiresAt": 1}))
@@ -0,0 +1,404 @@
+"""
+Embedded SQLite storage engine (STORAGE_ENGINE=sqlite, file at SQLITE_PATH).
+
+Tables and indexes mirror the Mongo collections and `db.INDEXES`: every task
+query is scoped by `user_id` and served by a (user_id, ...) index, tombstones
+by (user_id, deleted_at, id). Stats documents are stored as JSON per user.
+Search uses `tasks_fts`, an FTS5 index over the active tasks kept in sync by
+triggers, so a query only reads the caller's tasks that contain its terms.
+Mongo-style filters from the handlers are compiled to SQL by `where`.
+
+One connection is shared by all threads of the process (WAL mode, calls
+serialized by a lock), which suits a single-node deployment.
+"""
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import search
+from storage import (
+    TOMBSTONE_TTL_DAYS,
+    BulkOperation,
+    DuplicateEmailError,
+    TaskRepository,
+    UserRepository,
+    apply_increments,
+    project,
+)
+
+TASK_COLUMNS: Dict[str, str] = {
+    "_id": "id",
+    "userId": "user_id",
+    "title": "title",
+    "description": "description",
+    "status": "status",
+    "createdAt": "created_at",
+    "updatedAt": "updated_at",
+}
+TOMBSTONE_COLUMNS: Dict[str, str] = {"_id": "id", "userId": "user_id", "deletedAt": "deleted_at"}
+
+SCHEMA: List[str] = [
+    """CREATE TABLE IF NOT EXISTS tasks (
+        id TEXT PRIMARY KEY, user_id TEXT NOT NULL, title TEXT NOT NULL, description TEXT,
+        status TEXT NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS tasks_user_created ON tasks (user_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS tasks_user_status_updated ON tasks (user_id, status, updated_at)",
+    "CREATE INDEX IF NOT EXISTS tasks_user_updated ON tasks (user_id, updated_at, id)",
+    "CREATE INDEX IF NOT EXISTS tasks_done_updated ON tasks (updated_at, id) WHERE status = 'DONE'",
+    # Keyed by the implicit rowid of `tasks`, which VACUUM may renumber: run
+    # "INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')" after one.
+    # `_` is a word character for `search`, so keep it inside tokens here too.
+    """CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+        user_id, title, description, content='tasks', tokenize="unicode61 tokenchars '_'")""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts (rowid, user_id, title, description)
+        VALUES (new.rowid, new.user_id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts (tasks_fts, rowid, user_id, title, description)
+        VALUES ('delete', old.rowid, old.user_id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF user_id, title, description ON tasks BEGIN
+        INSERT INTO tasks_fts (tasks_fts, rowid, user_id, title, description)
+        VALUES ('delete', old.rowid, old.user_id, old.title, old.description);
+        INSERT INTO tasks_fts (rowid, user_id, title, description)
+        VALUES (new.rowid, new.user_id, new.title, new.description);
+    END""",
+    """CREATE TABLE IF NOT EXISTS tasks_archive (
+        id TEXT PRIMARY KEY, user_id TEXT NOT NULL, title TEXT NOT NULL, description TEXT,
+        status TEXT NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS tasks_archive_user_created ON tasks_archive (user_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS tasks_archive_user_updated ON tasks_archive (user_id, updated_at)",
+    """CREATE TABLE IF NOT EXISTS task_tombstones (
+        id TEXT PRIMARY KEY, user_id TEXT NOT NULL, deleted_at REAL NOT NULL, expires_at REAL NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS tombstones_user_deleted ON task_tombstones (user_id, deleted_at, id)",
+    "CREATE INDEX IF NOT EXISTS tombstones_expires ON task_tombstones (expires_at)",
+    "CREATE TABLE IF NOT EXISTS task_stats (user_id TEXT PRIMARY KEY, doc TEXT NOT NULL)",
+    """CREATE TABLE IF NOT EXISTS users (
+        id TEXT PRIMARY KEY, email TEXT NOT NULL UNIQUE, hashed_password TEXT, created_at REAL)""",
+    "CREATE TABLE IF NOT EXISTS revoked_tokens (jti TEXT PRIMARY KEY, revoked_at REAL NOT NULL, expires_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS revoked_tokens_revoked ON revoked_tokens (revoked_at)",
+]
+
+_OPERATORS: Dict[str, str] = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<=", "$eq": "=", "$ne": "IS NOT"}
+
+
+def where(query: Dict[str, Any], columns: Dict[str, str]) -> Tuple[str, List[Any]]:
+    """Compile a Mongo-style filter (the subset `storage.matches` accepts) to SQL."""
+    clauses: List[str] = []
+    params: List[Any] = []
+    for field, condition in query.items():
+        if field in ("$or", "$and"):
+            parts = [where(clause, columns) for clause in condition]
+            joiner = " OR " if field == "$or" else " AND "
+            clauses.append("(" + (joiner.join(f"({sql})" for sql, _ in parts) or "1") + ")")
+            for _, part_params in parts:
+                params.extend(part_params)
+            continue
+        if field not in columns:
+            raise ValueError(f"Unsupported query field: {field}")
+        column = columns[field]
+        if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            for op, operand in condition.items():
+                if op in ("$in", "$nin"):
+                    values = list(operand)
+                    negate = "NOT " if op == "$nin" else ""
+                    clauses.append(f"{column} {negate}IN ({', '.join('?' * len(values))})" if values
+                                   else ("1" if negate else "0"))
+                    params.extend(values)
+                elif op == "$exists":
+                    clauses.append(f"{column} IS {'NOT ' if operand else ''}NULL")
+                elif op in _OPERATORS:
+                    clauses.append(f"{column} {_OPERATORS[op]} ?")
+                    params.append(operand)
+                else:
+                    raise ValueError(f"Unsupported query operator: {op}")
+        elif condition is None:
+            clauses.append(f"{column} IS NULL")
+        else:
+            clauses.append(f"{column} = ?")
+            params.append(condition)
+    return " AND ".join(clauses) or "1", params
+
+
+def order_by(sort: Optional[List[Tuple[str, int]]], columns: Dict[str, str]) -> str:
+    if not sort:
+        return ""
+    return " ORDER BY " + ", ".join(f"{columns[f]} {'DESC' if d < 0 else 'ASC'}" for f, d in sort)
+
+
+def _task(row: sqlite3.Row) -> Dict[str, Any]:
+    return {public: row[column] for public, column in TASK_COLUMNS.items()}
+
+
+def _fts_phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _table(archived: bool) -> str:
+    return "tasks_archive" if archived else "tasks"
+
+
+class SqliteDatabase:
+    def __init__(self, path: str) -> None:
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            indexed = self.connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'").fetchall()
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+            if not indexed:
+                # Index the tasks of a database created before `tasks_fts` existed.
+                self.connection.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+
+    def query(self, sql: str, params: Any = ()) -> List[sqlite3.Row]:
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def execute(self, sql: str, params: Any = ()) -> int:
+        with self.lock, self.connection:
+            return self.connection.execute(sql, params).rowcount
+
+
+class SqliteTaskRepository(TaskRepository):
+    def __init__(self, database: SqliteDatabase) -> None:
+        self.db = database
+
+    def _insert(self, task: Dict[str, Any]) -> None:
+        self.db.connection.execute(
+            "INSERT INTO tasks (id, user_id, title, description, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [task.get(f) for f in TASK_COLUMNS],
+        )
+
+    def insert(self, task: Dict[str, Any]) -> None:
+        with self.db.lock, self.db.connection:
+            self._insert(task)
+
+    def _owned(self, user_id: str, task_id: Any, archived: bool = False) -> Optional[Dict[str, Any]]:
+        rows = self.db.connection.execute(
+            f"SELECT * FROM {_table(archived)} WHERE id = ? AND user_id = ?", (task_id, user_id)
+        ).fetchall()
+        return _task(rows[0]) if rows else None
+
+    def get(
+        self, user_id: str, task_id: Any, projection: Optional[Dict[str, int]] = None, archived: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        with self.db.lock:
+            task = self._owned(user_id, task_id, archived)
+        return project(task, projection) if task is not None else None
+
+    def find(
+        self,
+        query: Dict[str, Any],
+        projection: Optional[Dict[str, int]] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        limit: int = 0,
+        archived: bool = False,
+    ) -> List[Dict[str, Any]]:
+        sql, params = where(query, TASK_COLUMNS)
+        statement = f"SELECT * FROM {_table(archived)} WHERE {sql}{order_by(sort, TASK_COLUMNS)}"
+        if limit:
+            statement += f" LIMIT {int(limit)}"
+        return [project(_task(row), projection) for row in self.db.query(statement, params)]
+
+    def count(self, query: Dict[str, Any], archived: bool = False) -> int:
+        sql, params = where(query, TASK_COLUMNS)
+        return self.db.query(f"SELECT COUNT(*) FROM {_table(archived)} WHERE {sql}", params)[0][0]
+
+    def scan(self, user_id: str, batch_size: int, archived: bool = False) -> Iterator[List[Dict[str, Any]]]:
+        # A row-value comparison lets each page seek the (user_id, created_at, id)
+        # index instead of re-reading it from the start.
+        statement = f"SELECT * FROM {_table(archived)} WHERE user_id = ?{{}} ORDER BY created_at, id LIMIT ?"
+        rows = self.db.query(statement.format(""), (user_id, batch_size))
+        while rows:
+            yield [_task(row) for row in rows]
+            if len(rows) < batch_size:
+                return
+            last = rows[-1]
+            rows = self.db.query(statement.format(" AND (created_at, id) > (?, ?)"),
+                                 (user_id, last["created_at"], last["id"], batch_size))
+
+    def _update(self, user_id: str, task_id: Any, changes: Dict[str, Any], version: Optional[float]) -> Optional[Dict[str, Any]]:
+        previous = self._owned(user_id, task_id)
+        if previous is None or (version is not None and previous.get("updatedAt") != version):
+            return None
+        assignments = ", ".join(f"{TASK_COLUMNS[f]} = ?" for f in changes)
+        self.db.connection.execute(f"UPDATE tasks SET {assignments} WHERE id = ?", [*changes.values(), task_id])
+        return previous
+
+    def update(
+        self, user_id: str, task_id: Any, changes: Dict[str, Any], version: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        with self.db.lock, self.db.connection:
+            return self._update(user_id, task_id, changes, version)
+
+    def delete(self, user_id: str, task_id: Any, now: float) -> Optional[Dict[str, Any]]:
+        with self.db.lock, self.db.connection:
+            task = self._owned(user_id, task_id)
+            if task is None:
+                return None
+            self.db.connection.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+            self._add_tombstones(user_id, [task_id], now)
+            return {"_id": task["_id"], "status": task["status"]}
+
+    def statuses(self, user_id: str, task_ids: List[Any]) -> Dict[Any, Any]:
+        sql, params = where({"_id": {"$in": task_ids}, "userId": user_id}, TASK_COLUMNS)
+        return {row["id"]: row["status"] for row in self.db.query(f"SELECT id, status FROM tasks WHERE {sql}", params)}
+
+    def bulk_write(self, user_id: str, operations: List[BulkOperation]) -> Tuple[Dict[str, int], Dict[int, str]]:
+        summary: Dict[str, int] = {"inserted": 0, "matched": 0, "modified": 0, "deleted": 0}
+        errors: Dict[int, str] = {}
+        with self.db.lock, self.db.connection:
+            for index, op in enumerate(operations):
+                if op["op"] == "create":
+                    try:
+                        self._insert(op["task"])
+                    except sqlite3.IntegrityError as e:
+                        errors[index] = str(e)
+                        continue
+                    summary["inserted"] += 1
+                elif op["op"] == "delete":
+                    summary["deleted"] += self.db.connection.execute(
+                        "DELETE FROM tasks WHERE id = ? AND user_id = ?", (op["taskId"], user_id)
+                    ).rowcount
+                else:
+                    previous = self._update(user_id, op["taskId"], op["changes"], None)
+                    if previous is not None:
+                        summary["matched"] += 1
+                        if any(previous.get(k) != v for k, v in op["changes"].items()):
+                            summary["modified"] += 1
+        return summary, errors
+
+    def _add_tombstones(self, user_id: str, task_ids: List[Any], now: float) -> None:
+        expires_at: float = now + TOMBSTONE_TTL_DAYS * 86400
+        self.db.connection.executemany(
+            "INSERT OR REPLACE INTO task_tombstones (id, user_id, deleted_at, expires_at) VALUES (?, ?, ?, ?)",
+            [(task_id, user_id, now, expires_at) for task_id in task_ids],
+        )
+
+    def add_tombstones(self, user_id: str, task_ids: List[Any], now: float) -> None:
+        with self.db.lock, self.db.connection:
+            self._add_tombstones(user_id, task_ids, now)
+
+    def find_tombstones(self, query: Dict[str, Any], sort: List[Tuple[str, int]], limit: int) -> List[Dict[str, Any]]:
+        now: float = time.time()
+        self.db.execute("DELETE FROM task_tombstones WHERE expires_at <= ?", (now,))
+        sql, params = where(query, TOMBSTONE_COLUMNS)
+        rows = self.db.query(
+            f"SELECT id, deleted_at FROM task_tombstones WHERE {sql}{order_by(sort, TOMBSTONE_COLUMNS)} LIMIT {int(limit)}",
+            params,
+        )
+        return [{"_id": row["id"], "deletedAt": row["deleted_at"]} for row in rows]
+
+    def search(self, plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+        prefixes: List[str] = search.term_prefixes(plan["terms"])
+        if not prefixes:
+            return []
+        # Prefix queries find every word `search.rank` could match; it then
+        # applies the exact matching, exclusions and scores.
+        match: str = "user_id : {} AND {{title description}} : ({})".format(
+            _fts_phrase(plan["userId"]), " OR ".join(_fts_phrase(p) + "*" for p in prefixes)
+        )
+        statement: str = (
+            "SELECT tasks.* FROM tasks_fts JOIN tasks ON tasks.rowid = tasks_fts.rowid"
+            " WHERE tasks_fts MATCH ? AND tasks.user_id = ?"
+        )
+        params: List[Any] = [match, plan["userId"]]
+        if plan["status"]:
+            statement += " AND tasks.status = ?"
+            params.append(plan["status"])
+        return search.rank([_task(row) for row in self.db.query(statement, params)], plan)
+
+    def archive(self, cutoff: float, limit: int) -> List[str]:
+        # Candidates come from the partial (updated_at, id) index; copy and
+        # delete happen in one transaction, so a failed run moves nothing.
+        with self.db.lock, self.db.connection:
+            rows = self.db.connection.execute(
+                "SELECT id, user_id FROM tasks WHERE status = 'DONE' AND updated_at < ? ORDER BY updated_at, id LIMIT ?",
+                (cutoff, limit),
+            ).fetchall()
+            ids: List[Any] = [row["id"] for row in rows]
+            placeholders = ", ".join("?" * len(ids))
+            if ids:
+                self.db.connection.execute(
+                    f"INSERT OR REPLACE INTO tasks_archive SELECT * FROM tasks WHERE id IN ({placeholders})", ids
+                )
+                self.db.connection.execute(f"DELETE FROM tasks WHERE id IN ({placeholders})", ids)
+        return [row["user_id"] for row in rows]
+
+    def restore(self, user_id: str, task_id: Any) -> Optional[Dict[str, Any]]:
+        with self.db.lock, self.db.connection:
+            if self._owned(user_id, task_id, archived=True) is None:
+                return None
+            self.db.connection.execute("INSERT OR IGNORE INTO tasks SELECT * FROM tasks_archive WHERE id = ?", (task_id,))
+            self.db.connection.execute("DELETE FROM tasks_archive WHERE id = ?", (task_id,))
+            return self._owned(user_id, task_id)
+
+    def increment_stats(self, user_id: str, inc: Dict[str, int]) -> None:
+        with self.db.lock, self.db.connection:
+            rows = self.db.connection.execute("SELECT doc FROM task_stats WHERE user_id = ?", (user_id,)).fetchall()
+            doc: Dict[str, Any] = json.loads(rows[0]["doc"]) if rows else {"_id": user_id}
+            apply_increments(doc, inc)
+            doc["updatedAt"] = time.time()
+            self.db.connection.execute(
+                "INSERT OR REPLACE INTO task_stats (user_id, doc) VALUES (?, ?)", (user_id, json.dumps(doc))
+            )
+
+    def get_stats(self, user_id: str) -> Optional[Dict[str, Any]]:
+        rows = self.db.query("SELECT doc FROM task_stats WHERE user_id = ?", (user_id,))
+        return json.loads(rows[0]["doc"]) if rows else None
+
+
+def _datetime(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+class SqliteUserRepository(UserRepository):
+    def __init__(self, database: SqliteDatabase) -> None:
+        self.db = database
+
+    def find_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        rows = self.db.query("SELECT * FROM users WHERE email = ?", (email,))
+        if not rows:
+            return None
+        row = rows[0]
+        return {"_id": row["id"], "email": row["email"], "hashedPassword": row["hashed_password"],
+                "createdAt": row["created_at"]}
+
+    def insert(self, user: Dict[str, Any]) -> None:
+        try:
+            self.db.execute(
+                "INSERT INTO users (id, email, hashed_password, created_at) VALUES (?, ?, ?, ?)",
+                (user["_id"], user["email"], user.get("hashedPassword"), user.get("createdAt")),
+            )
+        except sqlite3.IntegrityError as e:
+            raise DuplicateEmailError(user["email"]) from e
+
+    def update_password_hash(self, user_id: str, current: str, new: str) -> None:
+        self.db.execute("UPDATE users SET hashed_password = ? WHERE id = ? AND hashed_password = ?", (new, user_id, current))
+
+    def revoke_token(self, jti: str, revoked_at: datetime, expires_at: datetime) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO revoked_tokens (jti, revoked_at, expires_at) VALUES (?, ?, ?)",
+            (jti, revoked_at.timestamp(), expires_at.timestamp()),
+        )
+
+    def claim_token(self, jti: str, revoked_at: datetime, expires_at: datetime) -> bool:
+        return self.db.execute(
+            "INSERT OR IGNORE INTO revoked_tokens (jti, revoked_at, expires_at) VALUES (?, ?, ?)",
+            (jti, revoked_at.timestamp(), expires_at.timestamp()),
+        ) == 1
+
+    def revoked_tokens(self, since: Optional[datetime]) -> List[Dict[str, Any]]:
+        self.db.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (time.time(),))
+        rows = self.db.query(
+            "SELECT * FROM revoked_tokens WHERE revoked_at > ?", (since.timestamp() if since is not None else -1.0,)
+        )
+        return [{"_id": row["jti"], "revokedAt": _datetime(row["revoked_at"]), "expiresAt": _datetime(row["expires_at"])}
+                for row in rows]
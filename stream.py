@@ -0,0 +1,223 @@
+"""
+Server-Sent Events push channel for task changes (container/ASGI mode only).
+
+    GET /tasks/stream            Authorization: Bearer <token>
+    Last-Event-ID: <watermark>   (or ?since=<watermark>)
+
+One MongoDB change stream per process watches the `tasks` and
+`task_tombstones` collections and fans each change out to the connected
+clients of the task's owner. Every event id is a `/tasks/changes` watermark,
+so a client that reconnects with `Last-Event-ID` is first sent what it missed
+(from the delta-sync queries) and then continues with live events. The hub
+itself resumes its change stream from the last resume token after errors.
+
+Change streams need a replica set; locally `mongod --replSet rs0` followed
+by `rs.initiate()` in mongosh is enough.
+"""
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import async_handler
+import auth_handlers
+from db import init_async_db
+from handler import build_changes_query, create_response, get_header
+from pagination import decode_cursor, encode_cursor
+from serialization import dumps
+from task_schema import TASKS_COLLECTION, from_storage
+
+STREAM_HEARTBEAT_SECONDS: float = float(os.environ.get("STREAM_HEARTBEAT_SECONDS", "15"))
+STREAM_QUEUE_SIZE: int = int(os.environ.get("STREAM_QUEUE_SIZE", "1000"))
+STREAM_RETRY_SECONDS: float = float(os.environ.get("STREAM_RETRY_SECONDS", "1"))
+
+PIPELINE: List[Dict[str, Any]] = [
+    {"$match": {
+        "ns.coll": {"$in": [TASKS_COLLECTION, "task_tombstones"]},
+        "operationType": {"$in": ["insert", "update", "replace"]},
+    }},
+]
+
+# Put on a subscriber's queue when it fell too far behind; the connection is
+# closed and the client catches up through Last-Event-ID on reconnect.
+RESYNC = None
+
+Event = Dict[str, Any]
+
+
+def change_event(change: Dict[str, Any]) -> Optional[Tuple[str, Event]]:
+    """
+    Translate a change stream document into (user id, SSE event). Task deletes
+    are reported through the tombstone insert, which carries the owner's id.
+    """
+    doc: Optional[Dict[str, Any]] = change.get("fullDocument")
+    if doc and change["ns"]["coll"] == TASKS_COLLECTION:
+        doc = from_storage(doc)
+    if not doc or not doc.get("userId"):
+        return None
+    if change["ns"]["coll"] == "task_tombstones":
+        return doc["userId"], {
+            "id": encode_cursor([doc["deletedAt"], doc["_id"]]),
+            "event": "deleted",
+            "data": {"taskId": doc["_id"], "deletedAt": doc["deletedAt"]},
+        }
+    return doc["userId"], {
+        "id": encode_cursor([doc.get("updatedAt", 0), doc["_id"]]),
+        "event": "created" if change["operationType"] == "insert" else "updated",
+        "data": doc,
+    }
+
+
+def format_event(event: Event) -> bytes:
+    data: str = dumps(event["data"])
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {data}\n\n".encode("utf-8")
+
+
+class ChangeHub:
+    """Shares one change stream between every subscriber in the process."""
+
+    def __init__(self) -> None:
+        self._subscribers: Dict[str, Set["asyncio.Queue[Optional[Event]]"]] = {}
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._resume_token: Any = None
+
+    def subscribe(self, user_id: str) -> "asyncio.Queue[Optional[Event]]":
+        queue: "asyncio.Queue[Optional[Event]]" = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: "asyncio.Queue[Optional[Event]]") -> None:
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def publish(self, change: Dict[str, Any]) -> None:
+        routed = change_event(change)
+        if routed is None:
+            return
+        user_id, event = routed
+        for queue in list(self._subscribers.get(user_id, ())):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.unsubscribe(user_id, queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with init_async_db().watch(
+                    PIPELINE, full_document="updateLookup", resume_after=self._resume_token
+                ) as changes:
+                    async for change in changes:
+                        self._resume_token = change["_id"]
+                        self.publish(change)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in task change stream: {e}")
+                await asyncio.sleep(STREAM_RETRY_SECONDS)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+
+HUB = ChangeHub()
+
+
+def authenticate(event: Dict[str, Any]) -> Optional[str]:
+    """
+    Bearer header, or an `access_token` query parameter for browser
+    EventSource clients, which cannot set headers.
+    """
+    user_id: Optional[str] = auth_handlers.resolve_user(event)
+    token: Optional[str] = (event.get('queryStringParameters') or {}).get('access_token')
+    if user_id or not token:
+        return user_id
+    return auth_handlers.verify_token({"headers": {"Authorization": f"Bearer {token}"}})
+
+
+async def _wait_disconnect(receive: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def serve(event: Dict[str, Any], receive: Any, send: Any,
+                respond: Callable[[Any, Dict[str, Any]], Awaitable[None]]) -> None:
+    """Serve GET /tasks/stream; `respond` sends a plain (error) handler response."""
+    # Token verification may sync the revocation list from the database.
+    user_id: Optional[str] = await asyncio.get_running_loop().run_in_executor(None, authenticate, event)
+    if not user_id:
+        await respond(send, create_response(401, {"error": "Unauthorized"}))
+        return
+    since: Optional[str] = get_header(event, 'Last-Event-ID') or (event.get('queryStringParameters') or {}).get('since')
+    try:
+        plan: Optional[Dict[str, Any]] = build_changes_query({"since": since}) if since else None
+    except ValueError as e:
+        await respond(send, create_response(400, {"error": str(e)}))
+        return
+    except LookupError as e:
+        await respond(send, create_response(410, {"error": str(e)}))
+        return
+
+    # Subscribe before catching up so nothing written in between is lost;
+    # events already sent during catch-up are skipped when they arrive live.
+    queue = HUB.subscribe(user_id)
+    disconnect = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")],
+        })
+        sent: Set[str] = set()
+        while plan is not None and not disconnect.done():
+            page: Dict[str, Any] = await async_handler.fetch_changes(user_id, plan)
+            for missed in catch_up_events(page):
+                sent.add(missed["id"])
+                await send({"type": "http.response.body", "body": format_event(missed), "more_body": True})
+            plan = {"since": decode_cursor(page["watermark"], 2), "limit": plan["limit"]} if page["hasMore"] else None
+
+        while not disconnect.done():
+            get = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({get, disconnect}, timeout=STREAM_HEARTBEAT_SECONDS,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if get not in done:
+                get.cancel()
+                if not disconnect.done():
+                    await send({"type": "http.response.body", "body": b": keep-alive\n\n", "more_body": True})
+                continue
+            live: Optional[Event] = get.result()
+            if live is RESYNC:
+                break
+            if live["id"] not in sent:
+                await send({"type": "http.response.body", "body": format_event(live), "more_body": True})
+        if not disconnect.done():
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+    finally:
+        disconnect.cancel()
+        HUB.unsubscribe(user_id, queue)
+
+
+def catch_up_events(page: Dict[str, Any]) -> List[Event]:
+    """SSE events for a `build_changes` page, in watermark order."""
+    keyed: List[Tuple[Tuple[Any, Any], Event]] = [
+        ((task.get("updatedAt", 0), task["_id"]), {"event": "updated", "data": task})
+        for task in page["changes"]
+    ] + [
+        ((tomb["deletedAt"], tomb["taskId"]), {"event": "deleted", "data": tomb})
+        for tomb in page["deleted"]
+    ]
+    keyed.sort(key=lambda item: item[0])
+    return [{"id": encode_cursor(list(key)), **event} for key, event in keyed]
@@ -0,0 +1,297 @@
+"""
+Storage representation of task documents.
+
+With TASK_SCHEMA=compact tasks are stored in the `tasks_compact` collection
+with short field names, binary UUID ids, BSON dates and an integer status:
+
+    {"_id": Binary(uuid, 4), "u": userId, "t": title, "d": description,
+     "s": 0|1|2, "c": Date(createdAt), "m": Date(updatedAt)}
+
+Handlers keep building filters, projections, sorts and updates with the
+public field names and values; the functions here translate them on the way
+in and map documents back on the way out, so the JSON API is unchanged. With
+the default TASK_SCHEMA=legacy every function is the identity.
+
+Switching an existing deployment: run `python manage.py migrate-task-schema`,
+deploy with TASK_SCHEMA=compact, then run the migration once more to copy
+anything written to `tasks` (or moved to `tasks_archive`) in between.
+"""
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import Binary, ObjectId
+from bson.binary import UUID_SUBTYPE
+from bson.datetime_ms import DatetimeMS
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+COMPACT: bool = os.environ.get("TASK_SCHEMA", "legacy").lower() == "compact"
+LEGACY_COLLECTION: str = "tasks"
+COMPACT_COLLECTION: str = "tasks_compact"
+TASKS_COLLECTION: str = COMPACT_COLLECTION if COMPACT else LEGACY_COLLECTION
+# Cold storage for long-completed tasks (see `archive.py`), in the same schema.
+LEGACY_ARCHIVE_COLLECTION: str = "tasks_archive"
+COMPACT_ARCHIVE_COLLECTION: str = f"{COMPACT_COLLECTION}_archive"
+ARCHIVE_COLLECTION: str = COMPACT_ARCHIVE_COLLECTION if COMPACT else LEGACY_ARCHIVE_COLLECTION
+TOMBSTONES_COLLECTION: str = "task_tombstones"
+# Progress of `migrate_legacy_tasks`, so the catch-up run only reads what changed.
+MIGRATIONS_COLLECTION: str = "migrations"
+
+FIELDS: Dict[str, str] = {
+    "_id": "_id",
+    "userId": "u",
+    "title": "t",
+    "description": "d",
+    "status": "s",
+    "createdAt": "c",
+    "updatedAt": "m",
+}
+PUBLIC_FIELDS: Dict[str, str] = {stored: public for public, stored in FIELDS.items()}
+STATUS_CODES: Dict[str, int] = {"TODO": 0, "IN_PROGRESS": 1, "DONE": 2}
+STATUS_NAMES: Dict[int, str] = {code: name for name, code in STATUS_CODES.items()}
+DATE_FIELDS: Tuple[str, ...] = ("createdAt", "updatedAt")
+
+_EPOCH = datetime(1970, 1, 1)
+_DUPLICATE_KEY = 11000
+# Re-read legacy writes this far before the previous migration run started.
+_MIGRATION_OVERLAP_SECONDS = 60.0
+
+
+def timestamp() -> float:
+    """Current time as epoch seconds at the millisecond precision of BSON dates."""
+    return round(time.time(), 3)
+
+
+def storage_id(task_id: Any) -> Any:
+    """Binary UUID (or ObjectId) for a public task id; other values pass through."""
+    if not isinstance(task_id, str):
+        return task_id
+    try:
+        parsed = uuid.UUID(task_id)
+    except ValueError:
+        return ObjectId(task_id) if ObjectId.is_valid(task_id) else task_id
+    return Binary.from_uuid(parsed) if str(parsed) == task_id.lower() else task_id
+
+
+def public_id(stored_id: Any) -> Any:
+    if isinstance(stored_id, Binary) and stored_id.subtype == UUID_SUBTYPE:
+        return str(stored_id.as_uuid())
+    if isinstance(stored_id, ObjectId):
+        return str(stored_id)
+    return stored_id
+
+
+def _stored_value(field: str, value: Any) -> Any:
+    if field == "_id":
+        return storage_id(value)
+    if field == "status":
+        return STATUS_CODES.get(value, value) if isinstance(value, str) else value
+    if field in DATE_FIELDS and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return DatetimeMS(round(value * 1000))
+    return value
+
+
+def _public_value(field: str, value: Any) -> Any:
+    if field == "_id":
+        return public_id(value)
+    if field == "status":
+        return STATUS_NAMES.get(value, value)
+    if isinstance(value, DatetimeMS):
+        return int(value) / 1000
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return ((value - _EPOCH) // timedelta(milliseconds=1)) / 1000
+    return value
+
+
+def _compact_filter(query: Dict[str, Any]) -> Dict[str, Any]:
+    translated: Dict[str, Any] = {}
+    for key, condition in query.items():
+        if key in ("$or", "$and", "$nor"):
+            translated[key] = [_compact_filter(clause) for clause in condition]
+        elif isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            translated[FIELDS.get(key, key)] = {
+                op: [_stored_value(key, v) for v in operand] if op in ("$in", "$nin") else _stored_value(key, operand)
+                for op, operand in condition.items()
+            }
+        else:
+            translated[FIELDS.get(key, key)] = _stored_value(key, condition)
+    return translated
+
+
+def to_compact(task: Dict[str, Any]) -> Dict[str, Any]:
+    return {FIELDS.get(k, k): _stored_value(k, v) for k, v in task.items()}
+
+
+def from_compact(doc: Dict[str, Any]) -> Dict[str, Any]:
+    task: Dict[str, Any] = {}
+    for key, value in doc.items():
+        field = PUBLIC_FIELDS.get(key, key)
+        task[field] = _public_value(field, value)
+    return task
+
+
+def to_storage(task: Dict[str, Any]) -> Dict[str, Any]:
+    return to_compact(task) if COMPACT else task
+
+
+def from_storage(doc: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    return from_compact(doc) if COMPACT and doc is not None else doc
+
+
+def storage_filter(query: Dict[str, Any]) -> Dict[str, Any]:
+    return _compact_filter(query) if COMPACT else query
+
+
+def storage_projection(projection: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not COMPACT or projection is None:
+        return projection
+    return {FIELDS.get(k, k): v for k, v in projection.items()}
+
+
+def storage_sort(sort: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+    return [(FIELDS.get(f, f), d) for f, d in sort] if COMPACT else sort
+
+
+def storage_update(update: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Translate an update document such as {"$set": {...}}."""
+    if not COMPACT:
+        return update
+    return {op: to_compact(fields) for op, fields in update.items()}
+
+
+def storage_index(collection: str, keys: List[Tuple[str, Any]]) -> Tuple[str, List[Tuple[str, Any]]]:
+    """Map an index on the public `tasks`/`tasks_archive` schema onto the active collections."""
+    if collection == LEGACY_ARCHIVE_COLLECTION:
+        return ARCHIVE_COLLECTION, storage_sort(keys)
+    if collection != LEGACY_COLLECTION:
+        return collection, keys
+    return TASKS_COLLECTION, storage_sort(keys)
+
+
+def storage_index_options(collection: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Rename the fields of text index `weights` and partial filters along with the index keys."""
+    if collection not in (LEGACY_COLLECTION, LEGACY_ARCHIVE_COLLECTION):
+        return options
+    if "weights" in options:
+        options = {**options, "weights": storage_projection(options["weights"])}
+    if "partialFilterExpression" in options:
+        options = {**options, "partialFilterExpression": storage_filter(options["partialFilterExpression"])}
+    return options
+
+
+def _write_batch(target: Any, batch: List[UpdateOne]) -> int:
+    """Apply migration upserts, ignoring collisions with newer compact documents."""
+    try:
+        result = target.bulk_write(batch, ordered=False)
+        return result.upserted_count + result.modified_count
+    except BulkWriteError as e:
+        if any(err.get("code") != _DUPLICATE_KEY for err in e.details.get("writeErrors", [])):
+            raise
+        return e.details.get("nUpserted", 0) + e.details.get("nModified", 0)
+
+
+def _stored_times(collection: Any, stored_ids: List[Any]) -> Dict[Any, datetime]:
+    return {doc["_id"]: doc["m"] for doc in collection.find({"_id": {"$in": stored_ids}}, {"m": 1})}
+
+
+def _migrate_batch(
+    database: Any, tasks: List[Dict[str, Any]], target: str, other: str, archived: bool
+) -> int:
+    """
+    Copy one batch of legacy tasks into compact collection `target`, unless
+    the compact side already has a state at least as new: a tombstone, or a
+    copy in `target` or in the `other` compact collection (at equal
+    timestamps the archived copy wins, since archiving keeps `updatedAt`).
+    A stale copy in `other` is removed. Returns the number copied.
+    """
+    docs: List[Dict[str, Any]] = []
+    for task in tasks:
+        task.setdefault("createdAt", 0.0)
+        task.setdefault("updatedAt", task["createdAt"])
+        docs.append(to_compact(task))
+    stored_ids: List[Any] = [doc["_id"] for doc in docs]
+    # Tombstones are keyed by public id.
+    public_ids: List[Any] = [public_id(task["_id"]) for task in tasks]
+    deleted: Dict[Any, float] = {
+        doc["_id"]: doc["deletedAt"]
+        for doc in database[TOMBSTONES_COLLECTION].find({"_id": {"$in": public_ids}}, {"deletedAt": 1})
+    }
+    current: Dict[Any, datetime] = _stored_times(database[target], stored_ids)
+    elsewhere: Dict[Any, datetime] = _stored_times(database[other], stored_ids)
+    writes: List[UpdateOne] = []
+    removals: List[DeleteOne] = []
+    for task, doc, task_id in zip(tasks, docs, public_ids):
+        # Compare at the millisecond precision of the compact copies.
+        updated: float = _public_value("updatedAt", doc["m"])
+        if deleted.get(task_id, float("-inf")) >= updated:
+            continue
+        if doc["_id"] in current and _public_value("updatedAt", current[doc["_id"]]) >= updated:
+            continue
+        if doc["_id"] in elsewhere:
+            other_updated: float = _public_value("updatedAt", elsewhere[doc["_id"]])
+            if other_updated > updated or (other_updated == updated and not archived):
+                continue
+            # Matching the exact `m` read above leaves a copy changed since alone.
+            removals.append(DeleteOne({"_id": doc["_id"], "m": elsewhere[doc["_id"]]}))
+        stored_id = doc.pop("_id")
+        # Matching on an older `m` makes the upsert collide with (and skip)
+        # a document that became newer in the compact collection meanwhile.
+        writes.append(UpdateOne({"_id": stored_id, "m": {"$lt": doc["m"]}}, {"$set": doc}, upsert=True))
+    if removals:
+        database[other].bulk_write(removals, ordered=False)
+    return _write_batch(database[target], writes) if writes else 0
+
+
+def migrate_legacy_tasks(batch_size: int = 1000, full: bool = False) -> int:
+    """
+    Copy `tasks` and `tasks_archive` into their compact collections.
+
+    The first run copies everything and records its start time. Later runs
+    (the catch-up after deploying TASK_SCHEMA=compact) only copy active tasks
+    changed since the previous run started, re-check the archive, and apply
+    deletes recorded in `task_tombstones` since then. A legacy task never
+    replaces a compact copy (active or archived) that is as new or newer,
+    and tombstoned tasks are not brought back. Returns the number of tasks
+    copied.
+    """
+    from db import get_db
+
+    database = get_db()
+    state: Optional[Dict[str, Any]] = None if full else database[MIGRATIONS_COLLECTION].find_one({"_id": "task_schema"})
+    started: float = time.time()
+    since: Optional[float] = state["startedAt"] - _MIGRATION_OVERLAP_SECONDS if state else None
+    copied = 0
+    sources = [
+        (LEGACY_COLLECTION, COMPACT_COLLECTION, COMPACT_ARCHIVE_COLLECTION, False),
+        # Archiving keeps `updatedAt`, so moves into the archive since the last
+        # run cannot be found by time; the (cold) archive is always re-checked.
+        (LEGACY_ARCHIVE_COLLECTION, COMPACT_ARCHIVE_COLLECTION, COMPACT_COLLECTION, True),
+    ]
+    for source, target, other, archived in sources:
+        query: Dict[str, Any] = {"updatedAt": {"$gte": since}} if since is not None and not archived else {}
+        batch: List[Dict[str, Any]] = []
+        for task in database[source].find(query):
+            batch.append(task)
+            if len(batch) >= batch_size:
+                copied += _migrate_batch(database, batch, target, other, archived)
+                batch = []
+        if batch:
+            copied += _migrate_batch(database, batch, target, other, archived)
+    if since is not None:
+        # Tasks deleted from `tasks` after the previous run copied them.
+        for tombstone in database[TOMBSTONES_COLLECTION].find({"deletedAt": {"$gte": since}}, {"deletedAt": 1}):
+            stale: Dict[str, Any] = {
+                "_id": storage_id(tombstone["_id"]),
+                "m": {"$lte": _stored_value("updatedAt", tombstone["deletedAt"])},
+            }
+            database[COMPACT_COLLECTION].delete_one(stale)
+            database[COMPACT_ARCHIVE_COLLECTION].delete_one(stale)
+    database[MIGRATIONS_COLLECTION].update_one(
+        {"_id": "task_schema"}, {"$set": {"startedAt": started}}, upsert=True
+    )
+    return copied
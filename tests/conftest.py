@@ -1,8 +1,64 @@
 import sys, os
 import pytest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 sys.path.insert(0, os.getcwd())
+import async_handler
 import auth_handlers
+import ratelimit
+import read_cache
+import revocation
+import stats
+import storage_mongo
+
+@pytest.fixture(autouse=True)
+def isolated_revocations(monkeypatch):
+    """Keep the revocation list in memory so tests never reach a real database."""
+    store = MagicMock()
+    store.find.return_value = []
+    monkeypatch.setattr(storage_mongo, 'get_revocations_collection', lambda: store)
+    revocation.reset()
+    auth_handlers.clear_token_cache()
+    yield store
+    revocation.reset()
+
+@pytest.fixture(autouse=True)
+def mock_stats(monkeypatch):
+    """Capture task stats counter writes instead of sending them to a database."""
+    store = MagicMock()
+    store.find_one.return_value = None
+    async_store = MagicMock()
+    async_store.update_one = AsyncMock()
+    monkeypatch.setattr(stats, 'get_stats_collection', lambda: store)
+    monkeypatch.setattr(storage_mongo, 'get_stats_collection', lambda: store)
+    monkeypatch.setattr(stats, 'get_async_stats_collection', lambda: async_store)
+    yield store
+
+@pytest.fixture(autouse=True)
+def empty_archive(monkeypatch):
+    """An empty task archive, so fallbacks to it never reach a real database."""
+    store = MagicMock()
+    store.find_one.return_value = None
+    async_store = MagicMock()
+    async_store.find_one = AsyncMock(return_value=None)
+    monkeypatch.setattr(storage_mongo, 'get_archive_collection', lambda: store)
+    monkeypatch.setattr(async_handler, 'get_async_archive_collection', lambda: async_store)
+    yield store
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limits():
+    """Start every test with full, local-only rate limit buckets."""
+    ratelimit.set_store(None)
+    ratelimit.reset()
+    yield
+    ratelimit.reset()
+
+@pytest.fixture(autouse=True)
+def empty_read_cache():
+    """Start every test with an empty, local-only read cache."""
+    read_cache.set_backend(None)
+    read_cache.reset()
+    yield
+    read_cache.reset()
 
 @pytest.fixture
 def mock_users():
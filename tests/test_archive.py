@@ -0,0 +1,168 @@
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+try:
+    import archive
+except ImportError:
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    import archive
+import handler
+import storage
+import storage_mongo
+import task_schema
+
+USER = 'user-1'
+DAY = 86400
+NOW = time.time()
+
+def task(task_id, created, status='DONE', age_days=0.0, user=USER):
+    return {'_id': task_id, 'userId': user, 'title': task_id, 'description': '', 'status': status,
+            'createdAt': created, 'updatedAt': NOW - age_days * DAY}
+
+def make_event(task_id=None, query=None, body=None):
+    return {'requestContext': {'authorizer': {'lambda': {'user_id': USER}}},
+            'pathParameters': {'taskId': task_id} if task_id else {},
+            'queryStringParameters': query, 'body': json.dumps(body) if body is not None else '{}'}
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def tasks(request, monkeypatch):
+    monkeypatch.setattr(storage, 'SQLITE_PATH', ':memory:')
+    storage.use_engine(request.param)
+    repository = storage.task_repository()
+    repository.insert(task('old-1', 1.0, age_days=200))
+    repository.insert(task('old-2', 2.0, age_days=100))
+    repository.insert(task('recent', 3.0, age_days=10))
+    repository.insert(task('todo', 4.0, status='TODO', age_days=300))
+    repository.insert(task('other', 5.0, age_days=150, user='user-2'))
+    yield repository
+    storage.use_engine('mongo')
+
+def test_archives_old_done_tasks_in_batches(tasks):
+    assert archive.archive_completed(now=NOW, batch_size=2) == 3
+    assert archive.archive_completed(now=NOW, batch_size=2) == 0
+    assert [t['_id'] for t in tasks.find({'userId': USER}, sort=[('createdAt', 1)])] == ['recent', 'todo']
+    archived = tasks.find({'userId': USER}, sort=[('createdAt', 1)], archived=True)
+    assert [t['_id'] for t in archived] == ['old-1', 'old-2']
+    assert tasks.count({'userId': 'user-2'}, archived=True) == 1
+    assert [t['_id'] for b in tasks.scan(USER, 10, archived=True) for t in b] == ['old-1', 'old-2']
+
+def test_lists_archived_tasks_only_on_request(tasks):
+    archive.archive_completed(now=NOW)
+    listed = json.loads(handler.getTasks(make_event(), None)['body'])
+    assert [t['_id'] for t in listed['items']] == ['todo', 'recent']
+
+    first = json.loads(handler.getTasks(make_event(query={'includeArchived': 'true', 'limit': '3'}), None)['body'])
+    assert [(t['_id'], t.get('archived', False)) for t in first['items']] == [
+        ('todo', False), ('recent', False), ('old-2', True)]
+    rest = handler.getTasks(make_event(query={'includeArchived': 'true', 'limit': '3', 'cursor': first['next']}), None)
+    assert [t['_id'] for t in json.loads(rest['body'])['items']] == ['old-1']
+    assert handler.getTasks(make_event(query={'includeArchived': 'yes'}), None)['statusCode'] == 400
+
+def test_reads_and_writes_restore_on_demand(tasks):
+    archive.archive_completed(now=NOW)
+    found = handler.getTaskById(make_event('old-1'), None)
+    assert found['statusCode'] == 200 and json.loads(found['body'])['archived'] is True
+
+    res = handler.updateTaskStatus(make_event('old-1', body={'status': 'TODO'}), None)
+    assert res['statusCode'] == 200 and json.loads(res['body'])['status'] == 'TODO'
+    assert tasks.get(USER, 'old-1')['status'] == 'TODO' and tasks.get(USER, 'old-1', archived=True) is None
+
+    assert handler.deleteTask(make_event('old-2'), None)['statusCode'] == 204
+    assert handler.getTaskById(make_event('old-2'), None)['statusCode'] == 404
+
+def test_restore_endpoint(tasks):
+    archive.archive_completed(now=NOW)
+    res = handler.restoreTask(make_event('old-2'), None)
+    body = json.loads(res['body'])
+    assert res['statusCode'] == 200 and body['status'] == 'DONE' and body['updatedAt'] > NOW
+    assert 'archived' not in body
+    assert archive.archive_completed(now=NOW) == 0
+    assert handler.restoreTask(make_event('old-2'), None)['statusCode'] == 200
+    assert handler.restoreTask(make_event('other'), None)['statusCode'] == 404
+
+def test_restore_drops_reads_cached_before_the_bump(tasks, monkeypatch):
+    archive.archive_completed(now=NOW)
+    update = type(tasks).update
+
+    def read_then_update(self, *args, **kwargs):
+        handler.getTaskById(make_event('old-2'), None)  # a concurrent read lands in between
+        return update(self, *args, **kwargs)
+
+    monkeypatch.setattr(type(tasks), 'update', read_then_update)
+    restored = handler.restoreTask(make_event('old-2'), None)
+    assert handler.getTaskById(make_event('old-2'), None)['headers']['ETag'] == restored['headers']['ETag']
+
+def test_batch_restores_archived_tasks(tasks):
+    archive.archive_completed(now=NOW)
+    ops = [{'op': 'updateStatus', 'taskId': 'old-1', 'status': 'TODO'}, {'op': 'delete', 'taskId': 'old-2'},
+           {'op': 'delete', 'taskId': 'other'}]
+    body = json.loads(handler.batchTasks(make_event(body={'operations': ops}), None)['body'])
+    assert [r['ok'] for r in body['results']] == [True, True, False]
+    assert tasks.get(USER, 'old-1')['status'] == 'TODO'
+    assert tasks.get(USER, 'old-2') is None and tasks.get(USER, 'old-2', archived=True) is None
+
+@pytest.fixture
+def mongo(monkeypatch):
+    database = mongomock.MongoClient().db
+    monkeypatch.setattr(storage_mongo, 'get_tasks_collection', lambda: database.tasks)
+    monkeypatch.setattr(storage_mongo, 'get_archive_collection', lambda: database.tasks_archive)
+    monkeypatch.setattr(storage_mongo, 'get_tombstones_collection', lambda: database.task_tombstones)
+    return database
+
+def copy_then_race(mongo, updated, deleted):
+    def bulk_write(requests, **kwargs):
+        # mongomock's bulk_write does not accept pymongo's ReplaceOne; apply them one by one.
+        for request in requests:
+            mongo.tasks_archive.replace_one(request._filter, request._doc, upsert=True)
+        mongo.tasks.update_one(task_schema.storage_filter({'_id': updated}),
+                               task_schema.storage_update({'$set': {'status': 'TODO', 'updatedAt': NOW}}))
+        mongo.tasks.delete_one(task_schema.storage_filter({'_id': deleted}))
+        mongo.task_tombstones.insert_one({'_id': deleted, 'userId': USER, 'deletedAt': NOW})
+    return bulk_write
+
+def test_mongo_archive_leaves_tasks_changed_mid_move(mongo, monkeypatch):
+    for doc in [task('a', 1.0, age_days=200), task('b', 2.0, age_days=150), task('c', 3.0, age_days=100)]:
+        mongo.tasks.insert_one(doc)
+
+    monkeypatch.setattr(mongo.tasks_archive, 'bulk_write', copy_then_race(mongo, 'a', 'b'))
+    repository = storage_mongo.MongoTaskRepository()
+    assert repository.archive(NOW - 90 * DAY, 10) == [USER]
+    assert [d['_id'] for d in mongo.tasks.find()] == ['a']
+    assert [d['_id'] for d in mongo.tasks_archive.find()] == ['c']
+
+    assert repository.restore(USER, 'c')['_id'] == 'c'
+    assert repository.restore(USER, 'c') is None
+    assert mongo.tasks_archive.count_documents({}) == 0
+
+class MillisDate(datetime):
+    # mongomock cannot compare DatetimeMS; store the datetime pymongo would read back.
+    def __new__(cls, millis):
+        return datetime(1970, 1, 1) + timedelta(milliseconds=millis)
+
+def test_mongo_archive_compact_schema(mongo, monkeypatch):
+    monkeypatch.setattr(task_schema, 'DatetimeMS', MillisDate)
+    a, b, c = (str(uuid.UUID(int=i)) for i in (1, 2, 3))
+    with patch.object(task_schema, 'COMPACT', True):
+        for doc in [task(a, 1.0, age_days=200), task(b, 2.0, age_days=150), task(c, 3.0, age_days=100)]:
+            mongo.tasks.insert_one(task_schema.to_storage(doc))
+        monkeypatch.setattr(mongo.tasks_archive, 'bulk_write', copy_then_race(mongo, a, b))
+        repository = storage_mongo.MongoTaskRepository()
+        assert repository.archive(NOW - 90 * DAY, 10) == [USER]
+        assert [task_schema.public_id(d['_id']) for d in mongo.tasks_archive.find()] == [c]
+        assert repository.restore(USER, b) is None
+        assert repository.restore(USER, c)['_id'] == c
+
+def test_run_stops_at_lambda_deadline(tasks, monkeypatch):
+    class Context:
+        def get_remaining_time_in_millis(self):
+            return 5000
+
+    assert archive.run({}, Context()) == {'archived': 0}
+    assert archive.run({}, None) == {'archived': 3}
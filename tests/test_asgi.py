@@ -0,0 +1,43 @@
+import asyncio
+
+try:
+    import asgi
+except ImportError:
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    import asgi
+import async_handler
+
+def call_app(method, path, body=b'', query=b''):
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query,
+             'headers': [(b'content-type', b'application/json')]}
+    sent = []
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+    async def send(message):
+        sent.append(message)
+    asyncio.run(asgi.app(scope, receive, send))
+    return sent[0]['status'], dict(sent[0]['headers']), sent[1]['body']
+
+def test_match_route_extracts_path_parameters():
+    fn, params, route_key, _ = asgi.match_route('PUT', '/tasks/abc/status')
+    assert fn is async_handler.aupdateTaskStatus
+    assert params == {'taskId': 'abc'}
+    assert route_key == 'PUT /tasks/{taskId}/status'
+
+def test_app_serves_sync_handler():
+    status, headers, body = call_app('GET', '/docs')
+    assert status == 200
+    assert headers[b'content-type'] == b'text/html'
+
+def test_app_not_found_and_method_not_allowed():
+    assert call_app('GET', '/nope')[0] == 404
+    assert call_app('POST', '/docs')[0] == 405
+
+def test_build_event_shape():
+    scope = {'method': 'GET', 'path': '/tasks', 'query_string': b'limit=5',
+             'headers': [(b'Authorization', b'Bearer t')]}
+    event = asgi.build_event(scope, b'', {}, 'GET /tasks')
+    assert event['headers'] == {'authorization': 'Bearer t'}
+    assert event['queryStringParameters'] == {'limit': '5'}
+    assert 'body' not in event
@@ -0,0 +1,69 @@
+import asyncio
+import json
+from unittest.mock import patch, MagicMock, AsyncMock
+
+try:
+    import async_handler
+except ImportError:
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    import async_handler
+
+MOCK_USER_ID = 'mock_user_123'
+
+def make_event(body=None, path_params=None, query=None):
+    return {'requestContext': {'authorizer': {'lambda': {'user_id': MOCK_USER_ID}}},
+            'body': json.dumps(body) if body is not None else '{}',
+            'pathParameters': path_params or {},
+            'queryStringParameters': query}
+
+@patch('async_handler.get_async_tasks_collection')
+def test_create_task(mock_get):
+    collection = MagicMock()
+    collection.insert_one = AsyncMock()
+    mock_get.return_value = collection
+    res = async_handler.createTask(make_event(body={'title': 'T'}), {})
+    assert res['statusCode'] == 201
+    collection.insert_one.assert_awaited_once()
+
+@patch('async_handler.get_async_tasks_collection')
+def test_get_tasks_pages(mock_get):
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=[{'_id': str(i), 'createdAt': float(i)} for i in range(3)])
+    collection = MagicMock()
+    collection.find.return_value.sort.return_value.limit.return_value = cursor
+    collection.count_documents = AsyncMock(return_value=3)
+    mock_get.return_value = collection
+    res = asyncio.run(async_handler.agetTasks(make_event(query={'limit': '2'}), {}))
+    assert res['headers']['ETag']
+    body = json.loads(res['body'])
+    assert len(body['items']) == 2 and body['next']
+
+@patch('async_handler.get_async_tasks_collection')
+def test_update_status_not_found(mock_get):
+    collection = MagicMock()
+    collection.find_one_and_update = AsyncMock(return_value=None)
+    mock_get.return_value = collection
+    res = async_handler.updateTaskStatus(make_event(body={'status': 'DONE'}, path_params={'taskId': 'x'}), {})
+    assert res['statusCode'] == 404
+
+def test_shared_loop_is_reused():
+    async_handler.run(asyncio.sleep(0))
+    loop = async_handler._loop
+    async_handler.run(asyncio.sleep(0))
+    assert async_handler._loop is loop
+
+@patch('async_handler.get_async_tasks_collection')
+def test_update_status_restores_archived_task(mock_get, empty_archive):
+    archived = {'_id': 'x', 'userId': MOCK_USER_ID, 'status': 'DONE', 'updatedAt': 1.0}
+    collection = MagicMock()
+    collection.find_one_and_update = AsyncMock(side_effect=[None, archived])
+    collection.insert_one = AsyncMock()
+    mock_get.return_value = collection
+    store = async_handler.get_async_archive_collection()
+    store.find_one = AsyncMock(return_value=archived)
+    store.delete_one = AsyncMock()
+    res = async_handler.updateTaskStatus(make_event(body={'status': 'TODO'}, path_params={'taskId': 'x'}), {})
+    assert res['statusCode'] == 200 and json.loads(res['body'])['status'] == 'TODO'
+    collection.insert_one.assert_awaited_once_with(archived)
+    store.delete_one.assert_awaited_once()
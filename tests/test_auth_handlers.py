@@ -9,6 +9,8 @@ except ImportError:
     import sys, os
     sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
     from auth_handlers import registerUser, loginUser
+import auth_handlers
+import revocation
 
 @pytest.fixture
 def mock_users_collection():
@@ -25,7 +27,7 @@ def mock_passlib_fixture():
         fixture.verify_return_value = mock_verify.return_value
         yield fixture
 
-@patch('auth_handlers.get_users_collection')
+@patch('storage_mongo.get_users_collection')
 @patch('auth_handlers.get_password_hash', return_value='mock_hashed_password')
 def test_register_user_success(mock_get_hash, mock_get_users, mock_users):
     mock_get_users.return_value = mock_users
@@ -40,7 +42,7 @@ def test_register_user_success(mock_get_hash, mock_get_users, mock_users):
     assert args[0]['hashedPassword']== 'mock_hashed_password'
     mock_get_hash.assert_called_once_with('password123')
 
-@patch('auth_handlers.get_users_collection')
+@patch('storage_mongo.get_users_collection')
 def test_register_user_existing_email(mock_get, mock_users):
     from pymongo.errors import DuplicateKeyError
     mock_get.return_value = mock_users
@@ -51,7 +53,7 @@ def test_register_user_existing_email(mock_get, mock_users):
     body=json.loads(res['body'])
     assert 'Email already registered' in body['message']
 
-@patch('auth_handlers.get_users_collection')
+@patch('storage_mongo.get_users_collection')
 @patch('auth_handlers.verify_password', return_value=True)
 @patch('auth_handlers.create_access_token', return_value='mock_token')
 def test_login_user_success(mock_create_token, mock_verify, mock_get_users, mock_users):
@@ -62,10 +64,11 @@ def test_login_user_success(mock_create_token, mock_verify, mock_get_users, mock
     assert res['statusCode']==200
     body=json.loads(res['body'])
     assert body['token']=='mock_token'
+    assert auth_handlers.decode_token(body['refreshToken'], 'refresh')['sub'] == 'user_id_123'
     mock_verify.assert_called_once_with('pw', 'some_hash')
     mock_create_token.assert_called_once_with(data={'sub': 'user_id_123'}, expires_delta=timedelta(hours=1))
 
-@patch('auth_handlers.get_users_collection')
+@patch('storage_mongo.get_users_collection')
 @patch('auth_handlers.verify_password', return_value=False)
 def test_login_user_invalid(mock_verify, mock_get_users, mock_users):
     mock_get_users.return_value = mock_users
@@ -75,10 +78,125 @@ def test_login_user_invalid(mock_verify, mock_get_users, mock_users):
     assert res['statusCode']==401
     mock_verify.assert_called_once_with('wrong', 'some_hash')
 
-@patch('auth_handlers.get_users_collection')
+@patch('storage_mongo.get_users_collection')
 def test_login_user_not_found(mock_get, mock_users):
     mock_get.return_value = mock_users
     mock_users.find_one.return_value = None
     event={'body': json.dumps({'email':'no','password':'pw'})}
     res = loginUser(event,{})
     assert res['statusCode']==401
+
+def _bearer_event(token):
+    return {'headers': {'authorization': f'Bearer {token}'}}
+
+def test_verify_token_caches_verified_tokens():
+    auth_handlers.clear_token_cache()
+    token = auth_handlers.create_access_token({'sub': 'user-1'})
+    with patch('auth_handlers.jwt.decode', wraps=auth_handlers.jwt.decode) as mock_decode:
+        assert auth_handlers.verify_token(_bearer_event(token)) == 'user-1'
+        assert auth_handlers.verify_token(_bearer_event(token)) == 'user-1'
+    assert mock_decode.call_count == 1
+
+def test_verify_token_cache_respects_expiry():
+    import hashlib, time
+    auth_handlers.clear_token_cache()
+    digest = hashlib.sha256(b'junk').digest()
+    auth_handlers._cache_user(digest, 'user-1', time.time() + 60)
+    assert auth_handlers.verify_token(_bearer_event('junk')) == 'user-1'
+    auth_handlers._cache_user(digest, 'user-1', time.time() - 1)
+    assert auth_handlers.verify_token(_bearer_event('junk')) is None
+
+def test_resolve_user_falls_back_to_authorizer_context():
+    event = {'requestContext': {'authorizer': {'lambda': {'user_id': 'ctx-user'}}}}
+    assert auth_handlers.resolve_user(event) == 'ctx-user'
+    assert auth_handlers.resolve_user({'headers': {'authorization': 'Bearer junk'}}) is None
+
+@patch('storage_mongo.get_users_collection')
+@patch('auth_handlers.verify_password', return_value=True)
+@patch('auth_handlers.password_needs_rehash', return_value=True)
+@patch('auth_handlers.get_password_hash', return_value='upgraded_hash')
+def test_login_rehashes_outdated_hash(mock_hash, mock_needs, mock_verify, mock_get_users, mock_users):
+    mock_get_users.return_value = mock_users
+    mock_users.find_one.return_value = {'_id': 'u1', 'email': 'test', 'hashedPassword': 'old_hash'}
+    res = loginUser({'body': json.dumps({'email': 'test', 'password': 'pw'})}, {})
+    assert res['statusCode'] == 200
+    mock_users.update_one.assert_called_once_with(
+        {'_id': 'u1', 'hashedPassword': 'old_hash'}, {'$set': {'hashedPassword': 'upgraded_hash'}})
+
+@patch('storage_mongo.get_users_collection')
+def test_login_ignores_legacy_password_field(mock_get_users, mock_users):
+    mock_get_users.return_value = mock_users
+    mock_users.find_one.return_value = {'_id': 'u1', 'email': 'test', 'password': 'pw'}
+    res = loginUser({'body': json.dumps({'email': 'test', 'password': 'pw'})}, {})
+    assert res['statusCode'] == 401
+
+@patch('storage_mongo.get_users_collection')
+@patch('auth_handlers.verify_password', side_effect=auth_handlers.HashingBusyError())
+def test_login_returns_503_when_hashing_saturated(mock_verify, mock_get_users, mock_users):
+    mock_get_users.return_value = mock_users
+    mock_users.find_one.return_value = {'_id': 'u1', 'email': 'test', 'hashedPassword': 'h'}
+    res = loginUser({'body': json.dumps({'email': 'test', 'password': 'pw'})}, {})
+    assert res['statusCode'] == 503
+
+def test_hashing_rejects_when_no_slot_frees_up(monkeypatch):
+    import threading
+    monkeypatch.setattr(auth_handlers, '_hash_slots', threading.BoundedSemaphore(1))
+    monkeypatch.setattr(auth_handlers, 'HASH_QUEUE_TIMEOUT_SECONDS', 0.01)
+    auth_handlers._hash_slots.acquire()
+    with pytest.raises(auth_handlers.HashingBusyError):
+        auth_handlers.get_password_hash('pw')
+
+@patch('auth_handlers.get_users_collection')
+def test_migrate_legacy_passwords(mock_get_users, mock_users):
+    mock_get_users.return_value = mock_users
+    bcrypt_hash = '$2b$12$R3fG8hJkLpQ9sW2vXyZ0Au.NlO4pQrStUvWxYzAbCdEfGhIjKlMn.'
+    mock_users.find.return_value = [{'_id': 'a', 'password': bcrypt_hash},
+                                    {'_id': 'b', 'password': 'h', 'hashedPassword': 'h'}]
+    assert auth_handlers.migrate_legacy_passwords() == 2
+    updates = [c[0] for c in mock_users.update_one.call_args_list]
+    assert updates[0] == ({'_id': 'a'}, {'$rename': {'password': 'hashedPassword'}})
+    assert updates[1] == ({'_id': 'b'}, {'$unset': {'password': ''}})
+
+def test_refresh_token_issues_new_tokens_and_rotates():
+    from auth_handlers import refreshToken
+    refresh = auth_handlers.create_refresh_token('user-1')
+    res = refreshToken({'body': json.dumps({'refreshToken': refresh})}, {})
+    assert res['statusCode'] == 200
+    body = json.loads(res['body'])
+    assert auth_handlers.verify_token(_bearer_event(body['token'])) == 'user-1'
+    again = refreshToken({'body': json.dumps({'refreshToken': refresh})}, {})
+    assert again['statusCode'] == 401
+
+def test_refresh_token_is_single_use_across_containers(isolated_revocations):
+    from pymongo.errors import DuplicateKeyError
+    from auth_handlers import refreshToken
+    refresh = auth_handlers.create_refresh_token('user-1')
+    assert refreshToken({'body': json.dumps({'refreshToken': refresh})}, {})['statusCode'] == 200
+    # A concurrent request on another container has not seen the revocation yet.
+    revocation.reset()
+    isolated_revocations.insert_one.side_effect = DuplicateKeyError('duplicate jti')
+    assert refreshToken({'body': json.dumps({'refreshToken': refresh})}, {})['statusCode'] == 401
+
+def test_async_resolve_verifies_tokens_off_the_event_loop(monkeypatch):
+    import asyncio
+    import threading
+    threads = []
+    monkeypatch.setattr(auth_handlers, 'verify_token', lambda event: threads.append(threading.get_ident()) or 'user-1')
+    assert asyncio.run(auth_handlers.aresolve_user(_bearer_event('token'))) == 'user-1'
+    assert threads[0] != threading.get_ident()
+    authorized = {'requestContext': {'authorizer': {'lambda': {'user_id': 'user-2'}}}}
+    assert asyncio.run(auth_handlers.aresolve_user(authorized)) == 'user-2' and len(threads) == 1
+
+def test_token_types_are_not_interchangeable():
+    from auth_handlers import refreshToken
+    access = auth_handlers.create_access_token({'sub': 'user-1'})
+    refresh = auth_handlers.create_refresh_token('user-1')
+    assert auth_handlers.verify_token(_bearer_event(refresh)) is None
+    assert refreshToken({'body': json.dumps({'refreshToken': access})}, {})['statusCode'] == 401
+
+def test_logout_revokes_cached_access_token():
+    from auth_handlers import logoutUser
+    access = auth_handlers.create_access_token({'sub': 'user-1'})
+    assert auth_handlers.verify_token(_bearer_event(access)) == 'user-1'
+    assert logoutUser(_bearer_event(access), {})['statusCode'] == 204
+    assert auth_handlers.verify_token(_bearer_event(access)) is None
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+try:
+    from authorizer import authorize
+except ImportError:
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    from authorizer import authorize
+import auth_handlers
+
+def test_authorize_valid_token():
+    auth_handlers.clear_token_cache()
+    token = auth_handlers.create_access_token({'sub': 'user-1'})
+    res = authorize({'headers': {'authorization': f'Bearer {token}'}}, {})
+    jti = auth_handlers.decode_token(token)['jti']
+    assert res == {'isAuthorized': True, 'context': {'user_id': 'user-1', 'jti': jti}}
+
+def test_authorize_invalid_token():
+    res = authorize({'headers': {'authorization': 'Bearer not-a-jwt'}}, {})
+    assert res == {'isAuthorized': False}
+
+@patch('auth_handlers.verify_token')
+def test_resolve_user_trusts_authorizer_context(mock_verify):
+    event = {'headers': {'authorization': 'Bearer x'},
+             'requestContext': {'authorizer': {'lambda': {'user_id': 'ctx-user'}}}}
+    assert auth_handlers.resolve_user(event) == 'ctx-user'
+    mock_verify.assert_not_called()
+
+def test_logout_rejects_cached_authorizer_decisions():
+    token = auth_handlers.create_access_token({'sub': 'user-1'})
+    headers = {'authorization': f'Bearer {token}'}
+    # What API Gateway passes to the handlers while the decision is cached.
+    event = {'headers': headers, 'requestContext': {'authorizer': {'lambda': authorize({'headers': headers}, {})['context']}}}
+    assert auth_handlers.resolve_user(event) == 'user-1'
+    assert auth_handlers.logoutUser({'headers': headers}, {})['statusCode'] == 204
+    assert auth_handlers.resolve_user(event) is None
+
+def test_authorizer_import_skips_heavy_dependencies():
+    code = ("import sys, authorizer; "
+            "heavy = [m for m in ('jwt', 'passlib.context', 'pymongo', 'dotenv') if m in sys.modules]; "
+            "assert not heavy, heavy")
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    subprocess.run([sys.executable, '-c', code], cwd=root, check=True)
@@ -0,0 +1,45 @@
+import pytest
+from unittest.mock import patch, MagicMock
+
+try:
+    import db
+except ImportError:
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    import db
+
+@pytest.fixture
+def fresh_db(monkeypatch):
+    monkeypatch.setattr(db, '_client', None)
+    monkeypatch.setattr(db, '_db', None)
+    monkeypatch.setattr(db, '_load_env', lambda: None)
+    monkeypatch.setenv('MONGO_URI', 'mongodb://localhost:27017')
+    monkeypatch.setenv('MONGO_TLS', 'false')
+    yield
+
+def test_client_options_from_env(monkeypatch):
+    monkeypatch.setenv('MONGO_MAX_POOL_SIZE', '3')
+    monkeypatch.setenv('MONGO_COMPRESSORS', 'zstd,snappy')
+    monkeypatch.setenv('MONGO_READ_PREFERENCE', 'secondaryPreferred')
+    monkeypatch.setenv('MONGO_TLS', 'false')
+    options = db.client_options()
+    assert options['maxPoolSize'] == 3
+    assert options['compressors'] == 'zstd,snappy'
+    assert options['readPreference'] == 'secondaryPreferred'
+    assert 'tls' not in options
+
+@patch('pymongo.MongoClient')
+def test_init_db_makes_no_round_trips(mock_client_cls, fresh_db):
+    db.init_db()
+    db.init_db()
+    mock_client_cls.assert_called_once()
+    client = mock_client_cls.return_value
+    client.admin.command.assert_not_called()
+    client.get_database.return_value.__getitem__.assert_not_called()
+
+@patch('pymongo.MongoClient')
+def test_ensure_indexes(mock_client_cls, fresh_db):
+    collections = MagicMock()
+    mock_client_cls.return_value.get_database.return_value.__getitem__.return_value = collections
+    db.ensure_indexes()
+    assert collections.create_index.call_count == len(db.INDEXES)
@@ -1,12 +1,22 @@
+import base64
+import gzip
+import json
 import pytest
 from unittest.mock import patch, mock_open
 
 try:
-    from docs_handlers import get_docs, get_openapi
+    from docs_handlers import get_docs, get_openapi, get_openapi_json
 except ImportError:
     import sys, os
     sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-    from docs_handlers import get_docs, get_openapi
+    from docs_handlers import get_docs, get_openapi, get_openapi_json
+import docs_handlers
+
+@pytest.fixture(autouse=True)
+def empty_docs_cache():
+    docs_handlers.clear_cache()
+    yield
+    docs_handlers.clear_cache()
 
 @patch("builtins.open", new_callable=mock_open, read_data="<html>Mock Docs</html>")
 @patch("os.path.dirname", return_value="/mock/project/dir")
@@ -49,3 +59,36 @@ def test_get_openapi_file_not_found(mock_dirname, mock_file):
     assert response["statusCode"] == 500
     assert "OpenAPI spec not available" in response["body"]
     assert "Spec file not found" in response["body"]
+
+def test_docs_loaded_once_per_container():
+    with patch("builtins.open", mock_open(read_data="<html>Mock Docs</html>")) as mock_file:
+        first = get_docs({}, {})
+        second = get_docs({}, {})
+    assert mock_file.call_count == 1
+    assert first == second
+    assert first["headers"]["Cache-Control"].startswith("public, max-age=")
+    assert first["headers"]["ETag"].startswith('"')
+
+def test_openapi_gzip_and_not_modified():
+    spec = "openapi: 3.1.0\ninfo:\n  title: " + "x" * 2000 + "\n"
+    with patch("builtins.open", mock_open(read_data=spec)):
+        with patch("serialization._brotli", lambda: None):
+            res = get_openapi({"headers": {"Accept-Encoding": "br, gzip"}}, {})
+    assert res["headers"]["Content-Encoding"] == "gzip"
+    assert res["isBase64Encoded"] is True
+    assert gzip.decompress(base64.b64decode(res["body"])).decode("utf-8") == spec
+    identity = get_openapi({}, {})
+    assert identity["body"] == spec
+    assert identity["headers"]["ETag"] != res["headers"]["ETag"]
+
+    event = {"headers": {"accept-encoding": "gzip", "if-none-match": res["headers"]["ETag"]}}
+    not_modified = get_openapi(event, {})
+    assert not_modified["statusCode"] == 304
+    assert not_modified["body"] == ""
+
+def test_get_openapi_json():
+    res = get_openapi_json({}, {})
+    assert res["statusCode"] == 200
+    assert res["headers"]["Content-Type"] == "application/json"
+    spec = json.loads(res["body"])
+    assert "/openapi.json" in spec["paths"]
@@ -1,14 +1,16 @@
 import pytest
 import json
+import time
 from unittest.mock import patch, MagicMock
 from bson import ObjectId
 
 try:
-    from handler import createTask, getTasks, updateTaskStatus, deleteTask, getTaskById
+    from handler import createTask, getTasks, updateTaskStatus, updateTask, deleteTask, getTaskById, getTaskChanges, batchTasks, healthCheck
 except ImportError:
     import sys, os
     sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-    from handler import createTask, getTasks, updateTaskStatus, deleteTask, getTaskById
+    from handler import createTask, getTasks, updateTaskStatus, updateTask, deleteTask, getTaskById, getTaskChanges, batchTasks, healthCheck
+import read_cache
 
 MOCK_USER_ID = 'mock_user_123'
 MOCK_TASK_ID_STR = '605c7d77b0ef4a1f7a1b2c3d'
@@ -24,7 +26,7 @@ def make_event(body=None, path_params=None, user_id=MOCK_USER_ID):
              'pathParameters': path_params or {}}
     return event
 
-@patch('handler.get_tasks_collection')
+@patch('storage_mongo.get_tasks_collection')
 def test_create_task(mock_get, mock_tasks_collection):
     mock_get.return_value = mock_tasks_collection
     mock_tasks_collection.insert_one.return_value = MagicMock(inserted_id=MOCK_TASK_ID_OBJ)
@@ -32,32 +34,271 @@ def test_create_task(mock_get, mock_tasks_collection):
     data = {'title': 'Test', 'description': 'Desc'}
     res = createTask(make_event(body=data), {})
     assert res['statusCode'] == 201
+    assert json.loads(res['body'])['title'] == 'Test'
+    mock_tasks_collection.find_one.assert_not_called()
 
-@patch('handler.get_tasks_collection')
+@patch('storage_mongo.get_tasks_collection')
 def test_get_tasks(mock_get, mock_tasks_collection):
     mock_get.return_value = mock_tasks_collection
     docs = [{'user_id': MOCK_USER_ID, '_id': ObjectId(), 'title': 'A', 'completed': False}]
-    mock_tasks_collection.find.return_value = docs
+    mock_tasks_collection.find.return_value.sort.return_value.limit.return_value = docs
     res = getTasks(make_event(), {})
     assert res['statusCode'] == 200
+    body = json.loads(res['body'])
+    assert len(body['items']) == 1
+    assert body['next'] is None
 
-@patch('handler.get_tasks_collection')
+@patch('handler.task_list_state', return_value=(100.0, 3))
+@patch('storage_mongo.get_tasks_collection')
+def test_get_tasks_paginates(mock_get, mock_state, mock_tasks_collection):
+    mock_get.return_value = mock_tasks_collection
+    docs = [{'_id': f'id-{i}', 'title': str(i), 'createdAt': 100.0 - i} for i in range(3)]
+    cursor = mock_tasks_collection.find.return_value.sort.return_value
+    cursor.limit.return_value = docs
+    event = make_event()
+    event['queryStringParameters'] = {'limit': '2', 'status': 'TODO', 'fields': 'title'}
+    res = getTasks(event, {})
+    assert res['statusCode'] == 200
+    body = json.loads(res['body'])
+    assert [t['title'] for t in body['items']] == ['0', '1']
+    assert 'createdAt' not in body['items'][0]
+    cursor.limit.assert_called_once_with(3)
+    query, projection = mock_tasks_collection.find.call_args[0]
+    assert query == {'userId': MOCK_USER_ID, 'status': 'TODO'}
+    assert projection == {'title': 1, 'createdAt': 1, '_id': 1}
+
+    event['queryStringParameters'] = {'limit': '2', 'cursor': body['next']}
+    getTasks(event, {})
+    query, _ = mock_tasks_collection.find.call_args[0]
+    assert query['$or'][1] == {'createdAt': 99.0, '_id': {'$lt': 'id-1'}}
+
+@patch('handler.task_list_state', return_value=(100.0, 300))
+@patch('storage_mongo.get_tasks_collection')
+def test_get_tasks_compresses_large_pages(mock_get, mock_state, mock_tasks_collection):
+    import base64, gzip
+    mock_get.return_value = mock_tasks_collection
+    docs = [{'_id': f'id-{i}', 'title': 'task', 'createdAt': 100.0 - i} for i in range(50)]
+    mock_tasks_collection.find.return_value.sort.return_value.limit.return_value = docs
+    event = make_event()
+    event['headers'] = {'Accept-Encoding': 'gzip'}
+    res = getTasks(event, {})
+    assert res['headers']['Content-Encoding'] == 'gzip' and res['isBase64Encoded']
+    body = json.loads(gzip.decompress(base64.b64decode(res['body'])))
+    assert len(body['items']) == 50
+
+def test_get_tasks_rejects_bad_params():
+    for params in ({'limit': 'abc'}, {'order': 'sideways'}, {'cursor': '!!'}, {'fields': 'password'}):
+        event = make_event()
+        event['queryStringParameters'] = params
+        assert getTasks(event, {})['statusCode'] == 400
+
+@patch('storage_mongo.get_tasks_collection')
 def test_update_task_not_found(mock_get, mock_tasks_collection):
     mock_get.return_value = mock_tasks_collection
-    mock_tasks_collection.update_one.return_value = MagicMock(modified_count=0)
+    mock_tasks_collection.find_one_and_update.return_value = None
     res = updateTaskStatus(make_event(body={'status': 'DONE'}, path_params={'taskId': 'non-existent-id'}), {})
     assert res['statusCode'] == 404
 
-@patch('handler.get_tasks_collection')
-def test_delete_task(mock_get, mock_tasks_collection):
+@patch('storage_mongo.get_tasks_collection')
+def test_update_task_status_unchanged_returns_task(mock_get, mock_tasks_collection):
+    mock_get.return_value = mock_tasks_collection
+    mock_tasks_collection.find_one_and_update.return_value = {'_id': MOCK_TASK_ID_STR, 'status': 'DONE'}
+    res = updateTaskStatus(make_event(body={'status': 'DONE'}, path_params={'taskId': MOCK_TASK_ID_STR}), {})
+    assert res['statusCode'] == 200
+    mock_tasks_collection.find_one.assert_not_called()
+
+@patch('storage_mongo.get_tasks_collection')
+def test_patch_task_with_if_match(mock_get, mock_tasks_collection):
     mock_get.return_value = mock_tasks_collection
-    mock_tasks_collection.delete_one.return_value = MagicMock(deleted_count=1)
+    mock_tasks_collection.find_one_and_update.return_value = {'_id': MOCK_TASK_ID_STR, 'title': 'New'}
+    event = make_event(body={'title': 'New', 'status': 'IN_PROGRESS'}, path_params={'taskId': MOCK_TASK_ID_STR})
+    event['headers'] = {'if-match': '"1700000000.5"'}
+    res = updateTask(event, {})
+    assert res['statusCode'] == 200
+    query, update = mock_tasks_collection.find_one_and_update.call_args[0]
+    assert query == {'_id': MOCK_TASK_ID_STR, 'userId': MOCK_USER_ID, 'updatedAt': 1700000000.5}
+    assert update['$set']['title'] == 'New' and update['$set']['status'] == 'IN_PROGRESS'
+
+@patch('storage_mongo.get_tasks_collection')
+def test_patch_task_version_conflict(mock_get, mock_tasks_collection):
+    mock_get.return_value = mock_tasks_collection
+    mock_tasks_collection.find_one_and_update.return_value = None
+    mock_tasks_collection.find_one.return_value = {'_id': MOCK_TASK_ID_STR}
+    event = make_event(body={'description': 'x'}, path_params={'taskId': MOCK_TASK_ID_STR})
+    event['headers'] = {'If-Match': '1.0'}
+    assert updateTask(event, {})['statusCode'] == 412
+
+def test_patch_task_requires_changes():
+    res = updateTask(make_event(body={}, path_params={'taskId': MOCK_TASK_ID_STR}), {})
+    assert res['statusCode'] == 400
+
+@patch('storage_mongo.get_tombstones_collection')
+@patch('storage_mongo.get_tasks_collection')
+def test_delete_task(mock_get, mock_tombstones, mock_tasks_collection):
+    mock_get.return_value = mock_tasks_collection
+    mock_tasks_collection.find_one_and_delete.return_value = {'_id': MOCK_TASK_ID_STR, 'status': 'DONE'}
     res = deleteTask(make_event(path_params={'taskId': MOCK_TASK_ID_STR}), {})
     assert res['statusCode'] == 204
+    tombstone = mock_tombstones.return_value.bulk_write.call_args[0][0][0]._doc
+    assert tombstone['_id'] == MOCK_TASK_ID_STR and tombstone['userId'] == MOCK_USER_ID
+
+@patch('storage_mongo.get_tombstones_collection')
+@patch('storage_mongo.get_tasks_collection')
+def test_delete_missing_task_leaves_no_tombstone(mock_get, mock_tombstones, mock_tasks_collection):
+    mock_get.return_value = mock_tasks_collection
+    mock_tasks_collection.find_one_and_delete.return_value = None
+    res = deleteTask(make_event(path_params={'taskId': MOCK_TASK_ID_STR}), {})
+    assert res['statusCode'] == 404
+    mock_tombstones.return_value.bulk_write.assert_not_called()
+
+@patch('storage_mongo.get_tombstones_collection')
+@patch('storage_mongo.get_tasks_collection')
+def test_get_task_changes(mock_get, mock_tombstones, mock_tasks_collection):
+    from pagination import decode_cursor
+    now = time.time()
+    mock_get.return_value = mock_tasks_collection
+    mock_tasks_collection.find.return_value.sort.return_value.limit.return_value = [
+        {'_id': 'a', 'updatedAt': now - 30}, {'_id': 'b', 'updatedAt': now - 10}]
+    mock_tombstones.return_value.find.return_value.sort.return_value.limit.return_value = [
+        {'_id': 'c', 'deletedAt': now - 20}]
+    event = make_event()
+    event['queryStringParameters'] = {'limit': '2'}
+    res = getTaskChanges(event, {})
+    assert res['statusCode'] == 200
+    body = json.loads(res['body'])
+    assert [t['_id'] for t in body['changes']] == ['a']
+    assert body['deleted'] == [{'taskId': 'c', 'deletedAt': now - 20}]
+    assert body['hasMore'] is True
+    assert decode_cursor(body['watermark'], 2) == [now - 20, 'c']
 
-@patch('handler.get_tasks_collection')
+    event['queryStringParameters'] = {'since': body['watermark']}
+    getTaskChanges(event, {})
+    task_filter = mock_tasks_collection.find.call_args[0][0]
+    assert task_filter['userId'] == MOCK_USER_ID
+    assert task_filter['$or'][0] == {'updatedAt': {'$gt': now - 20}}
+
+def test_get_task_changes_rejects_expired_watermark():
+    from pagination import encode_cursor
+    event = make_event()
+    event['queryStringParameters'] = {'since': encode_cursor([1.0, 'a'])}
+    assert getTaskChanges(event, {})['statusCode'] == 410
+    event['queryStringParameters'] = {'since': 'not-a-cursor'}
+    assert getTaskChanges(event, {})['statusCode'] == 400
+
+@patch('storage_mongo.get_tasks_collection')
 def test_get_task_by_id(mock_get, mock_tasks_collection):
     mock_get.return_value = mock_tasks_collection
     mock_tasks_collection.find_one.return_value = {'_id': MOCK_TASK_ID_OBJ, 'user_id': MOCK_USER_ID, 'title': 'X', 'completed': False}
     res = getTaskById(make_event(path_params={'taskId': MOCK_TASK_ID_STR}), {})
     assert res['statusCode'] == 200
+
+@patch('storage_mongo.get_tombstones_collection')
+@patch('storage_mongo.get_tasks_collection')
+def test_batch_tasks(mock_get, mock_tombstones, mock_tasks_collection, mock_stats):
+    mock_get.return_value = mock_tasks_collection
+    mock_tasks_collection.find.return_value = [{'_id': 't1', 'status': 'TODO'}, {'_id': 't2', 'status': 'DONE'}]
+    mock_tasks_collection.bulk_write.return_value = MagicMock(
+        bulk_api_result={'nInserted': 1, 'nMatched': 1, 'nModified': 1, 'nRemoved': 1})
+    ops = [{'op': 'create', 'title': 'A'},
+           {'op': 'updateStatus', 'taskId': 't1', 'status': 'DONE'},
+           {'op': 'delete', 'taskId': 't2'},
+           {'op': 'create'}]
+    res = batchTasks(make_event(body={'operations': ops}), {})
+    assert res['statusCode'] == 200
+    body = json.loads(res['body'])
+    assert [r['ok'] for r in body['results']] == [True, True, True, False]
+    assert body['inserted'] == 1 and body['deleted'] == 1
+    requests = mock_tasks_collection.bulk_write.call_args[0][0]
+    assert len(requests) == 3
+    assert mock_tasks_collection.bulk_write.call_args[1] == {'ordered': False}
+    assert [r._filter['_id'] for r in mock_tombstones.return_value.bulk_write.call_args[0][0]] == ['t2']
+
+@patch('storage_mongo.get_tasks_collection')
+def test_batch_tasks_reports_write_errors(mock_get, mock_tasks_collection):
+    from pymongo.errors import BulkWriteError
+    mock_get.return_value = mock_tasks_collection
+    mock_tasks_collection.bulk_write.side_effect = BulkWriteError({
+        'writeErrors': [{'index': 1, 'errmsg': 'boom'}], 'nInserted': 1, 'nRemoved': 0})
+    ops = [{'op': 'create', 'title': 'A'}, {'op': 'create', 'title': 'B'}]
+    body = json.loads(batchTasks(make_event(body={'operations': ops}), {})['body'])
+    assert body['results'][1] == {'index': 1, 'op': 'create', 'taskId': body['results'][1]['taskId'], 'error': 'boom', 'ok': False}
+    assert body['inserted'] == 1
+
+def test_batch_tasks_rejects_missing_and_foreign_ids():
+    import storage
+    storage.use_engine('memory')
+    try:
+        tasks = storage.task_repository()
+        for task_id, owner in [('mine', MOCK_USER_ID), ('theirs', 'someone-else')]:
+            tasks.insert({'_id': task_id, 'userId': owner, 'title': 'X', 'description': '', 'status': 'TODO',
+                          'createdAt': 1.0, 'updatedAt': 1.0})
+        ops = [{'op': 'updateStatus', 'taskId': 'missing', 'status': 'DONE'},
+               {'op': 'delete', 'taskId': 'theirs'},
+               {'op': 'delete', 'taskId': 'mine'},
+               {'op': 'updateStatus', 'taskId': 'mine', 'status': 'DONE'}]
+        body = json.loads(batchTasks(make_event(body={'operations': ops}), {})['body'])
+        assert [r['ok'] for r in body['results']] == [False, False, True, False]
+        assert {r.get('error') for r in body['results']} == {'Task not found', None}
+        assert body['deleted'] == 1 and body['modified'] == 0
+        assert tasks.get('someone-else', 'theirs')['status'] == 'TODO'
+    finally:
+        storage.use_engine('mongo')
+
+def test_batch_tasks_rejects_empty():
+    assert batchTasks(make_event(body={'operations': []}), {})['statusCode'] == 400
+
+@patch('handler.health_check', return_value={'db': 'ok', 'latencyMs': 1.0})
+def test_health_check(mock_health):
+    res = healthCheck({}, {})
+    assert res['statusCode'] == 200
+    assert json.loads(res['body'])['status'] == 'ok'
+
+@patch('handler.health_check', side_effect=Exception('down'))
+def test_health_check_unavailable(mock_health):
+    assert healthCheck({}, {})['statusCode'] == 503
+
+@patch('storage_mongo.get_tasks_collection')
+def test_get_task_by_id_conditional(mock_get, mock_tasks_collection):
+    mock_get.return_value = mock_tasks_collection
+    task = {'_id': MOCK_TASK_ID_STR, 'userId': MOCK_USER_ID, 'title': 'X', 'updatedAt': 1700000000.5}
+    mock_tasks_collection.find_one.return_value = task
+    res = getTaskById(make_event(path_params={'taskId': MOCK_TASK_ID_STR}), {})
+    etag = res['headers']['ETag']
+    assert res['headers']['Cache-Control'] == 'private, no-cache'
+    assert res['headers']['Last-Modified'] == 'Tue, 14 Nov 2023 22:13:20 GMT'
+
+    event = make_event(path_params={'taskId': MOCK_TASK_ID_STR})
+    event['headers'] = {'if-none-match': etag}
+    res = getTaskById(event, {})
+    assert res['statusCode'] == 304
+    assert 'body' not in res
+
+@patch('handler.task_list_state', return_value=(1700000000.5, 7))
+@patch('storage_mongo.get_tasks_collection')
+def test_get_tasks_not_modified_skips_list_query(mock_get, mock_state, mock_tasks_collection):
+    mock_get.return_value = mock_tasks_collection
+    mock_tasks_collection.find.return_value.sort.return_value.limit.return_value = []
+    first = getTasks(make_event(), {})
+    mock_tasks_collection.find.reset_mock()
+    event = make_event()
+    event['headers'] = {'If-None-Match': first['headers']['ETag']}
+    res = getTasks(event, {})
+    assert res['statusCode'] == 304
+    mock_tasks_collection.find.assert_not_called()
+
+    mock_state.return_value = (1700000001.0, 7)
+    read_cache.invalidate(MOCK_USER_ID)  # as every write through the handlers does
+    assert getTasks(event, {})['statusCode'] == 200
+
+@patch('storage_mongo.get_tasks_collection')
+def test_patch_task_accepts_etag_if_match(mock_get, mock_tasks_collection):
+    from handler import task_etag
+    mock_get.return_value = mock_tasks_collection
+    mock_tasks_collection.find_one_and_update.return_value = {'_id': MOCK_TASK_ID_STR, 'updatedAt': 2.0}
+    event = make_event(body={'title': 'New'}, path_params={'taskId': MOCK_TASK_ID_STR})
+    event['headers'] = {'If-Match': task_etag({'_id': MOCK_TASK_ID_STR, 'updatedAt': 1.5})}
+    assert updateTask(event, {})['statusCode'] == 200
+    assert mock_tasks_collection.find_one_and_update.call_args[0][0]['updatedAt'] == 1.5
+
+    event['headers'] = {'If-Match': task_etag({'_id': 'other-task', 'updatedAt': 1.5})}
+    assert updateTask(event, {})['statusCode'] == 412
@@ -0,0 +1,115 @@
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+
+try:
+    import metrics
+except ImportError:
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    import metrics
+import handler
+
+MOCK_USER_ID = 'mock_user_123'
+
+@pytest.fixture
+def emf(monkeypatch, capsys):
+    """Enable metrics with every invocation sampled; yields a reader of emitted records."""
+    monkeypatch.setattr(metrics, 'METRICS_ENABLED', True)
+    monkeypatch.setattr(metrics, 'METRICS_SAMPLE_RATE', 1.0)
+    monkeypatch.setattr(metrics, '_cold', True)
+
+    def records():
+        lines = capsys.readouterr().out.splitlines()
+        return [json.loads(line) for line in lines if line.startswith('{"_aws"')]
+    yield records
+
+def test_records_phases_and_mongo_time(emf):
+    @metrics.instrument
+    def fake_handler(event, context):
+        with metrics.phase('auth'):
+            pass
+        metrics.record_command('find', 2500)
+        metrics.record_command('find', 500)
+        metrics.record_command('insert', 1000)
+        return handler.create_response(200, {'ok': True})
+
+    fake_handler({}, SimpleNamespace(aws_request_id='req-1'))
+    fake_handler({}, None)
+    first, second = emf()
+    assert first['Function'] == 'fake_handler' and first['RequestId'] == 'req-1'
+    assert (first['ColdStart'], second['ColdStart']) == (1, 0)
+    assert first['MongoTime'] == 4.0 and first['MongoCalls'] == 3
+    assert first['MongoCommands'] == {'find': {'ms': 3.0, 'calls': 2}, 'insert': {'ms': 1.0, 'calls': 1}}
+    assert first['ResponseBytes'] == len('{"ok":true}') and first['StatusCode'] == 200
+    assert first['SerializationTime'] > 0 and first['AuthTime'] >= 0
+    directive = first['_aws']['CloudWatchMetrics'][0]
+    assert directive['Dimensions'] == [['Function']]
+    names = {m['Name']: m['Unit'] for m in directive['Metrics']}
+    assert names['Duration'] == 'Milliseconds' and names['ResponseBytes'] == 'Bytes'
+    assert names['MongoTime.find'] == 'Milliseconds'
+    assert 'Spans' not in first
+
+def test_every_invocation_is_emitted_and_details_are_sampled(emf, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_SAMPLE_RATE', 0.0)
+    ok = metrics.instrument(lambda event, context: {'statusCode': 200, 'body': ''})
+    failing = metrics.instrument(lambda event, context: {'statusCode': 503, 'body': ''})
+    ok({}, None)
+    ok({}, None)
+    failing({}, None)
+    records = emf()
+    assert [(r['ColdStart'], r['StatusCode']) for r in records] == [(1, 200), (0, 200), (0, 503)]
+    assert ['MongoCommands' in r for r in records] == [True, False, True]
+    assert all('Duration' in r and r['_aws']['CloudWatchMetrics'] for r in records)
+
+def test_trace_spans(emf, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_TRACE', True)
+    monkeypatch.setenv('_X_AMZN_TRACE_ID', 'Root=1-abc')
+
+    @metrics.instrument
+    def traced(event, context):
+        with metrics.phase('serialization'):
+            metrics.record_command('aggregate', 1000)
+        return {'statusCode': 200}
+
+    traced({}, None)
+    record = emf()[0]
+    assert record['TraceId'] == 'Root=1-abc'
+    assert [s['name'] for s in record['Spans']] == ['mongo.aggregate', 'serialization']
+
+def test_exceptions_are_reported_as_errors(emf):
+    @metrics.instrument
+    def broken(event, context):
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        broken({}, None)
+    assert emf()[0]['StatusCode'] is None
+
+def test_disabled_is_a_passthrough(capsys):
+    metrics.record_command('find', 1000)  # outside an invocation: ignored
+    assert metrics.command_listeners() == []
+    res = handler.getTaskStats({'requestContext': {}}, None)
+    assert res['statusCode'] == 401
+    assert capsys.readouterr().out == ''
+
+@patch('storage_mongo.get_tasks_collection')
+def test_handlers_are_instrumented(mock_get, emf):
+    mock_get.return_value = MagicMock()
+    event = {'requestContext': {'authorizer': {'lambda': {'user_id': MOCK_USER_ID}}}, 'body': '{"title": "T"}'}
+    assert handler.createTask(event, None)['statusCode'] == 201
+    record = emf()[0]
+    assert record['Function'] == 'createTask' and record['ResponseBytes'] > 0
+
+def test_listener_feeds_command_durations(emf):
+    listener = None
+
+    @metrics.instrument
+    def with_listener(event, context):
+        listener.succeeded(SimpleNamespace(command_name='find', duration_micros=1500))
+        return {'statusCode': 200}
+
+    listener = metrics.command_listeners()[0]
+    with_listener({}, None)
+    assert emf()[0]['MongoCommands'] == {'find': {'ms': 1.5, 'calls': 1}}
@@ -0,0 +1,29 @@
+import pytest
+
+try:
+    from pagination import decode_cursor, encode_cursor, keyset_filter, parse_limit
+except ImportError:
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    from pagination import decode_cursor, encode_cursor, keyset_filter, parse_limit
+
+def test_cursor_round_trip():
+    token = encode_cursor([1700000000.5, 'abc'])
+    assert decode_cursor(token, 2) == [1700000000.5, 'abc']
+
+def test_decode_cursor_rejects_garbage():
+    with pytest.raises(ValueError):
+        decode_cursor('not-a-cursor', 2)
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor([1]), 2)
+
+def test_parse_limit_clamps():
+    assert parse_limit(None) == 50
+    assert parse_limit('1000') == 200
+    with pytest.raises(ValueError):
+        parse_limit('0')
+
+def test_keyset_filter_ascending():
+    assert keyset_filter(['createdAt', '_id'], [5, 'x'], False) == {
+        '$or': [{'createdAt': {'$gt': 5}}, {'createdAt': 5, '_id': {'$gt': 'x'}}]
+    }
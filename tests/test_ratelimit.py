@@ -0,0 +1,111 @@
+import asyncio
+import json
+from unittest.mock import patch, MagicMock
+import pytest
+
+try:
+    import ratelimit
+except ImportError:
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    import ratelimit
+import asgi
+import auth_handlers
+import handler
+
+MOCK_USER_ID = 'mock_user_123'
+
+def user_event(user_id=MOCK_USER_ID):
+    return {'requestContext': {'authorizer': {'lambda': {'user_id': user_id}}}, 'body': '{}'}
+
+def ip_event(ip):
+    return {'requestContext': {'http': {'sourceIp': ip}}, 'body': json.dumps({'email': 'a@example.com'})}
+
+def test_parse_limits():
+    assert ratelimit.parse_limits('default=100/60, loginUser=5/1,x=7') == {
+        'default': (100, 60.0), 'loginUser': (5, 1.0), 'x': (7, 60.0)}
+    with pytest.raises(ValueError):
+        ratelimit.parse_limits('loginUser=5/0')
+
+def test_local_bucket_rejects_with_retry_after(monkeypatch):
+    monkeypatch.setitem(ratelimit.RATE_LIMITS, 'getTaskStats', (2, 60.0))
+    clock = [1000.0]
+    monkeypatch.setattr(ratelimit.time, 'time', lambda: clock[0])
+    assert ratelimit.check('getTaskStats', user_event()) is None
+    assert ratelimit.check('getTaskStats', user_event()) is None
+    res = ratelimit.check('getTaskStats', user_event())
+    assert res['statusCode'] == 429 and res['headers']['Retry-After'] == '30'
+    assert ratelimit.check('getTaskStats', user_event('someone-else')) is None
+    clock[0] += 30
+    assert ratelimit.check('getTaskStats', user_event()) is None
+
+def test_login_is_limited_per_client_ip(monkeypatch):
+    monkeypatch.setitem(ratelimit.RATE_LIMITS, 'loginUser', (1, 60.0))
+    with patch('storage_mongo.get_users_collection') as mock_users:
+        mock_users.return_value.find_one.return_value = None
+        assert auth_handlers.loginUser(ip_event('10.0.0.1'), None)['statusCode'] == 400
+        res = auth_handlers.loginUser(ip_event('10.0.0.1'), None)
+        assert res['statusCode'] == 429 and json.loads(res['body'])['error'] == 'Too Many Requests'
+        assert auth_handlers.loginUser(ip_event('10.0.0.2'), None)['statusCode'] == 400
+    assert mock_users.return_value.find_one.call_count == 0
+
+def test_shared_store_blocks_across_containers(monkeypatch):
+    monkeypatch.setitem(ratelimit.RATE_LIMITS, 'getTaskStats', (3, 60.0))
+    monkeypatch.setattr(ratelimit.time, 'time', lambda: 1030.0)
+    shared = ratelimit.MemoryCounterStore()
+    ratelimit.set_store(shared)
+    for _ in range(3):
+        assert ratelimit.check('getTaskStats', user_event()) is None
+        ratelimit.reset()  # the next request lands on a fresh container
+    res = ratelimit.check('getTaskStats', user_event())
+    assert res['headers']['Retry-After'] == '50'
+    shared.incr = MagicMock(side_effect=AssertionError('blocked locally'))
+    assert ratelimit.check('getTaskStats', user_event())['statusCode'] == 429
+
+def test_shared_counts_are_batched_until_near_the_limit(monkeypatch):
+    monkeypatch.setitem(ratelimit.RATE_LIMITS, 'getTaskStats', (40, 60.0))
+    monkeypatch.setattr(ratelimit.time, 'time', lambda: 1030.0)
+    shared = ratelimit.MemoryCounterStore()
+    shared._counts['getTaskStats:user:mock_user_123:1020'] = (22, 1080.0)  # other containers
+    incr = MagicMock(side_effect=shared.incr)
+    ratelimit.set_store(MagicMock(incr=incr))
+    for _ in range(18):
+        assert ratelimit.check('getTaskStats', user_event()) is None
+    assert [c.args[2] for c in incr.call_args_list] == [4, 4, 4, 4, 1, 1]
+    assert ratelimit.check('getTaskStats', user_event())['headers']['Retry-After'] == '50'
+
+def test_store_errors_let_requests_through(monkeypatch):
+    store = MagicMock()
+    store.incr.side_effect = Exception('down')
+    ratelimit.set_store(store)
+    assert ratelimit.check('getTaskStats', user_event()) is None
+
+def test_mongo_counter_is_one_atomic_upsert():
+    with patch('db.get_rate_limits_collection') as mock_get:
+        mock_get.return_value.find_one_and_update.return_value = {'_id': 'k', 'n': 4}
+        assert ratelimit.MongoCounterStore().incr('k', 1060.0, 3) == 4
+    query, update = mock_get.return_value.find_one_and_update.call_args[0]
+    assert query == {'_id': 'k'} and update['$inc'] == {'n': 3}
+    assert update['$setOnInsert']['expiresAt'].timestamp() == 1060.0
+
+def test_asgi_limits_async_handlers(monkeypatch):
+    monkeypatch.setitem(ratelimit.RATE_LIMITS, 'getTaskStats', (1, 60.0))
+    async def stats(event, context):
+        return handler.create_response(200, {})
+    monkeypatch.setattr(asgi, 'ROUTES', [('GET', '/tasks/stats', stats)])
+    token = auth_handlers.create_access_token({'sub': MOCK_USER_ID})
+    scope = {'type': 'http', 'method': 'GET', 'path': '/tasks/stats', 'query_string': b'',
+             'headers': [(b'authorization', f'Bearer {token}'.encode())]}
+
+    def call():
+        sent = []
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        async def send(message):
+            sent.append(message)
+        asyncio.run(asgi.app(scope, receive, send))
+        return sent[0]
+
+    assert call()['status'] == 200
+    rejected = call()
+    assert rejected['status'] == 429 and (b'retry-after', b'60') in rejected['headers']
@@ -0,0 +1,129 @@
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+
+try:
+    import read_cache
+except ImportError:
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    import read_cache
+import handler
+
+MOCK_USER_ID = 'mock_user_123'
+TASK = {'_id': 'task-1', 'title': 'T', 'status': 'TODO', 'updatedAt': 5.0, 'userId': MOCK_USER_ID}
+
+def ok(body):
+    return {'statusCode': 200, 'body': json.dumps(body), 'headers': {'ETag': '"x"'}}
+
+def make_event(body=None, path_params=None):
+    return {'requestContext': {'authorizer': {'lambda': {'user_id': MOCK_USER_ID}}},
+            'body': json.dumps(body) if body is not None else '{}',
+            'pathParameters': path_params or {}}
+
+def test_hit_miss_and_invalidation():
+    gen = read_cache.generation(MOCK_USER_ID)
+    assert read_cache.get(MOCK_USER_ID, 'k', gen) is None
+    read_cache.put(MOCK_USER_ID, 'k', gen, ok([1]))
+    cached = read_cache.get(MOCK_USER_ID, 'k', read_cache.generation(MOCK_USER_ID))
+    assert cached == ok([1])
+    cached['headers']['ETag'] = 'mutated'
+    assert read_cache.get(MOCK_USER_ID, 'k', gen)['headers']['ETag'] == '"x"'
+
+    read_cache.invalidate(MOCK_USER_ID)
+    assert read_cache.get(MOCK_USER_ID, 'k', read_cache.generation(MOCK_USER_ID)) is None
+    assert read_cache.get('other-user', 'k', read_cache.generation('other-user')) is None
+    metrics = read_cache.metrics()
+    assert (metrics['hits'], metrics['misses'], metrics['invalidations']) == (2, 3, 1)
+
+def test_read_racing_a_write_is_not_served():
+    gen = read_cache.generation(MOCK_USER_ID)  # taken before the Mongo query
+    read_cache.invalidate(MOCK_USER_ID)        # write commits meanwhile
+    read_cache.put(MOCK_USER_ID, 'k', gen, ok(['stale']))
+    assert read_cache.get(MOCK_USER_ID, 'k', read_cache.generation(MOCK_USER_ID)) is None
+
+def test_bounds_evict_least_recently_used():
+    gen = read_cache.generation(MOCK_USER_ID)
+    with patch.object(read_cache, 'READ_CACHE_MAX_ENTRIES', 2):
+        for key in ('a', 'b'):
+            read_cache.put(MOCK_USER_ID, key, gen, ok([key]))
+        read_cache.get(MOCK_USER_ID, 'a', gen)
+        read_cache.put(MOCK_USER_ID, 'c', gen, ok(['c']))
+        assert read_cache.get(MOCK_USER_ID, 'b', gen) is None
+        assert read_cache.get(MOCK_USER_ID, 'a', gen) is not None
+    with patch.object(read_cache, 'READ_CACHE_MAX_BYTES', 100):
+        read_cache.put(MOCK_USER_ID, 'big', gen, ok(['x' * 200]))
+        assert read_cache.get(MOCK_USER_ID, 'big', gen) is None
+    assert read_cache.metrics()['evictions'] == 1
+
+def test_entries_expire():
+    gen = read_cache.generation(MOCK_USER_ID)
+    with patch('read_cache.time.monotonic', return_value=1000.0):
+        read_cache.put(MOCK_USER_ID, 'k', gen, ok([1]))
+    with patch('read_cache.time.monotonic', return_value=1000.0 + read_cache.READ_CACHE_TTL_SECONDS + 1):
+        assert read_cache.get(MOCK_USER_ID, 'k', gen) is None
+    assert read_cache.metrics()['expirations'] == 1
+
+def test_shared_tier_invalidates_across_containers():
+    shared = read_cache.MemoryBackend()
+    read_cache.set_backend(shared)
+    gen = read_cache.generation(MOCK_USER_ID)
+    read_cache.put(MOCK_USER_ID, 'k', gen, ok([1]))
+    read_cache.reset()  # a second container: empty local tier, same shared tier
+    assert read_cache.get(MOCK_USER_ID, 'k', read_cache.generation(MOCK_USER_ID)) == ok([1])
+    assert read_cache.metrics()['sharedHits'] == 1
+
+    shared.incr(f'gen:{MOCK_USER_ID}')  # a write in some other container
+    assert read_cache.get(MOCK_USER_ID, 'k', read_cache.generation(MOCK_USER_ID)) is None
+
+def test_shared_tier_errors_bypass_the_cache():
+    broken = MagicMock(spec=read_cache.CacheBackend)
+    broken.get.side_effect = ConnectionError('down')
+    broken.incr.side_effect = ConnectionError('down')
+    read_cache.set_backend(broken)
+    assert read_cache.generation(MOCK_USER_ID) is None
+    read_cache.invalidate(MOCK_USER_ID)
+    assert read_cache.metrics()['errors'] == 2
+
+def test_make_backend():
+    assert read_cache.make_backend('') is None
+    assert isinstance(read_cache.make_backend('memory://'), read_cache.MemoryBackend)
+    with pytest.raises(ValueError):
+        read_cache.make_backend('memcached://localhost')
+
+@patch('storage_mongo.get_tasks_collection')
+def test_handlers_serve_reads_from_cache_until_a_write(mock_get):
+    collection = MagicMock()
+    mock_get.return_value = collection
+    collection.find_one.return_value = dict(TASK)
+    event = make_event(path_params={'taskId': 'task-1'})
+    first = handler.getTaskById(event, {})
+    assert handler.getTaskById(event, {}) == first
+    assert collection.find_one.call_count == 1
+
+    event['headers'] = {'If-None-Match': first['headers']['ETag']}
+    assert handler.getTaskById(event, {})['statusCode'] == 304
+    assert collection.find_one.call_count == 1
+
+    collection.find_one_and_update.return_value = dict(TASK)
+    handler.updateTaskStatus(make_event(body={'status': 'DONE'}, path_params={'taskId': 'task-1'}), {})
+    collection.find_one.return_value = {**TASK, 'status': 'DONE', 'updatedAt': 6.0}
+    res = handler.getTaskById(make_event(path_params={'taskId': 'task-1'}), {})
+    assert json.loads(res['body'])['status'] == 'DONE'
+    assert collection.find_one.call_count == 2
+
+def test_disabled_cache_is_bypassed():
+    with patch.object(read_cache, 'READ_CACHE_ENABLED', False):
+        assert read_cache.generation(MOCK_USER_ID) is None
+        read_cache.put(MOCK_USER_ID, 'k', None, ok([1]))
+        assert read_cache.metrics()['entries'] == 0
+
+def test_async_calls_leave_the_event_loop_only_for_a_shared_tier(monkeypatch):
+    import asyncio
+    import threading
+    threads = []
+    monkeypatch.setattr(read_cache, 'generation', lambda user_id: threads.append(threading.get_ident()))
+    asyncio.run(read_cache.ageneration(MOCK_USER_ID))
+    read_cache.set_backend(read_cache.MemoryBackend())
+    asyncio.run(read_cache.ageneration(MOCK_USER_ID))
+    assert threads[0] == threading.get_ident() and threads[1] != threading.get_ident()
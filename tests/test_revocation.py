@@ -0,0 +1,34 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+try:
+    import revocation
+except ImportError:
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    import revocation
+
+def test_revoke_is_visible_locally(isolated_revocations):
+    revocation.revoke('jti-1', time.time() + 60)
+    assert revocation.is_revoked('jti-1')
+    assert not revocation.is_revoked('jti-2')
+    assert not revocation.is_revoked(None)
+    isolated_revocations.update_one.assert_called_once()
+
+def test_sync_pulls_remote_revocations(isolated_revocations):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    isolated_revocations.find.return_value = [
+        {'_id': 'remote', 'revokedAt': now, 'expiresAt': now + timedelta(minutes=5)},
+        {'_id': 'stale', 'revokedAt': now, 'expiresAt': now - timedelta(minutes=5)},
+    ]
+    assert revocation.is_revoked('remote')
+    assert not revocation.is_revoked('stale')
+    isolated_revocations.find.return_value = []
+    revocation.sync(force=True)
+    query = isolated_revocations.find.call_args[0][0]
+    assert query['revokedAt']['$gt'] < now
+
+def test_sync_is_rate_limited(isolated_revocations):
+    revocation.is_revoked('a')
+    revocation.is_revoked('b')
+    assert isolated_revocations.find.call_count == 1
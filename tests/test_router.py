@@ -0,0 +1,60 @@
+import json
+from unittest.mock import patch, MagicMock
+
+try:
+    import router
+except ImportError:
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    import router
+import handler
+
+MOCK_USER_ID = 'mock_user_123'
+
+def make_event(method, path, route_key='$default', headers=None):
+    return {'version': '2.0', 'routeKey': route_key, 'rawPath': path, 'headers': headers or {},
+            'requestContext': {'http': {'method': method, 'path': path},
+                               'authorizer': {'lambda': {'user_id': MOCK_USER_ID}}}}
+
+def test_every_route_key_is_unique_and_dispatchable():
+    assert len(router.ROUTE_KEYS) == len(router.ROUTES)
+    assert router.ROUTE_KEYS['GET /tasks/{taskId}'] is handler.getTaskById
+    assert router.ROUTE_KEYS['POST /logout'].__name__ == 'logoutUser'
+
+def test_dispatches_by_route_key():
+    fn = MagicMock(return_value={'statusCode': 200})
+    event = make_event('GET', '/health', route_key='GET /health')
+    with patch.dict(router.ROUTE_KEYS, {'GET /health': fn}):
+        assert router.route(event, None) == {'statusCode': 200}
+    fn.assert_called_once_with(event, None)
+
+@patch('storage_mongo.get_tasks_collection')
+def test_catch_all_extracts_path_parameters(mock_get):
+    mock_get.return_value.find_one.return_value = {'_id': 'abc', 'userId': MOCK_USER_ID, 'title': 'X'}
+    res = router.route(make_event('GET', '/tasks/abc'), None)
+    assert res['statusCode'] == 200
+    assert json.loads(res['body'])['title'] == 'X'
+    assert mock_get.return_value.find_one.call_args[0][0]['_id'] == 'abc'
+
+def test_not_found_and_method_not_allowed():
+    assert router.route(make_event('GET', '/nope'), None)['statusCode'] == 404
+    res = router.route(make_event('POST', '/tasks/abc'), None)
+    assert res['statusCode'] == 405
+    assert res['headers']['Allow'] == 'DELETE, GET, PATCH, OPTIONS'
+
+def test_preflight_allows_configured_origin():
+    res = router.route(make_event('OPTIONS', '/tasks', headers={'origin': 'http://localhost:5173'}), None)
+    assert res['statusCode'] == 204
+    assert res['headers']['Access-Control-Allow-Origin'] == 'http://localhost:5173'
+    assert res['headers']['Access-Control-Allow-Methods'] == 'GET, POST, OPTIONS'
+    assert 'If-None-Match' in res['headers']['Access-Control-Allow-Headers']
+
+    res = router.route(make_event('OPTIONS', '/tasks', headers={'origin': 'http://evil.example'}), None)
+    assert 'Access-Control-Allow-Origin' not in res['headers']
+    assert router.route(make_event('OPTIONS', '/nope'), None)['statusCode'] == 404
+
+@patch('handler.health_check', side_effect=Exception('down'))
+def test_catch_all_adds_cors_headers(mock_health):
+    res = router.route(make_event('GET', '/health', headers={'origin': 'http://localhost:5173'}), None)
+    assert res['statusCode'] == 503
+    assert res['headers']['Access-Control-Allow-Origin'] == 'http://localhost:5173'
@@ -0,0 +1,87 @@
+import json
+import uuid
+import pytest
+from unittest.mock import patch, MagicMock
+
+from bson import Binary
+
+try:
+    import search
+except ImportError:
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    import search
+import handler
+import task_schema
+from pagination import encode_cursor
+
+MOCK_USER_ID = 'mock_user_123'
+
+def make_event(query=None):
+    return {'requestContext': {'authorizer': {'lambda': {'user_id': MOCK_USER_ID}}},
+            'queryStringParameters': query}
+
+def test_query_terms_skip_negations_and_unquote_phrases():
+    assert search.query_terms('Report "quarterly budget" -draft report') == ['report', 'quarterly', 'budget']
+
+def test_snippet_marks_stemmed_matches():
+    found = search.snippet('Running the weekly runs', ['run'])
+    assert found == {'text': 'Running the weekly runs', 'matches': [[0, 7], [19, 23]]}
+    assert search.snippet('Nothing here', ['run']) is None
+
+def test_snippet_windows_long_text():
+    text = 'x' * 200 + ' invoice ' + 'y' * 200
+    found = search.snippet(text, ['invoices'], width=40)
+    assert found['text'].startswith('…') and found['text'].endswith('…')
+    start, end = found['matches'][0]
+    assert found['text'][start:end] == 'invoice'
+
+def test_build_search_query_pipeline():
+    plan = search.build_search_query(MOCK_USER_ID, {'q': ' groceries ', 'status': 'TODO', 'limit': '5'},
+                                     handler.ALLOWED_STATUSES)
+    assert plan['pipeline'] == [
+        {'$match': {'userId': MOCK_USER_ID, '$text': {'$search': 'groceries'}, 'status': 'TODO'}},
+        {'$addFields': {'score': {'$meta': 'textScore'}}},
+        {'$sort': {'score': -1, '_id': -1}},
+        {'$limit': 6},
+    ]
+    plan = search.build_search_query(MOCK_USER_ID, {'q': 'x', 'cursor': encode_cursor([1.5, 'abc'])},
+                                     handler.ALLOWED_STATUSES)
+    assert plan['pipeline'][2] == {'$match': {'$or': [{'score': {'$lt': 1.5}},
+                                                       {'score': 1.5, '_id': {'$lt': 'abc'}}]}}
+
+@pytest.mark.parametrize('params', [{}, {'q': '   '}, {'q': 'x' * 201}, {'q': 'x', 'status': 'NOPE'},
+                                    {'q': 'x', 'cursor': encode_cursor(['a', 'b'])}])
+def test_build_search_query_rejects(params):
+    with pytest.raises(ValueError):
+        search.build_search_query(MOCK_USER_ID, params, handler.ALLOWED_STATUSES)
+
+def test_compact_schema_translation():
+    task_id = str(uuid.uuid4())
+    with patch.object(task_schema, 'COMPACT', True):
+        plan = search.build_search_query(MOCK_USER_ID, {'q': 'x', 'cursor': encode_cursor([2.0, task_id])},
+                                         handler.ALLOWED_STATUSES)
+        assert plan['pipeline'][0]['$match'] == {'u': MOCK_USER_ID, '$text': {'$search': 'x'}}
+        assert plan['pipeline'][2]['$match']['$or'][1]['_id'] == {'$lt': Binary.from_uuid(uuid.UUID(task_id))}
+        assert task_schema.storage_index_options('tasks', {'weights': {'title': 3, 'description': 1}}) == \
+            {'weights': {'t': 3, 'd': 1}}
+
+@patch('storage_mongo.get_tasks_collection')
+def test_search_tasks_pages_with_highlights(mock_get):
+    collection = MagicMock()
+    mock_get.return_value = collection
+    collection.aggregate.return_value = [
+        {'_id': 'b', 'title': 'Buy milk', 'description': '', 'score': 1.5},
+        {'_id': 'a', 'title': 'Milk the cow', 'description': 'Fresh milk', 'score': 1.1},
+    ]
+    res = handler.searchTasks(make_event({'q': 'milk', 'limit': '1'}), {})
+    assert res['statusCode'] == 200
+    body = json.loads(res['body'])
+    assert [t['_id'] for t in body['items']] == ['b']
+    assert body['items'][0]['highlights'] == {'title': {'text': 'Buy milk', 'matches': [[4, 8]]}}
+    assert body['next'] == encode_cursor([1.5, 'b'])
+    assert collection.aggregate.call_args[0][0][0]['$match']['userId'] == MOCK_USER_ID
+
+def test_search_tasks_validation_and_auth():
+    assert handler.searchTasks(make_event(), {})['statusCode'] == 400
+    assert handler.searchTasks({'requestContext': {}}, {})['statusCode'] == 401
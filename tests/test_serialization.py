@@ -0,0 +1,56 @@
+import base64
+import gzip
+import json
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+
+try:
+    import serialization
+except ImportError:
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    import serialization
+
+DOC = {'_id': ObjectId('605c7d77b0ef4a1f7a1b2c3d'), 'at': datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+       'amount': Decimal128('1.50'), 'n': 1.5, 'title': 'é'}
+EXPECTED = {'_id': '605c7d77b0ef4a1f7a1b2c3d', 'at': '2024-01-02T03:04:05+00:00', 'amount': '1.50',
+            'n': 1.5, 'title': 'é'}
+
+def test_dumps_handles_bson_types():
+    assert json.loads(serialization.dumps(DOC)) == EXPECTED
+
+def test_stdlib_fallback_matches_orjson():
+    with patch.object(serialization, 'orjson', None):
+        fallback = serialization.dumps(DOC)
+        assert serialization.loads('{"a": 1}') == {'a': 1}
+    assert json.loads(fallback) == json.loads(serialization.dumps(DOC))
+
+def test_parse_body():
+    assert serialization.parse_body({}) == {}
+    assert serialization.parse_body({'body': None}) == {}
+    assert serialization.parse_body({'body': '{"a": 1}'}) == {'a': 1}
+    encoded = base64.b64encode(b'{"a": 2}').decode()
+    assert serialization.parse_body({'body': encoded, 'isBase64Encoded': True}) == {'a': 2}
+    try:
+        serialization.parse_body({'body': '{'})
+        assert False, 'expected JSONDecodeError'
+    except json.JSONDecodeError:
+        pass
+
+def test_compress_response_gzip():
+    body = serialization.dumps([{'title': 'task'}] * 200)
+    response = {'statusCode': 200, 'body': body, 'headers': {'ETag': '"abc"'}}
+    with patch.object(serialization, '_brotli', lambda: None):
+        out = serialization.compress_response(response, 'br, gzip;q=0.8')
+    assert out['isBase64Encoded'] is True
+    assert out['headers'] == {'ETag': 'W/"abc"', 'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'}
+    assert gzip.decompress(base64.b64decode(out['body'])).decode() == body
+
+def test_compress_response_skips_small_or_refused():
+    big = {'statusCode': 200, 'body': 'x' * 5000}
+    assert serialization.compress_response({'statusCode': 200, 'body': '{}'}, 'gzip') == {'statusCode': 200, 'body': '{}'}
+    assert serialization.compress_response(big, None) is big
+    assert serialization.compress_response(big, 'gzip;q=0, identity') is big
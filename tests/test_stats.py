@@ -0,0 +1,100 @@
+import json
+from unittest.mock import patch, MagicMock
+
+try:
+    import stats
+except ImportError:
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    import stats
+import handler
+
+MOCK_USER_ID = 'mock_user_123'
+NOW = 1715000000.0  # 2024-05-06 UTC
+DAY = '2024-05-06'
+
+def make_event(body=None, path_params=None):
+    return {'requestContext': {'authorizer': {'lambda': {'user_id': MOCK_USER_ID}}},
+            'body': json.dumps(body) if body is not None else '{}',
+            'pathParameters': path_params or {}}
+
+def test_status_change_increments():
+    assert stats.status_change(None, 'TODO', NOW) == {
+        'total': 1, f'activity.{DAY}.created': 1, 'byStatus.TODO': 1}
+    assert stats.status_change('TODO', 'DONE', NOW) == {
+        'byStatus.TODO': -1, 'byStatus.DONE': 1, f'activity.{DAY}.completed': 1}
+    assert stats.status_change('DONE', None, NOW) == {
+        'byStatus.DONE': -1, 'total': -1, f'activity.{DAY}.deleted': 1}
+    assert stats.status_change('DONE', 'DONE', NOW) == {}
+    assert stats.merge([{'total': 1, 'byStatus.TODO': 1}, {'byStatus.TODO': -1, 'byStatus.DONE': 1}]) == {
+        'total': 1, 'byStatus.DONE': 1}
+
+def test_summarize_fills_statuses_and_days():
+    doc = {'total': 2, 'byStatus': {'DONE': 2}, 'activity': {DAY: {'completed': 2}, '2020-01-01': {'created': 9}}}
+    with patch.object(stats, 'STATS_ACTIVITY_DAYS', 3):
+        body = stats.summarize(doc, NOW)
+    assert body['byStatus'] == {'TODO': 0, 'IN_PROGRESS': 0, 'DONE': 2}
+    assert [d['date'] for d in body['activity']] == ['2024-05-04', '2024-05-05', DAY]
+    assert body['activity'][-1] == {'date': DAY, 'created': 0, 'completed': 2, 'deleted': 0}
+    assert stats.summarize(None, NOW)['total'] == 0
+
+@patch('storage_mongo.get_tasks_collection')
+def test_handlers_maintain_counters(mock_get, mock_stats):
+    collection = MagicMock()
+    mock_get.return_value = collection
+    handler.createTask(make_event(body={'title': 'T'}), {})
+    assert mock_stats.update_one.call_args[0][1]['$inc']['byStatus.TODO'] == 1
+
+    collection.find_one_and_update.return_value = {'_id': 't1', 'status': 'TODO', 'title': 'T'}
+    res = handler.updateTaskStatus(make_event(body={'status': 'DONE'}, path_params={'taskId': 't1'}), {})
+    assert json.loads(res['body'])['status'] == 'DONE'
+    inc = mock_stats.update_one.call_args[0][1]['$inc']
+    assert inc['byStatus.TODO'] == -1 and inc['byStatus.DONE'] == 1
+
+    mock_stats.update_one.reset_mock()
+    collection.find_one_and_update.return_value = {'_id': 't1', 'status': 'DONE', 'title': 'T'}
+    handler.updateTask(make_event(body={'title': 'New'}, path_params={'taskId': 't1'}), {})
+    mock_stats.update_one.assert_not_called()
+
+@patch('storage_mongo.get_tombstones_collection')
+@patch('storage_mongo.get_tasks_collection')
+def test_batch_records_one_merged_increment(mock_get, mock_tombstones, mock_stats):
+    collection = MagicMock()
+    mock_get.return_value = collection
+    collection.find.return_value = [{'_id': 't1', 'status': 'TODO'}, {'_id': 't2', 'status': 'DONE'}]
+    collection.bulk_write.return_value = MagicMock(bulk_api_result={})
+    ops = [{'op': 'create', 'title': 'A'}, {'op': 'updateStatus', 'taskId': 't1', 'status': 'IN_PROGRESS'},
+           {'op': 'delete', 'taskId': 't2'}, {'op': 'delete', 'taskId': 'missing'}]
+    handler.batchTasks(make_event(body={'operations': ops}), {})
+    assert mock_stats.update_one.call_count == 1
+    inc = mock_stats.update_one.call_args[0][1]['$inc']
+    assert 'total' not in inc  # one create and one delete cancel out
+    assert inc['byStatus.IN_PROGRESS'] == 1 and inc['byStatus.DONE'] == -1 and 'byStatus.TODO' not in inc
+    assert [r._filter['_id'] for r in mock_tombstones.return_value.bulk_write.call_args[0][0]] == ['t2']
+
+def test_get_task_stats_reads_summary_document(mock_stats):
+    mock_stats.find_one.return_value = {'_id': MOCK_USER_ID, 'total': 3, 'byStatus': {'TODO': 3}}
+    res = handler.getTaskStats(make_event(), {})
+    assert res['statusCode'] == 200
+    assert json.loads(res['body'])['byStatus'] == {'TODO': 3, 'IN_PROGRESS': 0, 'DONE': 0}
+    mock_stats.find_one.assert_called_once_with({'_id': MOCK_USER_ID})
+
+@patch('stats.get_archive_collection')
+@patch('stats.get_tombstones_collection')
+@patch('stats.get_tasks_collection')
+def test_reconcile_rebuilds_from_aggregations(mock_tasks, mock_tombstones, mock_archive, mock_stats):
+    mock_tasks.return_value.aggregate.side_effect = [
+        [{'_id': {'u': 'u1', 's': 'TODO'}, 'n': 2}, {'_id': {'u': 'u1', 's': 'DONE'}, 'n': 1}],
+        [{'_id': {'u': 'u1', 'day': DAY}, 'n': 3}],
+        [{'_id': {'u': 'u1', 'day': DAY}, 'n': 1}],
+    ]
+    mock_archive.return_value.aggregate.side_effect = [[{'_id': {'u': 'u1', 's': 'DONE'}, 'n': 5}], [], []]
+    mock_tombstones.return_value.aggregate.return_value = [{'_id': {'u': 'u1', 'day': DAY}, 'n': 4}]
+    mock_stats.find.return_value = [{'_id': 'u1'}, {'_id': 'gone'}]
+    assert stats.reconcile(now=NOW) == 2
+    written = {r._filter['_id']: r._doc for r in mock_stats.bulk_write.call_args[0][0]}
+    assert written['u1']['total'] == 8 and written['u1']['byStatus'] == {'TODO': 2, 'DONE': 6}
+    assert written['u1']['activity'] == {DAY: {'created': 3, 'completed': 1, 'deleted': 4}}
+    assert written['gone']['total'] == 0
+    created_pipeline = mock_tasks.return_value.aggregate.call_args_list[1][0][0]
+    assert created_pipeline[0]['$match'] == {'createdAt': {'$gte': NOW - 86400 * stats.STATS_ACTIVITY_DAYS}}
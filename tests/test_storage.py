@@ -0,0 +1,156 @@
+import json
+import time
+from datetime import datetime, timedelta, timezone
+import pytest
+
+try:
+    import storage
+except ImportError:
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    import storage
+import auth_handlers
+import handler
+import revocation
+from pagination import keyset_filter
+from search import build_search_query
+from storage_sqlite import where
+
+USER = 'user-1'
+
+def task(task_id, created, status='TODO', title='task', description='', user=USER):
+    return {'_id': task_id, 'userId': user, 'title': title, 'description': description,
+            'status': status, 'createdAt': created, 'updatedAt': created}
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def engine(request, monkeypatch):
+    monkeypatch.setattr(storage, 'SQLITE_PATH', ':memory:')
+    storage.use_engine(request.param)
+    yield request.param
+    storage.use_engine('mongo')
+
+def test_matches_and_where_agree_on_keyset_filters():
+    docs = [task(f'id-{i}', float(i % 3)) for i in range(6)]
+    query = {'userId': USER, 'status': {'$in': ['TODO']},
+             **keyset_filter(['createdAt', '_id'], [1.0, 'id-1'], False)}
+    assert [d['_id'] for d in docs if storage.matches(d, query)] == ['id-2', 'id-4', 'id-5']
+    sql, params = where(query, {'userId': 'user_id', 'status': 'status', 'createdAt': 'created_at', '_id': 'id'})
+    assert sql.startswith('user_id = ? AND status IN (?)')
+    assert params == [USER, 'TODO', 1.0, 1.0, 'id-1']
+
+def test_task_repository_contract(engine):
+    tasks = storage.task_repository()
+    for i in range(5):
+        tasks.insert(task(f'id-{i}', 100.0 + i, status='DONE' if i % 2 else 'TODO'))
+    tasks.insert(task('other', 50.0, user='user-2'))
+
+    page = tasks.find({'userId': USER}, {'title': 1, 'createdAt': 1, '_id': 1}, [('createdAt', -1), ('_id', -1)], 3)
+    assert [t['_id'] for t in page] == ['id-4', 'id-3', 'id-2']
+    assert set(page[0]) == {'_id', 'title', 'createdAt'}
+    assert tasks.count({'userId': USER, 'status': 'DONE'}) == 2
+    assert tasks.get(USER, 'other') is None
+
+    previous = tasks.update(USER, 'id-0', {'status': 'IN_PROGRESS', 'updatedAt': 200.0}, version=100.0)
+    assert previous['status'] == 'TODO'
+    assert tasks.update(USER, 'id-0', {'title': 'x'}, version=100.0) is None
+    assert tasks.get(USER, 'id-0')['status'] == 'IN_PROGRESS'
+
+    now = time.time()
+    assert tasks.delete(USER, 'id-1', now) == {'_id': 'id-1', 'status': 'DONE'}
+    assert tasks.delete(USER, 'id-1', now) is None
+    assert tasks.find_tombstones({'userId': USER}, [('deletedAt', 1), ('_id', 1)], 10) == [
+        {'_id': 'id-1', 'deletedAt': now}]
+
+def test_bulk_write_and_stats(engine):
+    tasks = storage.task_repository()
+    tasks.insert(task('a', 1.0))
+    summary, errors = tasks.bulk_write(USER, [
+        {'op': 'create', 'task': task('b', 2.0)},
+        {'op': 'create', 'task': task('a', 3.0)},
+        {'op': 'updateStatus', 'taskId': 'a', 'changes': {'status': 'DONE', 'updatedAt': 4.0}},
+        {'op': 'delete', 'taskId': 'missing'},
+    ])
+    assert summary == {'inserted': 1, 'matched': 1, 'modified': 1, 'deleted': 0}
+    assert list(errors) == [1]
+    assert tasks.statuses(USER, ['a', 'b', 'missing']) == {'a': 'DONE', 'b': 'TODO'}
+
+    tasks.increment_stats(USER, {'total': 2, 'byStatus.TODO': 2, 'activity.2024-05-01.created': 2})
+    tasks.increment_stats(USER, {'byStatus.TODO': -1, 'byStatus.DONE': 1})
+    doc = tasks.get_stats(USER)
+    assert doc['total'] == 2 and doc['byStatus'] == {'TODO': 1, 'DONE': 1}
+    assert doc['activity'] == {'2024-05-01': {'created': 2}}
+
+def test_search_ranks_title_matches_first(engine):
+    tasks = storage.task_repository()
+    tasks.insert(task('a', 1.0, title='Buy milk', description='groceries'))
+    tasks.insert(task('b', 2.0, title='Call mom', description='ask about milk'))
+    tasks.insert(task('c', 3.0, title='Milk shake', description='not the spoiled milk', status='DONE'))
+    plan = build_search_query(USER, {'q': 'milk -spoiled', 'limit': '1'}, handler.ALLOWED_STATUSES)
+    found = tasks.search(plan)
+    assert [t['_id'] for t in found] == ['a', 'b']
+    after = build_search_query(USER, {'q': 'milk', 'cursor': handler.encode_cursor([3.0, 'a'])},
+                               handler.ALLOWED_STATUSES)
+    assert [t['_id'] for t in tasks.search(after)] == ['b']
+
+def test_search_index_follows_writes(engine):
+    tasks = storage.task_repository()
+    tasks.insert(task('a', 1.0, title='Buy milk'))
+    tasks.insert(task('b', 2.0, title='Buy bread', status='DONE'))
+    tasks.insert(task('c', 3.0, title='Buy_milk "now"', user='user-2'))
+
+    def found(q, user=USER):
+        return [t['_id'] for t in tasks.search(build_search_query(user, {'q': q}, handler.ALLOWED_STATUSES))]
+
+    assert found('buying') == ['b', 'a'] and found('buy_mil') == [] and found('buy_mil', 'user-2') == ['c']
+    tasks.update(USER, 'a', {'title': 'Sell cheese', 'updatedAt': 4.0})
+    assert found('milk') == [] and found('cheese') == ['a']
+    tasks.archive(5.0, 10)
+    assert found('bread') == []
+    tasks.restore(USER, 'b')
+    assert found('bread') == ['b']
+    tasks.bulk_write(USER, [{'op': 'delete', 'taskId': 'b'}, {'op': 'create', 'task': task('d', 6.0, title='Bread')}])
+    assert found('bread') == ['d'] and found('"now"', 'user-2') == ['c']
+
+def test_users_and_revocations(engine):
+    users = storage.user_repository()
+    users.insert({'_id': 'u1', 'email': 'a@example.com', 'hashedPassword': 'h1', 'createdAt': 1.0})
+    with pytest.raises(storage.DuplicateEmailError):
+        users.insert({'_id': 'u2', 'email': 'a@example.com', 'hashedPassword': 'h2', 'createdAt': 2.0})
+    users.update_password_hash('u1', 'stale', 'h3')
+    users.update_password_hash('u1', 'h1', 'h2')
+    assert users.find_by_email('a@example.com')['hashedPassword'] == 'h2'
+
+    now = datetime.now(timezone.utc)
+    users.revoke_token('old', now - timedelta(hours=2), now - timedelta(hours=1))
+    users.revoke_token('jti', now, now + timedelta(hours=1))
+    assert [d['_id'] for d in users.revoked_tokens(None)] == ['jti']
+    assert users.revoked_tokens(now) == []
+    assert users.claim_token('once', now, now + timedelta(hours=1)) is True
+    assert users.claim_token('once', now, now + timedelta(hours=1)) is False
+
+def test_handlers_run_on_engine_without_mocks(engine, monkeypatch):
+    monkeypatch.setattr(auth_handlers, 'pwd_context', auth_handlers._make_pwd_context())
+    body = json.dumps({'email': 'e2e@example.com', 'password': 'pw'})
+    assert auth_handlers.registerUser({'body': body}, None)['statusCode'] == 201
+    login = json.loads(auth_handlers.loginUser({'body': body}, None)['body'])
+    headers = {'authorization': f"Bearer {login['token']}"}
+
+    created = handler.createTask({'headers': headers, 'body': json.dumps({'title': 'Write report'})}, None)
+    task_id = json.loads(created['body'])['_id']
+    listed = json.loads(handler.getTasks({'headers': headers}, None)['body'])
+    assert [t['_id'] for t in listed['items']] == [task_id]
+
+    event = {'headers': headers, 'pathParameters': {'taskId': task_id}, 'body': json.dumps({'status': 'DONE'})}
+    assert handler.updateTaskStatus(event, None)['statusCode'] == 200
+    found = json.loads(handler.searchTasks({'headers': headers, 'queryStringParameters': {'q': 'report'}}, None)['body'])
+    assert found['items'][0]['status'] == 'DONE'
+    assert handler.deleteTask({'headers': headers, 'pathParameters': {'taskId': task_id}}, None)['statusCode'] == 204
+
+    changes = json.loads(handler.getTaskChanges({'headers': headers}, None)['body'])
+    assert changes['deleted'][0]['taskId'] == task_id
+    summary = json.loads(handler.getTaskStats({'headers': headers}, None)['body'])
+    assert summary['total'] == 0 and summary['activity'][-1]['completed'] == 1
+
+    assert auth_handlers.logoutUser({'headers': headers}, None)['statusCode'] == 204
+    revocation.reset()
+    assert handler.getTasks({'headers': headers}, None)['statusCode'] == 401
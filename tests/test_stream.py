@@ -0,0 +1,98 @@
+import asyncio
+import json
+import time
+from unittest.mock import patch, AsyncMock
+
+try:
+    import stream
+except ImportError:
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    import stream
+from pagination import encode_cursor
+
+MOCK_USER_ID = 'mock_user_123'
+
+def make_event(headers=None, query=None, user_id=MOCK_USER_ID):
+    return {'requestContext': {'authorizer': {'lambda': {'user_id': user_id}}},
+            'headers': headers or {}, 'queryStringParameters': query}
+
+def task_change(op, task_id, user_id=MOCK_USER_ID, updated=1.0):
+    return {'_id': {'_data': task_id}, 'operationType': op, 'ns': {'coll': 'tasks'},
+            'fullDocument': {'_id': task_id, 'userId': user_id, 'updatedAt': updated}}
+
+def run_serve(event, changes=(), expected_bodies=0, catch_up=None):
+    """Run stream.serve until `expected_bodies` events were sent, then disconnect."""
+    sent = []
+    async def main():
+        gate = asyncio.Event()
+        pending = [{'type': 'http.request', 'body': b''}]
+        async def receive():
+            if pending:
+                return pending.pop()
+            await gate.wait()
+            return {'type': 'http.disconnect'}
+        async def send(message):
+            sent.append(message)
+            if message['type'] == 'http.response.start':
+                for change in changes:
+                    stream.HUB.publish(change)
+            elif len(sent) - 1 >= expected_bodies:
+                gate.set()
+        async def respond(send_, response):
+            sent.append(response)
+        with patch.object(stream, 'HUB', stream.ChangeHub()), \
+             patch('stream.ChangeHub._run', AsyncMock()), \
+             patch('async_handler.fetch_changes', AsyncMock(return_value=catch_up)):
+            await asyncio.wait_for(stream.serve(event, receive, send, respond), 2)
+    asyncio.run(main())
+    return sent
+
+def test_change_event_routes_by_owner():
+    user_id, event = stream.change_event(task_change('insert', 't1'))
+    assert user_id == MOCK_USER_ID and event['event'] == 'created'
+    assert event['id'] == encode_cursor([1.0, 't1'])
+    tombstone = {'_id': {}, 'operationType': 'replace', 'ns': {'coll': 'task_tombstones'},
+                 'fullDocument': {'_id': 't1', 'userId': 'u2', 'deletedAt': 2.0}}
+    assert stream.change_event(tombstone) == ('u2', {'id': encode_cursor([2.0, 't1']), 'event': 'deleted',
+                                                    'data': {'taskId': 't1', 'deletedAt': 2.0}})
+    assert stream.change_event({'operationType': 'update', 'ns': {'coll': 'tasks'}, 'fullDocument': None}) is None
+
+def test_hub_drops_subscribers_that_fall_behind():
+    async def main():
+        hub = stream.ChangeHub()
+        with patch('stream.ChangeHub._run', AsyncMock()), patch.object(stream, 'STREAM_QUEUE_SIZE', 1):
+            queue = hub.subscribe(MOCK_USER_ID)
+            hub.publish(task_change('insert', 't1'))
+            hub.publish(task_change('update', 't1'))
+            hub.publish(task_change('update', 't1', user_id='someone_else'))
+        assert queue.get_nowait() is stream.RESYNC
+        assert MOCK_USER_ID not in hub._subscribers
+    asyncio.run(main())
+
+def test_serve_streams_only_own_changes():
+    sent = run_serve(make_event(), changes=[task_change('insert', 'other', user_id='u2'),
+                                            task_change('update', 't1')], expected_bodies=1)
+    assert sent[0]['status'] == 200
+    assert dict(sent[0]['headers'])[b'content-type'] == b'text/event-stream'
+    body = sent[1]['body'].decode()
+    assert body.startswith(f"id: {encode_cursor([1.0, 't1'])}\nevent: updated\n")
+    assert json.loads(body.split('data: ')[1])['_id'] == 't1'
+
+def test_serve_catches_up_from_last_event_id_without_duplicates():
+    now = time.time()
+    page = {'changes': [{'_id': 't1', 'userId': MOCK_USER_ID, 'updatedAt': now}],
+            'deleted': [{'taskId': 't0', 'deletedAt': now - 1}],
+            'watermark': encode_cursor([now, 't1']), 'hasMore': False}
+    event = make_event(headers={'Last-Event-ID': encode_cursor([now - 5, 'x'])})
+    sent = run_serve(event, changes=[task_change('update', 't1', updated=now),
+                                     task_change('update', 't2', updated=now + 1)],
+                     expected_bodies=3, catch_up=page)
+    events = [m['body'].decode().split('\n')[1] for m in sent[1:] if m.get('body')]
+    assert events == ['event: deleted', 'event: updated', 'event: updated']
+    assert b't2' in sent[3]['body']
+
+def test_serve_rejects_unauthenticated_and_expired_watermarks():
+    assert run_serve(make_event(user_id=None))[0]['statusCode'] == 401
+    expired = make_event(query={'since': encode_cursor([1.0, 'a'])})
+    assert run_serve(expired)[0]['statusCode'] == 410
@@ -0,0 +1,175 @@
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from unittest.mock import patch, MagicMock
+
+from bson import Binary, ObjectId
+from bson.datetime_ms import DatetimeMS
+
+try:
+    import task_schema
+except ImportError:
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    import task_schema
+import handler
+
+MOCK_USER_ID = 'mock_user_123'
+TASK_ID = str(uuid.uuid4())
+TASK = {'_id': TASK_ID, 'title': 'T', 'description': 'D', 'status': 'IN_PROGRESS',
+        'createdAt': 1700000000.123, 'updatedAt': 1700000001.456, 'userId': MOCK_USER_ID}
+
+@pytest.fixture
+def compact():
+    with patch.object(task_schema, 'COMPACT', True):
+        yield
+
+def make_event(body=None, path_params=None):
+    return {'requestContext': {'authorizer': {'lambda': {'user_id': MOCK_USER_ID}}},
+            'body': json.dumps(body) if body is not None else '{}',
+            'pathParameters': path_params or {}}
+
+def test_legacy_schema_is_identity():
+    query = {'_id': TASK_ID, 'status': 'DONE'}
+    assert task_schema.storage_filter(query) is query
+    assert task_schema.to_storage(TASK) is TASK
+    assert task_schema.from_storage(TASK) is TASK
+
+def test_round_trip(compact):
+    stored = task_schema.to_storage(TASK)
+    assert set(stored) == {'_id', 't', 'd', 's', 'c', 'm', 'u'}
+    assert stored['_id'] == Binary.from_uuid(uuid.UUID(TASK_ID))
+    assert stored['s'] == 1 and stored['m'] == DatetimeMS(1700000001456)
+    # What pymongo hands back: dates decode to naive UTC datetimes.
+    stored['c'] = datetime(2023, 11, 14, 22, 13, 20, 123000)
+    stored['m'] = datetime(2023, 11, 14, 22, 13, 21, 456000)
+    assert task_schema.from_storage(stored) == TASK
+
+def test_filter_translation(compact):
+    query = {'userId': MOCK_USER_ID, 'status': {'$in': ['TODO', 'DONE']},
+             '$or': [{'updatedAt': {'$gt': 5.0}}, {'updatedAt': 5.0, '_id': {'$gt': TASK_ID}}]}
+    assert task_schema.storage_filter(query) == {
+        'u': MOCK_USER_ID, 's': {'$in': [0, 2]},
+        '$or': [{'m': {'$gt': DatetimeMS(5000)}},
+                {'m': DatetimeMS(5000), '_id': {'$gt': Binary.from_uuid(uuid.UUID(TASK_ID))}}]}
+    assert task_schema.storage_sort([('createdAt', -1), ('_id', -1)]) == [('c', -1), ('_id', -1)]
+    assert task_schema.storage_projection({'title': 1, 'createdAt': 1}) == {'t': 1, 'c': 1}
+    assert task_schema.storage_update({'$set': {'status': 'DONE'}}) == {'$set': {'s': 2}}
+
+def test_ids_fall_back_for_legacy_values(compact):
+    oid = ObjectId()
+    assert task_schema.storage_id(str(oid)) == oid
+    assert task_schema.storage_id('non-existent-id') == 'non-existent-id'
+    assert task_schema.public_id(oid) == str(oid)
+
+def test_storage_index(compact):
+    with patch.object(task_schema, 'TASKS_COLLECTION', 'tasks_compact'):
+        assert task_schema.storage_index('tasks', [('userId', 1), ('createdAt', 1)]) == \
+            ('tasks_compact', [('u', 1), ('c', 1)])
+    assert task_schema.storage_index('users', [('email', 1)]) == ('users', [('email', 1)])
+
+@patch('storage_mongo.get_tasks_collection')
+def test_handlers_keep_public_json_in_compact_mode(mock_get, compact):
+    collection = MagicMock()
+    mock_get.return_value = collection
+    res = handler.createTask(make_event(body={'title': 'Hello'}), {})
+    stored = collection.insert_one.call_args[0][0]
+    assert stored['t'] == 'Hello' and stored['s'] == 0 and isinstance(stored['_id'], Binary)
+    created = json.loads(res['body'])
+    assert created['status'] == 'TODO' and uuid.UUID(created['_id'])
+
+    collection.find_one.return_value = task_schema.to_compact(TASK)
+    res = handler.getTaskById(make_event(path_params={'taskId': TASK_ID}), {})
+    assert json.loads(res['body'])['title'] == 'T'
+    assert collection.find_one.call_args[0][0] == {'_id': Binary.from_uuid(uuid.UUID(TASK_ID)), 'u': MOCK_USER_ID}
+
+class MillisDate(datetime):
+    # mongomock cannot compare DatetimeMS; store the datetime pymongo would read back.
+    def __new__(cls, millis):
+        return datetime(1970, 1, 1) + timedelta(milliseconds=millis)
+
+def bulk_write(self, requests, ordered=True):
+    # mongomock's bulk_write does not accept pymongo's request classes; apply them one by one.
+    from pymongo import DeleteOne
+    from pymongo.errors import BulkWriteError, DuplicateKeyError
+    result, errors = MagicMock(upserted_count=0, modified_count=0), []
+    for index, request in enumerate(requests):
+        if isinstance(request, DeleteOne):
+            self.delete_one(request._filter)
+            continue
+        try:
+            written = self.update_one(request._filter, request._doc, upsert=request._upsert)
+        except DuplicateKeyError:
+            errors.append({'index': index, 'code': 11000})
+            continue
+        result.upserted_count += written.upserted_id is not None
+        result.modified_count += written.modified_count
+    if errors:
+        raise BulkWriteError({'writeErrors': errors, 'nUpserted': result.upserted_count,
+                              'nModified': result.modified_count})
+    return result
+
+@pytest.fixture
+def legacy_db(monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    database = mongomock.MongoClient().db
+    monkeypatch.setattr(task_schema, 'DatetimeMS', MillisDate)
+    monkeypatch.setattr(mongomock.Collection, 'bulk_write', bulk_write)
+    with patch('db.get_db', return_value=database):
+        yield database
+
+def compact_ids(collection):
+    return sorted(task_schema.public_id(doc['_id']) for doc in collection.find())
+
+def test_migrate_legacy_tasks(legacy_db):
+    legacy_db.tasks.insert_many([dict(TASK), {'_id': 'old', 'title': 'x', 'userId': 'u'}])
+    assert task_schema.migrate_legacy_tasks() == 2
+    stored = legacy_db.tasks_compact.find_one({'_id': Binary.from_uuid(uuid.UUID(TASK_ID))})
+    assert task_schema.from_compact(stored) == TASK
+    assert legacy_db.tasks_compact.find_one({'_id': 'old'})['c'] == MillisDate(0)
+
+    # A compact copy updated after the legacy one is left alone.
+    legacy_db.tasks_compact.update_one({'_id': stored['_id']}, {'$set': {'t': 'new', 'm': MillisDate(1700000002000)}})
+    assert task_schema.migrate_legacy_tasks(full=True) == 0
+    assert legacy_db.tasks_compact.find_one({'_id': stored['_id']})['t'] == 'new'
+
+def test_migrate_catch_up_does_not_resurrect_tasks(legacy_db):
+    now = time.time()
+    ids = [str(uuid.UUID(int=i)) for i in range(1, 5)]
+    legacy_db.tasks.insert_many([dict(TASK, _id=i, createdAt=now - 10, updatedAt=now - 10) for i in ids])
+    assert task_schema.migrate_legacy_tasks() == 4
+
+    # After the switch: one task deleted and one archived in the compact
+    # schema, one deleted from `tasks` by an instance still on legacy.
+    legacy_db.tasks_compact.delete_one({'_id': task_schema.storage_id(ids[0])})
+    legacy_db.task_tombstones.insert_one({'_id': ids[0], 'userId': MOCK_USER_ID, 'deletedAt': now})
+    archived = legacy_db.tasks_compact.find_one_and_delete({'_id': task_schema.storage_id(ids[1])})
+    legacy_db.tasks_compact_archive.insert_one(archived)
+    legacy_db.tasks.delete_one({'_id': ids[2]})
+    legacy_db.task_tombstones.insert_one({'_id': ids[2], 'userId': MOCK_USER_ID, 'deletedAt': now})
+    legacy_db.tasks.update_one({'_id': ids[3]}, {'$set': {'title': 'edited', 'updatedAt': now}})
+
+    assert task_schema.migrate_legacy_tasks() == 1
+    assert compact_ids(legacy_db.tasks_compact) == [ids[3]]
+    assert compact_ids(legacy_db.tasks_compact_archive) == [ids[1]]
+    assert legacy_db.tasks_compact.find_one()['t'] == 'edited'
+
+def test_migrate_archived_tasks(legacy_db):
+    now = time.time()
+    ids = [str(uuid.UUID(int=i)) for i in range(1, 5)]
+    legacy_db.tasks.insert_many([dict(TASK, _id=i, createdAt=now - 10, updatedAt=now - 10) for i in ids[:2]])
+    legacy_db.tasks_archive.insert_many([dict(TASK, _id=i, status='DONE', createdAt=now - 10, updatedAt=now - 10)
+                                         for i in ids[2:]])
+    assert task_schema.migrate_legacy_tasks() == 4
+    assert compact_ids(legacy_db.tasks_compact_archive) == ids[2:]
+
+    # Archived by an instance still on legacy, and restored (restoring bumps updatedAt).
+    legacy_db.tasks_archive.insert_one(legacy_db.tasks.find_one_and_delete({'_id': ids[0]}))
+    restored = legacy_db.tasks_archive.find_one_and_delete({'_id': ids[2]})
+    legacy_db.tasks.insert_one(dict(restored, updatedAt=now))
+
+    assert task_schema.migrate_legacy_tasks() == 2
+    assert compact_ids(legacy_db.tasks_compact) == [ids[1], ids[2]]
+    assert compact_ids(legacy_db.tasks_compact_archive) == [ids[0], ids[3]]
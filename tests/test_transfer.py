@@ -0,0 +1,137 @@
+import asyncio
+import base64
+import csv
+import gzip
+import io
+import json
+import uuid
+from unittest.mock import patch
+import pytest
+
+try:
+    import transfer
+except ImportError:
+    import sys, os
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    import transfer
+import asgi
+import auth_handlers
+import storage
+import storage_mongo
+
+USER = 'user-1'
+TASK_IDS = [f'00000000-0000-4000-8000-00000000000{i}' for i in range(5)]
+
+def make_event(query=None, body=None, headers=None, base64_body=False):
+    return {'headers': headers or {}, 'queryStringParameters': query, 'body': body, 'isBase64Encoded': base64_body,
+            'requestContext': {'authorizer': {'lambda': {'user_id': USER}}}}
+
+@pytest.fixture
+def tasks(monkeypatch):
+    storage.use_engine('memory')
+    repository = storage.task_repository()
+    for i in range(5):
+        repository.insert({'_id': TASK_IDS[i], 'userId': USER, 'title': f'task, "{i}"', 'description': 'a\nb',
+                           'status': 'TODO', 'createdAt': 100.0 + i, 'updatedAt': 100.0 + i})
+    repository.insert({'_id': 'other', 'userId': 'user-2', 'title': 'x', 'status': 'TODO', 'createdAt': 1.0, 'updatedAt': 1.0})
+    monkeypatch.setattr(transfer, 'EXPORT_BATCH_SIZE', 2)
+    yield repository
+    storage.use_engine('mongo')
+
+def test_export_ndjson_in_creation_order(tasks):
+    res = transfer.exportTasks(make_event(), None)
+    assert res['statusCode'] == 200
+    assert res['headers']['Content-Type'] == 'application/x-ndjson'
+    rows = [json.loads(line) for line in res['body'].splitlines()]
+    assert [r['_id'] for r in rows] == TASK_IDS
+    assert set(rows[0]) == set(transfer.EXPORT_FIELDS)
+
+def test_export_csv_gzip_round_trips_quotes_and_newlines(tasks):
+    res = transfer.exportTasks(make_event({'format': 'csv'}, headers={'Accept-Encoding': 'gzip, br'}), None)
+    assert res['headers']['Content-Encoding'] == 'gzip' and res['isBase64Encoded']
+    text = gzip.decompress(base64.b64decode(res['body'])).decode('utf-8')
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert len(rows) == 5
+    assert rows[3]['title'] == 'task, "3"' and rows[3]['description'] == 'a\nb'
+
+def test_export_too_large_for_lambda(tasks, monkeypatch):
+    monkeypatch.setattr(transfer, 'EXPORT_MAX_BYTES', 100)
+    assert transfer.exportTasks(make_event(), None)['statusCode'] == 413
+    assert transfer.exportTasks(make_event({'format': 'xml'}), None)['statusCode'] == 400
+
+def test_import_reports_rejected_lines(tasks, monkeypatch, mock_stats):
+    monkeypatch.setattr(transfer, 'IMPORT_BATCH_SIZE', 2)
+    new_id = str(uuid.uuid4())
+    lines = [
+        json.dumps({'title': 'a', 'status': 'DONE', 'createdAt': 5}),
+        '',
+        '{not json',
+        json.dumps({'description': 'no title'}),
+        json.dumps({'_id': new_id, 'title': 'b'}),
+        json.dumps({'_id': new_id, 'title': 'again'}),
+        json.dumps({'title': 'c', 'status': 'LATER'}),
+        json.dumps({'title': 'd'}),
+    ]
+    res = transfer.importTasks(make_event(body='\n'.join(lines)), None)
+    body = json.loads(res['body'])
+    assert res['statusCode'] == 200
+    assert body['imported'] == 3 and body['failed'] == 4
+    assert [e['line'] for e in body['errors']] == [3, 4, 6, 7]
+    assert body['errors'][2]['error'] == 'A task with this _id already exists'
+    assert tasks.get(USER, new_id)['title'] == 'b'
+    backdated = tasks.find({'userId': USER, 'title': 'a'})[0]
+    assert backdated['createdAt'] == 5 and backdated['updatedAt'] > 1000
+    assert tasks.count({'userId': USER}) == 8
+    assert storage.task_repository().get_stats(USER)['byStatus'] == {'TODO': 2, 'DONE': 1}
+
+def test_importer_parses_gzip_csv_fed_byte_by_byte(tasks):
+    data = gzip.compress('title,status,extra\r\n"multi\nline, ""quoted""",DONE,x\r\nplain,\r\n'.encode('utf-8'))
+    importer = transfer.TaskImporter(USER, 'csv', gzipped=True)
+    for i in range(len(data)):
+        importer.feed(data[i:i + 1])
+    assert importer.finish() == {'imported': 2, 'failed': 0, 'errors': []}
+    titles = {t['title']: t['status'] for t in tasks.find({'userId': USER, 'createdAt': {'$gt': 1000}})}
+    assert titles == {'multi\nline, "quoted"': 'DONE', 'plain': 'TODO'}
+
+def test_import_rejects_unusable_bodies(tasks, monkeypatch):
+    monkeypatch.setattr(transfer, 'IMPORT_MAX_RECORD_BYTES', 20)
+    res = transfer.importTasks(make_event(body='description\nx\n', headers={'Content-Type': 'text/csv'}), None)
+    assert res['statusCode'] == 400
+    res = transfer.importTasks(make_event(body='bm90IGd6aXA=', headers={'Content-Encoding': 'gzip'}, base64_body=True), None)
+    assert json.loads(res['body'])['error'] == 'Body is not valid gzip'
+    res = transfer.importTasks(make_event(body='{"title": "' + 'x' * 40 + '"}\n{"title": "ok"}'), None)
+    assert json.loads(res['body']) == {'imported': 1, 'failed': 1, 'errors': [{'line': 1, 'error': 'Record exceeds 20 bytes'}]}
+
+@patch('storage_mongo.get_tasks_collection')
+def test_mongo_scan_uses_one_batched_cursor(mock_get):
+    cursor = mock_get.return_value.find.return_value.sort.return_value
+    cursor.batch_size.return_value = iter([{'_id': i, 'userId': USER} for i in range(5)])
+    batches = list(storage_mongo.MongoTaskRepository().scan(USER, 2))
+    assert [[t['_id'] for t in b] for b in batches] == [[0, 1], [2, 3], [4]]
+    cursor.batch_size.assert_called_once_with(2)
+    assert mock_get.return_value.find.call_args[0][0] == {'userId': USER}
+
+def call_app(method, path, chunks, query=b''):
+    token = auth_handlers.create_access_token({'sub': USER})
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query,
+             'headers': [(b'authorization', f'Bearer {token}'.encode())]}
+    messages = [{'type': 'http.request', 'body': c, 'more_body': i < len(chunks) - 1} for i, c in enumerate(chunks)]
+    sent = []
+    async def receive():
+        return messages.pop(0)
+    async def send(message):
+        sent.append(message)
+    asyncio.run(asgi.app(scope, receive, send))
+    return sent
+
+def test_asgi_streams_export_and_import(tasks):
+    sent = call_app('GET', '/tasks/export', [b''])
+    assert sent[0]['status'] == 200
+    bodies = [m for m in sent[1:] if m.get('more_body')]
+    assert len(bodies) == 3 and sent[-1] == {'type': 'http.response.body', 'body': b'', 'more_body': False}
+    exported = b''.join(m['body'] for m in sent[1:])
+
+    sent = call_app('POST', '/tasks/import', [exported[:37], exported[37:]])
+    assert sent[0]['status'] == 200
+    result = json.loads(sent[1]['body'])
+    assert result['failed'] == 5 and result['errors'][0]['error'] == 'A task with this _id already exists'
@@ -0,0 +1,444 @@
+"""
+Streaming export and import of a user's tasks.
+
+    GET  /tasks/export?format=ndjson|csv    (Accept-Encoding: gzip to compress)
+    POST /tasks/import?format=ndjson|csv    (Content-Encoding: gzip if compressed)
+
+Exports read tasks through `TaskRepository.scan`, which is one Mongo cursor
+returning EXPORT_BATCH_SIZE documents per round trip; active tasks come first,
+then archived ones. Each batch is encoded
+(and gzip-compressed) before the next is fetched, so memory stays flat no
+matter how many tasks a user has. In container mode `serve_export` sends
+every batch as soon as it is encoded. Lambda responses are buffered, so
+`exportTasks` answers 413 once the body passes EXPORT_MAX_BYTES.
+
+Imports are parsed incrementally by `TaskImporter`. NDJSON is one task per
+line; CSV has a header row, and a quoted field may span lines. Valid tasks
+are written in IMPORT_BATCH_SIZE unordered bulk inserts, and every rejected
+line is counted. The first IMPORT_MAX_ERRORS rejections are returned with
+their line numbers. `serve_import` parses the body as it arrives instead of
+reading it whole. Imported tasks keep their `_id` (if it is a UUID),
+`createdAt` and `status`. `updatedAt` becomes the import time, so delta-sync
+clients pick them up.
+"""
+import asyncio
+import base64
+import codecs
+import csv
+import io
+import json
+import math
+import os
+import uuid
+import zlib
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+import auth_handlers
+import metrics
+import ratelimit
+import read_cache
+import stats
+from handler import ALLOWED_STATUSES, create_response, get_header, new_task_document, status_error
+from serialization import GZIP_LEVEL, _accepted_encodings, dumps, loads
+from storage import task_repository
+from task_schema import timestamp
+
+EXPORT_BATCH_SIZE: int = int(os.environ.get("EXPORT_BATCH_SIZE", "500"))
+# Lambda caps a buffered response at 6 MB after base64 encoding.
+EXPORT_MAX_BYTES: int = int(os.environ.get("EXPORT_MAX_BYTES", str(4 * 1024 * 1024)))
+IMPORT_BATCH_SIZE: int = int(os.environ.get("IMPORT_BATCH_SIZE", "500"))
+IMPORT_MAX_ERRORS: int = int(os.environ.get("IMPORT_MAX_ERRORS", "100"))
+IMPORT_MAX_RECORD_BYTES: int = int(os.environ.get("IMPORT_MAX_RECORD_BYTES", "65536"))
+# Upper bound on the text inflated from a gzip upload per step.
+INFLATE_CHUNK_BYTES: int = 256 * 1024
+
+FORMATS: Dict[str, str] = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+EXPORT_FIELDS: List[str] = ["_id", "title", "description", "status", "createdAt", "updatedAt"]
+
+
+def export_format(event: Dict[str, Any]) -> str:
+    fmt: str = (event.get('queryStringParameters') or {}).get('format') or "ndjson"
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    return fmt
+
+
+def accepts_gzip(event: Dict[str, Any]) -> bool:
+    encodings = _accepted_encodings(get_header(event, 'Accept-Encoding') or "")
+    return "gzip" in encodings or "*" in encodings
+
+
+def export_headers(fmt: str, gzipped: bool) -> Dict[str, str]:
+    headers: Dict[str, str] = {
+        "Content-Type": FORMATS[fmt],
+        "Content-Disposition": f'attachment; filename="tasks.{fmt}"',
+        "Cache-Control": "private, no-store",
+        "Vary": "Accept-Encoding",
+    }
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+    return headers
+
+
+def encode_batch(tasks: List[Dict[str, Any]], fmt: str) -> bytes:
+    if fmt == "csv":
+        out = io.StringIO()
+        csv.writer(out, lineterminator="\n").writerows(
+            [["" if task.get(f) is None else task.get(f) for f in EXPORT_FIELDS] for task in tasks]
+        )
+        return out.getvalue().encode("utf-8")
+    return "".join(dumps({f: task.get(f) for f in EXPORT_FIELDS}) + "\n" for task in tasks).encode("utf-8")
+
+
+def export_chunks(user_id: str, fmt: str, gzipped: bool) -> Iterator[bytes]:
+    """The encoded export, one chunk per scanned batch (plus CSV header and gzip trailer)."""
+    compressor: Any = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) if gzipped else None
+    tasks = task_repository()
+    batches = (batch for archived in (False, True) for batch in tasks.scan(user_id, EXPORT_BATCH_SIZE, archived))
+    pieces: Iterator[bytes] = (encode_batch(batch, fmt) for batch in batches)
+    if fmt == "csv":
+        header: bytes = (",".join(EXPORT_FIELDS) + "\n").encode("utf-8")
+        pieces = (piece for part in ([header], pieces) for piece in part)
+    for piece in pieces:
+        chunk: bytes = compressor.compress(piece) if compressor else piece
+        if chunk:
+            yield chunk
+    if compressor:
+        yield compressor.flush()
+
+
+def import_format(event: Dict[str, Any]) -> str:
+    fmt: Optional[str] = (event.get('queryStringParameters') or {}).get('format')
+    if fmt is None:
+        content_type: str = (get_header(event, 'Content-Type') or "").lower()
+        fmt = "csv" if content_type.startswith("text/csv") else "ndjson"
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    return fmt
+
+
+def is_gzipped(event: Dict[str, Any]) -> bool:
+    return (get_header(event, 'Content-Encoding') or "").strip().lower() == "gzip"
+
+
+def _task_id(value: Any) -> str:
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        raise ValueError("_id must be a UUID")
+
+
+def _timestamp(value: Any, field: str) -> float:
+    try:
+        ts = float(value)
+    except (TypeError, ValueError):
+        ts = math.nan
+    if isinstance(value, bool) or not math.isfinite(ts) or ts < 0:
+        raise ValueError(f"{field} must be a Unix timestamp")
+    return ts
+
+
+def _write_error(message: str) -> str:
+    lowered = message.lower()
+    if "duplicate" in lowered or "unique" in lowered:
+        return "A task with this _id already exists"
+    return "Write failed"
+
+
+class TaskImporter:
+    """
+    Incremental parser and writer for one import upload. `feed` takes raw body
+    chunks in order; complete records are validated and written every
+    IMPORT_BATCH_SIZE tasks. `finish` writes the remainder and returns the summary.
+    Raises ValueError when the body as a whole is unusable (bad gzip, UTF-8 or CSV header).
+    """
+
+    def __init__(self, user_id: str, fmt: str, gzipped: bool = False) -> None:
+        self.user_id = user_id
+        self.fmt = fmt
+        self.now: float = timestamp()
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        # wbits=47 accepts a gzip or zlib header.
+        self._inflater: Any = zlib.decompressobj(47) if gzipped else None
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._pending = ""
+        self._skipping = False
+        self._line = 0
+        self._record_line = 1
+        self._columns: Optional[List[str]] = None
+        self._batch: List[Tuple[int, Dict[str, Any]]] = []
+
+    def summary(self) -> Dict[str, Any]:
+        # Write errors are found after later lines were validated.
+        errors = sorted(self.errors, key=lambda error: error["line"])
+        return {"imported": self.imported, "failed": self.failed, "errors": errors}
+
+    def feed(self, data: bytes) -> None:
+        if self._inflater is None:
+            self._text(data)
+            return
+        while data:
+            try:
+                inflated: bytes = self._inflater.decompress(data, INFLATE_CHUNK_BYTES)
+            except zlib.error:
+                raise ValueError("Body is not valid gzip")
+            data = self._inflater.unconsumed_tail
+            self._text(inflated)
+
+    def finish(self) -> Dict[str, Any]:
+        if self._inflater is not None:
+            self._text(self._inflater.flush())
+            if not self._inflater.eof:
+                raise ValueError("Body is not valid gzip")
+        self._text(b"", final=True)
+        if self._pending and not self._skipping:
+            if self._open_quote(self._pending):
+                self._reject(self._record_line, "Unterminated quoted field")
+            else:
+                self._record(self._pending, self._record_line)
+        self._pending = ""
+        self._flush()
+        return self.summary()
+
+    def _text(self, data: bytes, final: bool = False) -> None:
+        try:
+            text: str = self._decoder.decode(data, final)
+        except UnicodeDecodeError:
+            raise ValueError("Body must be UTF-8 text")
+        start = 0
+        while True:
+            end = text.find("\n", start)
+            if end < 0:
+                break
+            self._end_line(text[start:end])
+            start = end + 1
+        if not self._skipping:
+            self._hold(self._pending + text[start:])
+
+    def _hold(self, partial: str) -> None:
+        """Keep an unfinished record, unless it has grown past IMPORT_MAX_RECORD_BYTES."""
+        if len(partial) > IMPORT_MAX_RECORD_BYTES:
+            self._reject(self._record_line, f"Record exceeds {IMPORT_MAX_RECORD_BYTES} bytes")
+            partial, self._skipping = "", True
+        self._pending = partial
+
+    def _open_quote(self, record: str) -> bool:
+        return self.fmt == "csv" and record.count('"') % 2 == 1
+
+    def _end_line(self, line: str) -> None:
+        self._line += 1
+        if self._skipping:
+            self._skipping = False
+            self._record_line = self._line + 1
+            return
+        record: str = self._pending + line
+        self._pending = ""
+        if len(record) > IMPORT_MAX_RECORD_BYTES:
+            self._reject(self._record_line, f"Record exceeds {IMPORT_MAX_RECORD_BYTES} bytes")
+            self._record_line = self._line + 1
+            return
+        if self._open_quote(record):
+            # A newline inside a quoted CSV field: the record continues.
+            self._hold(record + "\n")
+            return
+        self._record(record, self._record_line)
+        self._record_line = self._line + 1
+
+    def _record(self, text: str, line: int) -> None:
+        text = text.rstrip("\r")
+        if not text.strip():
+            return
+        if self.fmt == "csv" and self._columns is None:
+            self._columns = next(csv.reader([text]))
+            if "title" not in self._columns:
+                raise ValueError("CSV header must include a title column")
+            return
+        try:
+            fields: Any = dict(zip(self._columns, next(csv.reader([text])))) if self._columns else loads(text)
+            task: Dict[str, Any] = self._task(fields)
+        except json.JSONDecodeError:
+            self._reject(line, "Invalid JSON")
+            return
+        except (ValueError, csv.Error) as e:
+            self._reject(line, str(e))
+            return
+        self._batch.append((line, task))
+        if len(self._batch) >= IMPORT_BATCH_SIZE:
+            self._flush()
+
+    def _task(self, fields: Any) -> Dict[str, Any]:
+        if not isinstance(fields, dict):
+            raise ValueError("Record must be an object")
+        title: Any = fields.get("title")
+        if not title or not isinstance(title, str):
+            raise ValueError("Title is required")
+        description: Any = fields.get("description") or ""
+        if not isinstance(description, str):
+            raise ValueError("Description must be a string")
+        status: Any = fields.get("status") or "TODO"
+        if status not in ALLOWED_STATUSES:
+            raise ValueError(status_error())
+        task: Dict[str, Any] = new_task_document(self.user_id, title, description, self.now)
+        task["status"] = status
+        if fields.get("_id"):
+            task["_id"] = _task_id(fields["_id"])
+        if fields.get("createdAt") not in (None, ""):
+            task["createdAt"] = _timestamp(fields["createdAt"], "createdAt")
+        return task
+
+    def _reject(self, line: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def _flush(self) -> None:
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        _, errors = task_repository().bulk_write(self.user_id, [{"op": "create", "task": task} for _, task in batch])
+        for index, message in sorted(errors.items()):
+            self._reject(batch[index][0], _write_error(message))
+        created: List[Dict[str, Any]] = [task for index, (_, task) in enumerate(batch) if index not in errors]
+        if not created:
+            return
+        self.imported += len(created)
+        read_cache.invalidate(self.user_id)
+        stats.record(self.user_id, stats.merge(
+            stats.status_change(None, task["status"], task["createdAt"]) for task in created
+        ))
+
+
+@metrics.instrument
+@ratelimit.limited
+def exportTasks(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Export all of the user's tasks as NDJSON or CSV, buffered up to EXPORT_MAX_BYTES."""
+    user_id: Optional[str] = auth_handlers.resolve_user(event)
+    if not user_id:
+        return create_response(401, {"error": "Unauthorized"})
+    try:
+        fmt: str = export_format(event)
+    except ValueError as e:
+        return create_response(400, {"error": str(e)})
+
+    try:
+        gzipped: bool = accepts_gzip(event)
+        chunks: List[bytes] = []
+        size = 0
+        for chunk in export_chunks(user_id, fmt, gzipped):
+            size += len(chunk)
+            if size > EXPORT_MAX_BYTES:
+                return create_response(413, {
+                    "error": f"Export exceeds {EXPORT_MAX_BYTES} bytes; request it with "
+                             "Accept-Encoding: gzip or from the container deployment, which streams it"
+                })
+            chunks.append(chunk)
+        body: bytes = b"".join(chunks)
+        if gzipped:
+            return {"statusCode": 200, "headers": export_headers(fmt, True),
+                    "body": base64.b64encode(body).decode("ascii"), "isBase64Encoded": True}
+        return {"statusCode": 200, "headers": export_headers(fmt, False), "body": body.decode("utf-8")}
+    except Exception as e:
+        print(f"Error exporting tasks: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+
+@metrics.instrument
+@ratelimit.limited
+def importTasks(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Create tasks from an NDJSON or CSV upload; reports rejected lines."""
+    user_id: Optional[str] = auth_handlers.resolve_user(event)
+    if not user_id:
+        return create_response(401, {"error": "Unauthorized"})
+    try:
+        importer = TaskImporter(user_id, import_format(event), is_gzipped(event))
+    except ValueError as e:
+        return create_response(400, {"error": str(e)})
+
+    try:
+        body: Any = event.get('body') or ""
+        data: bytes = base64.b64decode(body) if event.get('isBase64Encoded') else body.encode("utf-8")
+        for start in range(0, len(data), INFLATE_CHUNK_BYTES):
+            importer.feed(data[start:start + INFLATE_CHUNK_BYTES])
+        return create_response(200, importer.finish())
+    except ValueError as e:
+        return create_response(400, {"error": str(e), **importer.summary()})
+    except Exception as e:
+        print(f"Error importing tasks: {e}")
+        return create_response(500, {"error": "Internal Server Error"})
+
+
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+async def serve_export(event: Dict[str, Any], send: Send,
+                       respond: Callable[[Any, Dict[str, Any]], Awaitable[None]]) -> None:
+    """Stream GET /tasks/export (ASGI); `respond` sends a plain (error) handler response."""
+    user_id: Optional[str] = await auth_handlers.aresolve_user(event)
+    if not user_id:
+        await respond(send, create_response(401, {"error": "Unauthorized"}))
+        return
+    try:
+        fmt: str = export_format(event)
+    except ValueError as e:
+        await respond(send, create_response(400, {"error": str(e)}))
+        return
+
+    loop = asyncio.get_running_loop()
+    gzipped: bool = accepts_gzip(event)
+    chunks: Iterator[bytes] = export_chunks(user_id, fmt, gzipped)
+    try:
+        chunk: Optional[bytes] = await loop.run_in_executor(None, next, chunks, None)
+    except Exception as e:
+        print(f"Error exporting tasks: {e}")
+        await respond(send, create_response(500, {"error": "Internal Server Error"}))
+        return
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in export_headers(fmt, gzipped).items()],
+    })
+    try:
+        while chunk is not None:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            chunk = await loop.run_in_executor(None, next, chunks, None)
+    except Exception as e:
+        # Headers are sent; failing the request makes the server abort the
+        # connection, so the client sees a truncated transfer rather than a
+        # complete-looking file.
+        print(f"Error exporting tasks: {e}")
+        raise
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def serve_import(event: Dict[str, Any], receive: Callable[[], Awaitable[Dict[str, Any]]], send: Send,
+                       respond: Callable[[Any, Dict[str, Any]], Awaitable[None]]) -> None:
+    """Serve POST /tasks/import (ASGI), parsing the request body as it is received."""
+    user_id: Optional[str] = await auth_handlers.aresolve_user(event)
+    if not user_id:
+        await respond(send, create_response(401, {"error": "Unauthorized"}))
+        return
+    try:
+        importer = TaskImporter(user_id, import_format(event), is_gzipped(event))
+    except ValueError as e:
+        await respond(send, create_response(400, {"error": str(e)}))
+        return
+
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            message: Dict[str, Any] = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            if message.get("body"):
+                await loop.run_in_executor(None, importer.feed, message["body"])
+            if not message.get("more_body"):
+                break
+        response: Dict[str, Any] = create_response(200, await loop.run_in_executor(None, importer.finish))
+    except ValueError as e:
+        response = create_response(400, {"error": str(e), **importer.summary()})
+    except Exception as e:
+        print(f"Error importing tasks: {e}")
+        response = create_response(500, {"error": "Internal Server Error"})
+    await respond(send, response)